@@ -0,0 +1,14 @@
+from .pass_stats import PassStats
+from .symbolize import Symbolize
+from .reports import Reports
+from .launchers import ExportLaunchers
+from .toolchain import Toolchain
+from .prefetch import Prefetch
+from .journal import Journal
+from .adaptive import Adaptive
+from .results import Results
+from .regress import Regress
+from .stabilize import Stabilize
+from .sweep import Sweep
+from .binstats import BinStats
+from .buildtime import BuildTime
@@ -0,0 +1,158 @@
+import os
+import shlex
+import subprocess
+import sys
+import time
+from infra.command import Command
+from infra.util import FatalError
+from tools.checkpoint import iteration_runtimes, journal_path, read_journal
+from tools.memo import load_builds
+from tools.stats import ratio_ci
+
+
+class Adaptive(Command):
+    """
+    Runs benchmarks with an adaptive number of iterations. Every round runs
+    one more iteration of each benchmark whose overhead ratio against its
+    paired baseline has a confidence interval wider than ``--ci``. It stops
+    when all intervals are narrow enough, when ``--max-iterations`` is
+    reached or when the time budget runs out. Runtimes are taken from the
+    run journals (see ``setup.py journal``), so an interrupted adaptive
+    sweep continues from the iterations it already has. Runs of binaries
+    that were rebuilt since are not counted.
+    """
+    name = 'adaptive'
+    description = 'run until overhead confidence intervals are narrow enough'
+
+    def add_args(self, parser):
+        parser.add_argument('target', help='the target to run, e.g. spec2006')
+        parser.add_argument('pairs', nargs='+', metavar='INSTANCE:BASELINE',
+                help='instances with their paired baselines, e.g. '
+                'dangsan:dangsan-baseline')
+        parser.add_argument('--benchmarks', nargs='+', required=True,
+                metavar='BENCHMARK', help='benchmarks to run')
+        parser.add_argument('--ci', type=float, default=0.01,
+                help='target half-width of the confidence interval, '
+                'relative to the ratio (default: 0.01)')
+        parser.add_argument('--confidence', type=float, default=0.95,
+                help='confidence level (default: 0.95)')
+        parser.add_argument('--min-iterations', type=int, default=3,
+                help='iterations before the first check (default: 3)')
+        parser.add_argument('--max-iterations', type=int, default=20,
+                help='maximum iterations per benchmark (default: 20)')
+        parser.add_argument('--budget', type=float, metavar='MINUTES',
+                help='time budget of the sweep (default: unlimited)')
+        parser.add_argument('--run-args', default='',
+                help='extra arguments for setup.py run, e.g. "--parallel '
+                'proc --parallel-workers 8"')
+
+    def run(self, ctx):
+        pairs = []
+        for pair in ctx.args.pairs:
+            if ':' not in pair:
+                raise FatalError('expected INSTANCE:BASELINE, got ' + pair)
+            pairs.append(tuple(pair.split(':', 1)))
+
+        start = time.time()
+        deadline = start + ctx.args.budget * 60 if ctx.args.budget else None
+
+        progress = None
+        while True:
+            status = self.check(ctx, pairs)
+
+            # stop instead of retrying forever when runs keep failing
+            counts = sum(sum(n) for n, _, _ in status.values())
+            if counts == progress:
+                ctx.log.error('no iterations were added in the last round')
+                break
+            progress = counts
+
+            # instance -> benchmark -> number of iterations to add
+            todo = {}
+            for (instance, baseline, bench), (n, _, done) in status.items():
+                if done:
+                    continue
+                # baselines may be paired with several instances
+                for name, count in ((instance, n[0]), (baseline, n[1])):
+                    benches = todo.setdefault(name, {})
+                    benches[bench] = max(benches.get(bench, 0), 1,
+                                         ctx.args.min_iterations - count)
+
+            if not todo:
+                break
+            if deadline and time.time() >= deadline:
+                ctx.log.warning('time budget exhausted')
+                break
+
+            for instance, benches in sorted(todo.items()):
+                # group benchmarks by the number of iterations to add
+                groups = {}
+                for bench, iterations in benches.items():
+                    groups.setdefault(iterations, []).append(bench)
+                for iterations, group in sorted(groups.items()):
+                    if deadline and time.time() >= deadline:
+                        break
+                    self.run_benchmarks(ctx, instance, group, iterations)
+
+        self.print_status(ctx, self.check(ctx, pairs), time.time() - start)
+
+    def runtimes(self, ctx, instance):
+        # only runs of the current binaries, not of earlier builds
+        builds = {build['fingerprint'] for build in
+                  load_builds(ctx.paths.buildroot, instance).values()}
+        if not builds:
+            raise FatalError('no recorded builds for %s, build it with '
+                             'setup.py build first' % instance)
+        return iteration_runtimes(
+            e for e in read_journal(journal_path(ctx, instance))
+            if e.get('build') in builds)
+
+    def check(self, ctx, pairs):
+        """
+        Returns, per (instance, baseline, benchmark), the iteration counts,
+        the ratio with its confidence interval (if there are enough
+        iterations) and whether the benchmark needs no more iterations.
+        """
+        runtimes = {}
+        status = {}
+        for instance, baseline in pairs:
+            for name in (instance, baseline):
+                if name not in runtimes:
+                    runtimes[name] = self.runtimes(ctx, name)
+
+            for bench in ctx.args.benchmarks:
+                xs = runtimes[instance].get(bench, [])
+                ys = runtimes[baseline].get(bench, [])
+                n = (len(xs), len(ys))
+                ci = None
+                done = min(n) >= ctx.args.max_iterations
+                if min(n) >= max(2, ctx.args.min_iterations):
+                    ci = ratio_ci(xs, ys, ctx.args.confidence)
+                    ratio, low, high = ci
+                    done = done or (high - low) / 2 <= ctx.args.ci * ratio
+                status[(instance, baseline, bench)] = n, ci, done
+        return status
+
+    def run_benchmarks(self, ctx, instance, benchmarks, iterations):
+        cmd = [sys.executable, os.path.join(ctx.paths.root, 'setup.py'),
+               'run', '--journal', ctx.args.target, instance,
+               '--benchmarks', *benchmarks, '-i', str(iterations),
+               *shlex.split(ctx.args.run_args)]
+        ctx.log.info('running ' + ' '.join(cmd[1:]))
+        if subprocess.call(cmd):
+            ctx.log.warning('setup.py run failed for %s, failed runs are '
+                            'not counted' % instance)
+
+    def print_status(self, ctx, status, elapsed):
+        width = max(len(b) for b in ctx.args.benchmarks)
+        for (instance, baseline, bench), (n, ci, _) in sorted(status.items()):
+            if ci:
+                ratio, low, high = ci
+                result = '%.3f [%.3f, %.3f]' % (ratio, low, high)
+                if (high - low) / 2 > ctx.args.ci * ratio:
+                    result += '  (wider than --ci)'
+            else:
+                result = 'not enough iterations'
+            print('%s  %s/%s  n=%d/%d  %s' % (bench.ljust(width), instance,
+                  baseline, n[0], n[1], result))
+        print('elapsed: %.1f minutes' % (elapsed / 60))
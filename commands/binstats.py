@@ -0,0 +1,109 @@
+import glob
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from infra.command import Command
+from infra.util import FatalError
+from tools.binstats import analyze, compare, runtime_patterns
+
+
+class BinStats(Command):
+    """
+    Compares the SPEC binaries of instances with those of their baselines
+    after a build: text/data size deltas, call sites of sanitizer runtime
+    functions, and per function the instructions, branches and traps that
+    the instrumentation added. This explains where a runtime overhead comes
+    from without running anything.
+    """
+    name = 'binstats'
+    description = 'compare instrumented binaries with their baselines'
+
+    def add_args(self, parser):
+        parser.add_argument('specdir', metavar='SPECDIR',
+                help='SPEC installation with built binaries')
+        parser.add_argument('pairs', nargs='+', metavar='INSTANCE:BASELINE',
+                help='instances to compare with their baselines')
+        parser.add_argument('-b', '--benchmarks', nargs='+', default=[],
+                help='only analyse these benchmarks (default: all)')
+        parser.add_argument('--symbols', nargs='+', default=[],
+                metavar='PATTERN',
+                help='additional runtime function patterns to count')
+        parser.add_argument('--top', type=int, default=20,
+                help='number of grown functions to report (default: 20)')
+        parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                help='number of binaries to disassemble in parallel')
+        parser.add_argument('-o', '--output',
+                help='JSON output file (default: <buildroot>/binstats/'
+                     '<instance>.json)')
+
+    def run(self, ctx):
+        patterns = runtime_patterns + tuple(ctx.args.symbols)
+        report = {}
+
+        with ThreadPoolExecutor(max_workers=ctx.args.jobs) as pool:
+            for pair in ctx.args.pairs:
+                instance, _, baseline = pair.partition(':')
+                if not baseline:
+                    raise FatalError('expected INSTANCE:BASELINE, got ' + pair)
+
+                binaries = self.binaries(ctx, instance)
+                base_binaries = self.binaries(ctx, baseline)
+                if not binaries:
+                    raise FatalError('no binaries found for ' + instance)
+
+                jobs = {}
+                for key, path in sorted(binaries.items()):
+                    if key not in base_binaries:
+                        ctx.log.warning('no %s binary for %s %s, skipping' %
+                                        (baseline, *key))
+                        continue
+                    jobs[key] = (pool.submit(analyze, path, patterns),
+                                 pool.submit(analyze, base_binaries[key],
+                                             patterns))
+
+                results = {}
+                for (bench, exe), (inst, base) in jobs.items():
+                    result = compare(inst.result(), base.result(),
+                                     ctx.args.top)
+                    result['baseline'] = baseline
+                    results.setdefault(bench, {})[exe] = result
+                    self.print_summary(instance, bench, exe, result)
+                report[instance] = results
+
+        if ctx.args.output:
+            with open(ctx.args.output, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            return
+
+        outdir = os.path.join(ctx.paths.buildroot, 'binstats')
+        os.makedirs(outdir, exist_ok=True)
+        for instance, results in report.items():
+            path = os.path.join(outdir, instance + '.json')
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            ctx.log.info('wrote ' + path)
+
+    def binaries(self, ctx, instance):
+        pattern = os.path.join(ctx.args.specdir, 'benchspec', '*', '*', 'exe',
+                               '*.' + instance)
+        binaries = {}
+        for path in glob.glob(pattern):
+            bench = path.split(os.sep)[-3]
+            if ctx.args.benchmarks and \
+                    not any(b in bench for b in ctx.args.benchmarks):
+                continue
+            exe = os.path.basename(path)[:-len(instance) - 1]
+            binaries[(bench, exe)] = path
+        return binaries
+
+    def print_summary(self, instance, bench, exe, result):
+        text = result['sections']['text']
+        data = result['sections']['data']
+        calls = sum(result['runtime_calls'].values())
+        print('%-20s %-16s %-20s text %+9d (%+.1f%%) data %+8d '
+              'calls %6d (%.1f/kinsn) +br %6d +traps %5d' % (
+              instance, bench, exe, text['delta'],
+              100.0 * text['delta'] / text['baseline']
+              if text['baseline'] else 0.0,
+              data['delta'], calls, result['call_density'],
+              result['added_branches'], result['added_traps']))
@@ -0,0 +1,113 @@
+import json
+import os
+from infra.command import Command
+from infra.util import FatalError
+from tools.buildtime import load_invocations, summarize
+
+
+class BuildTime(Command):
+    """
+    Reports the compile and link times and peak memory of target builds,
+    recorded per compiler invocation by the timing wrapper that instances
+    registered with ``Journaled``/``LazyInstance`` use in builds with
+    ``--time-builds``. Given
+    ``INSTANCE:BASELINE`` pairs, it shows the overhead per benchmark and the
+    translation units and links that slowed down the most.
+    """
+    name = 'buildtime'
+    description = 'report compile and link time overhead per instance'
+
+    def add_args(self, parser):
+        parser.add_argument('pairs', nargs='+', metavar='INSTANCE[:BASELINE]',
+                help='instances to report, optionally with a baseline')
+        parser.add_argument('-b', '--benchmarks', nargs='+', default=[],
+                help='only report these benchmarks (default: all)')
+        parser.add_argument('-n', '--top', type=int, default=10,
+                help='number of slowest compiles and links to show '
+                     '(default: 10)')
+        parser.add_argument('--json', action='store_true',
+                help='print the report as JSON')
+
+    def run(self, ctx):
+        report = {}
+        for pair in ctx.args.pairs:
+            instance, _, baseline = pair.partition(':')
+            invocations = self.load(ctx, instance)
+            if not invocations:
+                raise FatalError('no compiler invocations recorded for %s, '
+                                 'build it with --time-builds first' %
+                                 instance)
+            base = self.load(ctx, baseline) if baseline else []
+            report[instance] = self.compare(ctx, invocations, base)
+            report[instance]['baseline'] = baseline or None
+
+        if ctx.args.json:
+            print(json.dumps(report, indent=2, sort_keys=True))
+            return
+
+        for instance, result in report.items():
+            self.print_report(instance, result)
+
+    def load(self, ctx, instance):
+        return [e for e in load_invocations(ctx.paths.buildroot, instance)
+                if not ctx.args.benchmarks or
+                any(b in e['benchmark'] for b in ctx.args.benchmarks)]
+
+    def compare(self, ctx, invocations, base):
+        totals = summarize(invocations)
+        base_totals = summarize(base)
+        for bench, kinds in totals.items():
+            for kind, total in kinds.items():
+                base_total = base_totals.get(bench, {}).get(kind)
+                if base_total and base_total['wall_s']:
+                    total['overhead'] = total['wall_s'] / base_total['wall_s']
+                    total['baseline_wall_s'] = base_total['wall_s']
+                    total['baseline_maxrss_kb'] = base_total['maxrss_kb']
+
+        # match invocations by benchmark, kind and output file name; the
+        # build directories differ per instance
+        def key(e):
+            return e['benchmark'], e['kind'], os.path.basename(e['output'])
+        base_times = {key(e): e['wall_s'] for e in base}
+
+        slowest = {}
+        for kind in ('compile', 'link'):
+            entries = sorted((e for e in invocations if e['kind'] == kind),
+                             key=lambda e: -e['wall_s'])
+            slowest[kind] = [{
+                'benchmark': e['benchmark'],
+                'output': e['output'],
+                'sources': e['sources'],
+                'wall_s': e['wall_s'],
+                'maxrss_kb': e['maxrss_kb'],
+                'baseline_wall_s': base_times.get(key(e)),
+            } for e in entries[:ctx.args.top]]
+
+        return {'benchmarks': totals, 'slowest': slowest}
+
+    def print_report(self, instance, result):
+        title = instance
+        if result['baseline']:
+            title += ' vs ' + result['baseline']
+        print(title)
+        print('-' * len(title))
+        print('%-24s %-8s %6s %10s %9s %10s' % ('benchmark', 'kind', 'count',
+              'wall', 'overhead', 'peak MiB'))
+        for bench, kinds in sorted(result['benchmarks'].items()):
+            for kind, total in sorted(kinds.items()):
+                overhead = '%8.2fx' % total['overhead'] \
+                    if 'overhead' in total else '%9s' % '-'
+                print('%-24s %-8s %6d %9.1fs %s %10d' % (bench, kind,
+                      total['count'], total['wall_s'], overhead,
+                      total['maxrss_kb'] // 1024))
+
+        for kind, entries in result['slowest'].items():
+            print()
+            print('slowest %ss:' % kind)
+            for e in entries:
+                base = ' (baseline %.2fs)' % e['baseline_wall_s'] \
+                    if e['baseline_wall_s'] is not None else ''
+                print('  %8.2fs %6d MiB  %s %s%s' % (e['wall_s'],
+                      e['maxrss_kb'] // 1024, e['benchmark'],
+                      ' '.join(e['sources']) or e['output'], base))
+        print()
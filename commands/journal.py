@@ -0,0 +1,148 @@
+import glob
+import json
+import os
+import shlex
+from infra.command import Command
+from tools.checkpoint import (
+    completed_iterations, journal_path, read_journal, strip_journal_wrapper
+)
+from tools.machine import load_json, run_settings_path
+from tools.memo import (
+    command_key, fingerprint, load_builds, load_memo, lookup_build,
+    memo_path, runtime_fingerprint
+)
+from .launchers import parse_speccmds, resolve_runenv
+
+
+class Journal(Command):
+    """
+    Shows the progress of a benchmark sweep from the run journals of the
+    selected instances, and prints the ``setup.py run`` commands that run
+    only the iterations that did not complete yet. An iteration that was
+    interrupted halfway is run again as a whole. Only runs with ``setup.py
+    run --journal`` are journaled.
+
+    With ``--memo``, runs measured earlier (in any session, under any
+    instance name) with the same fingerprint as the current run directories
+    are copied into the journal and count as completed, so unchanged
+    binaries are not measured again.
+    """
+    name = 'journal'
+    description = 'show sweep progress and the commands to resume it'
+
+    def add_args(self, parser):
+        parser.add_argument('target', help='the target of the sweep, '
+                'e.g. spec2006')
+        parser.add_argument('instances', nargs='+', metavar='INSTANCE',
+                help='instances in the sweep')
+        parser.add_argument('-i', '--iterations', type=int, default=1,
+                help='iterations per benchmark in the sweep (default: 1)')
+        parser.add_argument('--benchmarks', nargs='+', metavar='BENCHMARK',
+                help='benchmarks in the sweep (default: all journaled ones)')
+        parser.add_argument('--memo', metavar='SPECDIR',
+                help='reuse memoized results for runs with the same '
+                'fingerprint, using the run directories in SPECDIR')
+        parser.add_argument('--clear', action='store_true',
+                help='remove the journals to start a new sweep')
+
+    def run(self, ctx):
+        if ctx.args.clear:
+            for instance in ctx.args.instances:
+                path = journal_path(ctx, instance)
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+
+        if ctx.args.memo:
+            for instance in ctx.args.instances:
+                self.import_memoized(ctx, instance)
+
+        done = {instance: completed_iterations(
+                    read_journal(journal_path(ctx, instance)))
+                for instance in ctx.args.instances}
+
+        benchmarks = ctx.args.benchmarks or \
+            sorted({b for counts in done.values() for b in counts})
+
+        width = max([len(b) for b in benchmarks] + [9])
+        print(' '.join(['benchmark'.ljust(width)] + ctx.args.instances))
+        for bench in benchmarks:
+            print(' '.join([bench.ljust(width)] +
+                           [('%d/%d' % (done[i].get(bench, 0),
+                                        ctx.args.iterations)).ljust(len(i))
+                            for i in ctx.args.instances]))
+
+        resume = []
+        for instance in ctx.args.instances:
+            # group benchmarks with the same number of missing iterations
+            missing = {}
+            for bench in benchmarks:
+                left = ctx.args.iterations - done[instance].get(bench, 0)
+                if left > 0:
+                    missing.setdefault(left, []).append(bench)
+            for left, benches in sorted(missing.items()):
+                resume.append('./setup.py run --journal %s %s '
+                              '--benchmarks %s -i %d' %
+                              (ctx.args.target, instance, ' '.join(benches),
+                               left))
+
+        if resume:
+            print('\nto resume the sweep, run:')
+            for cmd in resume:
+                print('  ' + cmd)
+        else:
+            print('\nthe sweep is complete')
+
+    def import_memoized(self, ctx, instance):
+        """
+        Copies the memoized runs of the commands an instance would run now
+        (from its most recent SPEC run directories) into its run journal,
+        so that they count as completed iterations and are ingested into
+        the results database like its own runs.
+        """
+        env, wrapper = resolve_runenv(ctx, self.instances[instance])
+        env = dict(os.environ, **env)
+        settings = load_json(run_settings_path(ctx.paths.buildroot))
+
+        # the journal wrapper itself is not part of the fingerprint
+        wrapper = strip_journal_wrapper(shlex.split(wrapper))
+        runtime = runtime_fingerprint(wrapper, env, settings)
+        builds = load_builds(ctx.paths.buildroot, instance)
+
+        pattern = os.path.join(ctx.args.memo, 'benchspec', '*', '*', 'run',
+                               '*_%s.*' % instance, 'speccmds.cmd')
+        newest = {}
+        for cmdfile in glob.glob(pattern):
+            bench = cmdfile.split(os.sep)[-4]
+            if bench not in newest or \
+                    os.path.getmtime(cmdfile) > os.path.getmtime(newest[bench]):
+                newest[bench] = cmdfile
+
+        commands = {}
+        for bench, cmdfile in newest.items():
+            exedir = os.path.join(os.path.dirname(cmdfile), '..', '..', 'exe')
+            for cwd, _, _, _, argv in parse_speccmds(cmdfile):
+                # a rebuild replaces the binary in exe/, the run directory
+                # gets the new copy when the benchmark runs again
+                build = lookup_build(builds, os.path.join(
+                    exedir, os.path.basename(argv[0])))
+                if build:
+                    fp = fingerprint(build, runtime, argv[1:])
+                    commands[fp] = bench, command_key(wrapper + argv)
+
+        path = journal_path(ctx, instance)
+        journaled = {(e.get('fingerprint'), e['start'])
+                     for e in read_journal(path)}
+        imported = 0
+        memo = load_memo(memo_path(ctx.paths.buildroot), commands)
+        with open(path, 'a') as f:
+            for fp, entries in sorted(memo.items()):
+                bench, key = commands[fp]
+                for entry in entries:
+                    if (fp, entry['start']) not in journaled:
+                        f.write(json.dumps(dict(entry, benchmark=bench,
+                                                cmd=key)) + '\n')
+                        imported += 1
+        if imported:
+            ctx.log.info('imported %d memoized runs into the journal of %s'
+                         % (imported, instance))
@@ -0,0 +1,158 @@
+import copy
+import glob
+import hashlib
+import json
+import os
+import shlex
+from infra.command import Command
+from infra.util import FatalError
+from util import iter_packages
+
+launcher_template = '''#!/bin/sh
+# generated by setup.py export-launchers
+# instance: {instance}
+# benchmark: {benchmark}
+# content-hash: {hash}
+{body}'''
+
+
+def dedup_path(value: str) -> str:
+    entries = []
+    for entry in value.split(':'):
+        if entry and entry not in entries:
+            entries.append(entry)
+    return ':'.join(entries)
+
+
+def parse_speccmds(path):
+    """
+    Parses a specinvoke command file into ``(cwd, stdin, stdout, stderr,
+    argv)`` tuples.
+    """
+    commands = []
+    cwd = os.path.dirname(path)
+    with open(path) as f:
+        for line in f:
+            args = shlex.split(line)
+            if not args:
+                continue
+            if args[0] == '-C':
+                cwd = args[1]
+                continue
+            if args[0] not in ('-i', '-o', '-e'):
+                # -N, -E, -r and other invocation options
+                continue
+
+            redirects = {}
+            while args and args[0] in ('-i', '-o', '-e'):
+                redirects[args[0]] = args[1]
+                args = args[2:]
+            commands.append((cwd, redirects.get('-i'), redirects.get('-o'),
+                             redirects.get('-e'), args))
+    return commands
+
+
+def resolve_runenv(ctx, instance):
+    """
+    Resolves the run environment like the run command does: installed
+    packages add to the environment first, then the instance prepares the
+    run. Returns the environment variables and the run wrapper.
+    """
+    saved = ctx.runenv, ctx.get('target_run_wrapper')
+    ctx.runenv = copy.deepcopy(ctx.runenv)
+    ctx.pop('target_run_wrapper', None)
+    try:
+        for package in iter_packages(instance.dependencies()):
+            package.install_env(ctx)
+        instance.prepare_run(ctx)
+
+        env = {}
+        for var, value in sorted(ctx.runenv.items()):
+            if isinstance(value, (list, tuple)):
+                value = ':'.join(str(v) for v in value)
+            value = str(value)
+            if var.endswith('PATH'):
+                value = dedup_path(value)
+            env[var] = value
+        return env, ctx.get('target_run_wrapper', '')
+    finally:
+        ctx.runenv, wrapper = saved
+        ctx.pop('target_run_wrapper', None)
+        if wrapper is not None:
+            ctx.target_run_wrapper = wrapper
+
+
+class ExportLaunchers(Command):
+    """
+    Writes a self-contained shell launcher per (instance, benchmark) for
+    SPEC run directories that were set up by an earlier run. The run
+    environment and run wrapper of an instance are resolved once, with
+    duplicate PATH-like entries removed. Repeated measurements can then run
+    the launchers directly instead of going through ``setup.py``.
+    """
+    name = 'export-launchers'
+    description = 'export frozen run launchers per instance and benchmark'
+
+    def add_args(self, parser):
+        parser.add_argument('specdir', metavar='SPECDIR',
+                help='SPEC installation with run directories set up')
+        parser.add_argument('instances', nargs='+', metavar='INSTANCE',
+                help='instances to export launchers for')
+        parser.add_argument('-b', '--benchmarks', nargs='+', default=[],
+                help='only export these benchmarks (default: all)')
+        parser.add_argument('-o', '--outdir', default='launchers',
+                help='output directory (default: ./launchers)')
+
+    def run(self, ctx):
+        index = {}
+
+        for name in ctx.args.instances:
+            instance = self.instances[name]
+            env, wrapper = resolve_runenv(ctx, instance)
+
+            pattern = os.path.join(ctx.args.specdir, 'benchspec', '*', '*',
+                                   'run', '*_%s.*' % name, 'speccmds.cmd')
+            cmdfiles = sorted(glob.glob(pattern))
+            if not cmdfiles:
+                raise FatalError('no run directories found for ' + name)
+
+            for cmdfile in cmdfiles:
+                benchmark = cmdfile.split(os.sep)[-4]
+                if ctx.args.benchmarks and \
+                        not any(b in benchmark for b in ctx.args.benchmarks):
+                    continue
+
+                path, digest = self.write_launcher(ctx, name, benchmark, env,
+                        wrapper, parse_speccmds(cmdfile))
+                index.setdefault(name, {})[benchmark] = \
+                    {'path': path, 'hash': digest}
+                ctx.log.info('exported ' + path)
+
+        os.makedirs(ctx.args.outdir, exist_ok=True)
+        with open(os.path.join(ctx.args.outdir, 'launchers.json'), 'w') as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+
+    def write_launcher(self, ctx, instance, benchmark, env, wrapper, commands):
+        lines = ['set -e']
+        lines += ['export %s=%s' % (var, shlex.quote(value))
+                  for var, value in env.items()]
+
+        for cwd, stdin, stdout, stderr, argv in commands:
+            cmd = (wrapper + ' ' if wrapper else '') + \
+                ' '.join(shlex.quote(arg) for arg in argv)
+            for op, redirect in (('<', stdin), ('>', stdout), ('2>', stderr)):
+                if redirect:
+                    cmd += ' %s %s' % (op, shlex.quote(redirect))
+            lines += ['cd %s' % shlex.quote(cwd), cmd]
+
+        body = '\n'.join(lines) + '\n'
+        digest = hashlib.sha256(body.encode()).hexdigest()
+
+        outdir = os.path.join(ctx.args.outdir, instance)
+        os.makedirs(outdir, exist_ok=True)
+        path = os.path.join(outdir, benchmark + '.sh')
+        with open(path, 'w') as f:
+            f.write(launcher_template.format(instance=instance,
+                    benchmark=benchmark, hash=digest, body=body))
+        os.chmod(path, 0o755)
+        return path, digest
@@ -0,0 +1,70 @@
+import json
+from infra.command import Command
+from tools.pass_stats import load_pass_stats
+
+
+class PassStats(Command):
+    """
+    Reports the per-pass compile time and LLVM statistics collected by
+    instances built with ``pass_stats=True``, per binary and per instance.
+    """
+    name = 'pass-stats'
+    description = 'report per-pass compile time and LLVM statistics'
+
+    def add_args(self, parser):
+        parser.add_argument('instances', nargs='*', metavar='INSTANCE',
+                help='instances to report (default: all with statistics)')
+        parser.add_argument('-b', '--binary', action='append', default=[],
+                help='only report these binaries (default: all)')
+        parser.add_argument('-n', '--top', type=int, default=10,
+                help='number of slowest passes to show (default: 10)')
+        parser.add_argument('-p', '--pass', dest='passes', action='append',
+                default=[], help='only show statistics of these passes')
+        parser.add_argument('--json', action='store_true',
+                help='print aggregated results as JSON')
+
+    def run(self, ctx):
+        results = load_pass_stats(ctx)
+
+        if ctx.args.instances:
+            results = {i: results.get(i, {}) for i in ctx.args.instances}
+        if ctx.args.binary:
+            results = {i: {b: r for b, r in binaries.items()
+                           if b in ctx.args.binary}
+                       for i, binaries in results.items()}
+
+        if ctx.args.json:
+            print(json.dumps(results, indent=2, sort_keys=True))
+            return
+
+        for instance, binaries in results.items():
+            total = {'time': {}, 'stats': {}}
+            for binary, result in binaries.items():
+                self._print_result(ctx, '%s / %s' % (instance, binary), result)
+                self._merge(total, result)
+            if len(binaries) > 1:
+                self._print_result(ctx, '%s / total' % instance, total)
+
+    def _merge(self, total, result):
+        for pass_name, wall in result['time'].items():
+            total['time'][pass_name] = total['time'].get(pass_name, 0) + wall
+        for pass_name, counters in result['stats'].items():
+            dest = total['stats'].setdefault(pass_name, {})
+            for name, value in counters.items():
+                dest[name] = dest.get(name, 0) + value
+
+    def _print_result(self, ctx, title, result):
+        print(title)
+        print('-' * len(title))
+
+        slowest = sorted(result['time'].items(), key=lambda kv: -kv[1])
+        for pass_name, wall in slowest[:ctx.args.top]:
+            print('  %10.3fs  %s' % (wall, pass_name))
+
+        for pass_name, counters in sorted(result['stats'].items()):
+            if ctx.args.passes and pass_name not in ctx.args.passes:
+                continue
+            for name, value in sorted(counters.items()):
+                print('  %10d  %s: %s' % (value, pass_name, name))
+
+        print()
@@ -0,0 +1,34 @@
+from infra.command import Command
+from infra.util import FatalError
+import tools.fetch as fetch
+
+
+class Prefetch(Command):
+    """
+    Downloads the sources of the selected instances into the download cache
+    (``<buildroot>/downloads``) with a bounded number of concurrent
+    downloads. Package ``fetch`` methods clone and copy from this cache and
+    wait for an in-flight download of the same source, so running this
+    command next to ``setup.py build`` overlaps downloads with the builds of
+    earlier packages.
+    """
+    name = 'prefetch'
+    description = 'download instance sources into the download cache'
+
+    def add_args(self, parser):
+        parser.add_argument('instances', nargs='*', metavar='INSTANCE',
+                help='instances to fetch sources for (default: all)')
+        parser.add_argument('-j', '--jobs', type=int, default=4,
+                help='maximum number of concurrent downloads (default 4)')
+
+    def run(self, ctx):
+        names = ctx.args.instances or list(self.instances.keys())
+        seen = set()
+        sources = []
+        for name in names:
+            sources += fetch.iter_sources(
+                self.instances[name].dependencies(), seen)
+
+        failed = fetch.prefetch(ctx, sources, ctx.args.jobs)
+        if failed:
+            raise FatalError('%d downloads failed' % failed)
@@ -0,0 +1,242 @@
+import json
+import math
+import os
+import shlex
+import subprocess
+import sys
+import time
+from infra.command import Command
+from infra.util import FatalError
+from tools.checkpoint import iteration_runtimes, read_journal
+from tools.fetch import GitSource, ensure_git
+from tools.results import config_iterations, connect, results_db
+from tools.stats import geomean, welch_test
+from .launchers import iter_packages
+from .results import ingest
+
+
+class Regress(Command):
+    """
+    Detects performance regressions of an instance after its source package
+    moved to a new commit, and bisects the commit range to find the commit
+    that caused them.
+
+    ``check`` compares the runs of the newest configuration of an instance
+    in the results database (see ``setup.py results``) with those of the
+    configuration before it, per benchmark, with Welch's t-test.
+    Configurations are ordered by their first run. It fails
+    when a benchmark got significantly slower, so it can gate upgrades.
+
+    ``bisect`` builds and runs the instance at commits between a good and a
+    bad commit with ``--commit <package>=<sha>``. Every commit is built in
+    its own package directory and measurements are cached in
+    ``<buildroot>/bisect``, so repeated bisections reuse earlier builds and
+    runs. Their runs are journaled in ``<buildroot>/bisect/journal``, not in
+    the journal of the instance. The commits are built under the instance's
+    own name, which replaces its target binaries and their recorded
+    fingerprints. So when the bisection ends or fails, the target is built
+    again with the packages at their configured commits.
+    """
+    name = 'regress'
+    description = 'detect and bisect performance regressions'
+
+    def add_args(self, parser):
+        subparsers = parser.add_subparsers(dest='action', metavar='ACTION')
+        subparsers.required = True
+
+        p = subparsers.add_parser('check',
+                help='compare the newest configuration with the previous one')
+        p.add_argument('instance', help='the instance')
+        p.add_argument('--alpha', type=float, default=0.01,
+                help='significance level (default: 0.01)')
+        p.add_argument('--threshold', type=float, default=0.02,
+                help='minimum relative slowdown to flag (default: 0.02)')
+
+        p = subparsers.add_parser('bisect',
+                help='find the commit that caused a regression')
+        p.add_argument('target', help='the target to run, e.g. spec2006')
+        p.add_argument('instance', help='the instance')
+        p.add_argument('package', help='class of the source package to '
+                'bisect, e.g. DangSanSource')
+        p.add_argument('good', help='a commit without the regression')
+        p.add_argument('bad', help='a commit with the regression')
+        p.add_argument('--benchmarks', nargs='+', required=True,
+                metavar='BENCHMARK', help='benchmarks to run')
+        p.add_argument('-i', '--iterations', type=int, default=3,
+                help='iterations per commit (default: 3)')
+        p.add_argument('--threshold', type=float, default=0.02,
+                help='minimum relative slowdown between the good and bad '
+                'commit (default: 0.02)')
+        p.add_argument('--run-args', default='',
+                help='extra arguments for setup.py run')
+
+    def run(self, ctx):
+        if ctx.args.action == 'check':
+            self.check(ctx)
+        else:
+            self.bisect(ctx)
+
+    def check(self, ctx):
+        db = connect(results_db(ctx.paths.buildroot))
+        with db:
+            ingest(ctx, db)
+
+        configs = list(config_iterations(db, ctx.args.instance).items())
+        if len(configs) < 2:
+            raise FatalError('need results of two configurations of %s, '
+                             'found %d' % (ctx.args.instance, len(configs)))
+        (old_id, old), (new_id, new) = configs[-2:]
+
+        regressions = []
+        for bench in sorted(set(old) & set(new)):
+            xs, ys = new[bench], old[bench]
+            if len(xs) < 2 or len(ys) < 2:
+                print('%-20s not enough iterations (%d, %d)' %
+                      (bench, len(xs), len(ys)))
+                continue
+            ratio = geomean(xs) / geomean(ys)
+            p = welch_test(xs, ys)
+            regressed = p < ctx.args.alpha and ratio > 1 + ctx.args.threshold
+            print('%-20s %.3f  p=%.4f%s' % (bench, ratio, p,
+                  '  REGRESSION' if regressed else ''))
+            if regressed:
+                regressions.append(bench)
+
+        for config_id in (old_id, new_id):
+            packages, = db.execute('SELECT packages FROM configs WHERE id = ?',
+                                   (config_id,)).fetchone()
+            print('config %d: %s' % (config_id, packages))
+
+        if regressions:
+            raise FatalError('%d benchmarks regressed: %s' %
+                             (len(regressions), ' '.join(regressions)))
+
+    def bisect(self, ctx):
+        instance = self.instances[ctx.args.instance]
+        package = next((p for p in iter_packages(instance.dependencies())
+                        if type(p).__name__ == ctx.args.package), None)
+        if package is None or not hasattr(package, 'fetch_sources'):
+            raise FatalError('%s does not depend on a source package %s' %
+                             (ctx.args.instance, ctx.args.package))
+
+        source = next(s for s in package.fetch_sources()
+                      if isinstance(s, GitSource))
+        mirror = ensure_git(ctx, GitSource(source.url, ctx.args.bad))
+
+        def git(*args):
+            return subprocess.check_output(['git', *args], cwd=mirror,
+                                           universal_newlines=True).strip()
+
+        good = git('rev-parse', ctx.args.good + '^{commit}')
+        commits = git('rev-list', '--reverse', '--ancestry-path',
+                      '%s..%s' % (good, ctx.args.bad)).split()
+        if not commits:
+            raise FatalError('%s is not an ancestor of %s' %
+                             (ctx.args.good, ctx.args.bad))
+
+        self.rebuilt = False
+        try:
+            self.search(ctx, git, good, commits)
+        finally:
+            if self.rebuilt:
+                self.restore(ctx)
+
+    def search(self, ctx, git, good, commits):
+        g = self.measure(ctx, good)
+        b = self.measure(ctx, commits[-1])
+        regressed = [bench for bench in ctx.args.benchmarks
+                     if b[bench] / g[bench] > 1 + ctx.args.threshold]
+        if not regressed:
+            raise FatalError('no benchmark is more than %.0f%% slower at %s' %
+                             (ctx.args.threshold * 100, ctx.args.bad))
+
+        # index of the last good and the first bad commit in commits
+        lo, hi = -1, len(commits) - 1
+        ctx.log.info('bisecting %d commits on %s' %
+                     (len(commits), ' '.join(regressed)))
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            m = self.measure(ctx, commits[mid])
+            # how far along the regression this commit is, 0 (good) to 1 (bad)
+            score = sum(math.log(m[bench] / g[bench]) /
+                        math.log(b[bench] / g[bench])
+                        for bench in regressed) / len(regressed)
+            ctx.log.info('%s: %.2f of the regression' % (commits[mid][:12],
+                                                         score))
+            if score > 0.5:
+                hi = mid
+            else:
+                lo = mid
+
+        print('first bad commit: ' + git('log', '-1', '--format=%H %s',
+                                          commits[hi]))
+        for bench in regressed:
+            print('  %-20s %.3f' % (bench, b[bench] / g[bench]))
+
+    def restore(self, ctx):
+        """
+        Builds the bisected benchmarks for the instance at the configured
+        commits again, replacing the binaries of the last bisected commit.
+        """
+        cmd = [sys.executable, os.path.join(ctx.paths.root, 'setup.py'),
+               'build', ctx.args.target, ctx.args.instance,
+               '--benchmarks', *ctx.args.benchmarks]
+        ctx.log.info('restoring the build of %s: %s' %
+                     (ctx.args.instance, ' '.join(cmd[1:])))
+        if subprocess.call(cmd):
+            ctx.log.error('rebuilding %s failed, its binaries are still those '
+                          'of a bisected commit' % ctx.args.instance)
+
+    def measure(self, ctx, commit):
+        """
+        Returns the geometric mean iteration time per benchmark of the
+        instance built at ``commit``, from the cache if it was measured
+        before.
+        """
+        cache_path = os.path.join(ctx.paths.buildroot, 'bisect',
+                                  '%s.json' % ctx.args.instance)
+        cache = {}
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                cache = json.load(f)
+
+        key = '%s=%s %d' % (ctx.args.package, commit, ctx.args.iterations)
+        times = cache.get(key, {})
+        missing = [b for b in ctx.args.benchmarks if b not in times]
+
+        if missing:
+            # runs at other commits stay out of the instance journal, so
+            # they do not end up in the results database and regress check
+            journal_dir = os.path.join(ctx.paths.buildroot, 'bisect',
+                                       'journal', commit)
+            journal = os.path.join(journal_dir, ctx.args.instance + '.jsonl')
+            start = time.time()
+            cmd = [sys.executable, os.path.join(ctx.paths.root, 'setup.py'),
+                   'run', '--journal-dir', journal_dir, ctx.args.target,
+                   ctx.args.instance, '--build',
+                   '--commit', '%s=%s' % (ctx.args.package, commit),
+                   '--benchmarks', *missing,
+                   '-i', str(ctx.args.iterations),
+                   *shlex.split(ctx.args.run_args)]
+            ctx.log.info('measuring %s: %s' % (commit[:12], ' '.join(cmd[1:])))
+            self.rebuilt = True
+            subprocess.call(cmd)
+
+            entries = [e for e in read_journal(journal)
+                       if e['start'] >= start]
+            for bench, runtimes in iteration_runtimes(entries).items():
+                if bench in missing and runtimes:
+                    times[bench] = runtimes
+
+            failed = [b for b in missing if b not in times]
+            if failed:
+                raise FatalError('no successful runs of %s at %s, build or '
+                                 'run failed; bisect the remaining range '
+                                 'manually' % (' '.join(failed), commit))
+
+            cache[key] = times
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path, 'w') as f:
+                json.dump(cache, f, indent=2)
+
+        return {bench: geomean(times[bench]) for bench in ctx.args.benchmarks}
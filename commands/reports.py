@@ -0,0 +1,61 @@
+import json
+import os
+from infra.command import Command
+from tools.reports import merge_indexes
+
+
+class Reports(Command):
+    """
+    Summarizes the report indexes written during runs of instances that are
+    constructed with ``dedup_reports=True``. Reports are merged across runs
+    by stack hash.
+    """
+    name = 'reports'
+    description = 'summarize deduplicated sanitizer reports'
+
+    def add_args(self, parser):
+        parser.add_argument('instances', nargs='*', metavar='INSTANCE',
+                help='instances to summarize (default: all with reports)')
+        parser.add_argument('-n', '--top', type=int, default=20,
+                help='number of reports to show per instance (default: 20)')
+        parser.add_argument('-e', '--examples', action='store_true',
+                help='print the first instance of every report')
+        parser.add_argument('--json', action='store_true',
+                help='print merged reports as JSON')
+
+    def run(self, ctx):
+        root = os.path.join(ctx.paths.buildroot, 'reports')
+        instances = ctx.args.instances or \
+            (sorted(os.listdir(root)) if os.path.exists(root) else [])
+        results = {}
+
+        for instance in instances:
+            indexdir = os.path.join(root, instance)
+            if not os.path.exists(indexdir):
+                ctx.log.warning('no reports for instance ' + instance)
+                continue
+
+            indexes = []
+            for filename in sorted(os.listdir(indexdir)):
+                with open(os.path.join(indexdir, filename)) as f:
+                    indexes.append(json.load(f))
+
+            results[instance] = merge_indexes(indexes)[:ctx.args.top]
+
+        if ctx.args.json:
+            print(json.dumps(results, indent=2))
+            return
+
+        for instance, reports in results.items():
+            print(instance)
+            print('-' * len(instance))
+            for entry in reports:
+                where = entry['location'] or \
+                    (entry['frames'][0] if entry['frames'] else '?')
+                print('  %8d  %3d runs  %s: %s' % (entry['count'],
+                      entry['runs'], entry['kind'], entry['message']))
+                print('                      at %s' % where)
+                if ctx.args.examples and entry['examples']:
+                    for line in entry['examples'][0].splitlines():
+                        print('        | ' + line)
+            print()
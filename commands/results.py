@@ -0,0 +1,95 @@
+import glob
+import json
+import os
+from infra.command import Command
+from tools.pass_stats import load_pass_stats
+from tools.results import (
+    connect, ingest_counters, ingest_journal, overhead, results_db
+)
+
+
+def ingest(ctx, db):
+    """
+    Adds new journal entries of all instances and the collected statistics
+    to the results database.
+    """
+    journals = glob.glob(os.path.join(ctx.paths.buildroot, 'journal',
+                                      '*.jsonl'))
+    for path in sorted(journals):
+        instance = os.path.basename(path)[:-len('.jsonl')]
+        added = ingest_journal(db, ctx.paths.buildroot, path, instance)
+        if added:
+            ctx.log.info('added %d runs of %s' % (added, instance))
+
+    ingest_counters(db, load_pass_stats(ctx))
+
+
+class Results(Command):
+    """
+    Maintains an indexed SQLite database of run results across sessions in
+    ``<buildroot>/results.sqlite``: runtime and peak memory of every run from
+    the run journals, the configuration each run was recorded with when it
+    started (parameters and the commit of each source package of the
+    instance) and the LLVM statistics collected with
+    ``pass_stats=True``. Queries ingest new journal entries first, so the
+    database is always up to date.
+    """
+    name = 'results'
+    description = 'query the results database'
+
+    def add_args(self, parser):
+        subparsers = parser.add_subparsers(dest='action', metavar='ACTION')
+        subparsers.required = True
+
+        subparsers.add_parser('ingest',
+                help='add new journal entries and statistics')
+
+        p = subparsers.add_parser('overhead',
+                help='overhead of an instance over a baseline over time')
+        p.add_argument('instance', help='the instance')
+        p.add_argument('baseline', help='the baseline instance')
+        p.add_argument('-b', '--benchmark',
+                help='only this benchmark (default: all and geomean)')
+        p.add_argument('--by', choices=('day', 'week', 'month', 'all'),
+                default='day', help='period to group runs by (default: day)')
+        p.add_argument('--json', action='store_true', help='print as JSON')
+
+        p = subparsers.add_parser('config',
+                help='configurations an instance was measured with')
+        p.add_argument('instance', help='the instance')
+
+        p = subparsers.add_parser('sql', help='run an SQL query')
+        p.add_argument('query', help='the query, e.g. "SELECT * FROM runs"')
+
+    def run(self, ctx):
+        db = connect(results_db(ctx.paths.buildroot))
+        with db:
+            ingest(ctx, db)
+
+        if ctx.args.action == 'overhead':
+            by = {'day': '%Y-%m-%d', 'week': '%Y-W%W', 'month': '%Y-%m',
+                  'all': 'all'}[ctx.args.by]
+            rows = overhead(db, ctx.args.instance, ctx.args.baseline,
+                            ctx.args.benchmark, by)
+            if ctx.args.json:
+                print(json.dumps([{'benchmark': b, 'period': p, 'ratio': r}
+                                  for b, p, r in rows], indent=2))
+            else:
+                for bench, period, ratio in rows:
+                    print('%-20s %-10s %.3f' % (bench, period, ratio))
+
+        elif ctx.args.action == 'config':
+            for params, packages, first_seen in db.execute(
+                    'SELECT params, packages, datetime(first_seen, '
+                    '\'unixepoch\') FROM configs WHERE instance = ? '
+                    'ORDER BY first_seen', (ctx.args.instance,)):
+                print(first_seen)
+                print('  params:   ' + params)
+                print('  packages: ' + packages)
+
+        elif ctx.args.action == 'sql':
+            cursor = db.execute(ctx.args.query)
+            if cursor.description:
+                print('\t'.join(col[0] for col in cursor.description))
+            for row in cursor:
+                print('\t'.join(str(v) for v in row))
@@ -0,0 +1,147 @@
+import json
+import os
+import time
+from infra.command import Command
+from infra.util import FatalError
+from tools.machine import (
+    apply_settings, audit_path, calibrate, load_json, machine_state,
+    prepare_process, run_settings_path
+)
+from tools.stats import mean, variance
+
+# settings that give the most stable measurements
+recommended = {
+    'governor': 'performance',
+    'turbo': 'off',
+    'thp': 'never',
+    'aslr': '0',
+}
+
+
+class Stabilize(Command):
+    """
+    Checks the machine settings that make measurements noisy (CPU frequency
+    governor, turbo boost, transparent huge pages, ASLR, isolated CPUs) and
+    optionally changes them. It also configures per-run CPU pinning and
+    ASLR, which the run journal wrapper applies to every run and records
+    with the machine state in each journal entry, and prewarming of the page
+    cache. Prewarming (``--stage prewarm``) is done by journaled instances
+    once per benchmark before runspec starts, so it is not part of any
+    measured runtime, journaled or reported by SPEC. Copying run
+    directories to a tmpfs is not offered, since it could only happen inside
+    the time SPEC measures.
+
+    ``--audit`` runs a calibration workload with the per-run settings and
+    fails if the coefficient of variation of its runtime is too high. The
+    result is recorded with every following run, so noisy sessions can be
+    recognized in the results later.
+    """
+    name = 'stabilize'
+    description = 'check and stabilize the benchmark environment'
+
+    def add_args(self, parser):
+        parser.add_argument('--apply', action='store_true',
+                help='apply the recommended settings (needs root), '
+                'saving the current ones for --restore')
+        parser.add_argument('--restore', action='store_true',
+                help='restore the settings saved by --apply')
+        parser.add_argument('--pin', metavar='CPUS',
+                help='pin runs to these CPUs, e.g. 2-5 (use isolated CPUs '
+                'if there are any); "none" to stop pinning')
+        parser.add_argument('--aslr', choices=('on', 'off'),
+                help='enable or disable ASLR per run, without changing the '
+                'system setting')
+        parser.add_argument('--stage', choices=('off', 'prewarm'),
+                help='before runspec starts, read the inputs, binaries and '
+                'run directories of the benchmarks into the page cache '
+                '(prewarm)')
+        parser.add_argument('--audit', action='store_true',
+                help='run the noise audit')
+        parser.add_argument('--runs', type=int, default=10,
+                help='calibration runs of the audit (default: 10)')
+        parser.add_argument('--max-cv', type=float, default=0.01,
+                help='maximum coefficient of variation (default: 0.01)')
+
+    def run(self, ctx):
+        buildroot = ctx.paths.buildroot
+        saved_path = os.path.join(buildroot, 'machine', 'saved.json')
+        os.makedirs(os.path.dirname(saved_path), exist_ok=True)
+
+        if ctx.args.apply:
+            if not os.path.exists(saved_path):
+                with open(saved_path, 'w') as f:
+                    json.dump(machine_state(), f, indent=2)
+            self.apply(ctx, recommended)
+
+        if ctx.args.restore:
+            saved = load_json(saved_path)
+            if not saved:
+                raise FatalError('no saved settings to restore')
+            self.apply(ctx, saved)
+            os.remove(saved_path)
+
+        settings = load_json(run_settings_path(buildroot))
+        if ctx.args.pin:
+            settings['cpus'] = None if ctx.args.pin == 'none' else ctx.args.pin
+        if ctx.args.aslr:
+            settings['no_aslr'] = ctx.args.aslr == 'off'
+        if ctx.args.stage:
+            settings['stage'] = None if ctx.args.stage == 'off' \
+                else ctx.args.stage
+        if ctx.args.pin or ctx.args.aslr or ctx.args.stage:
+            with open(run_settings_path(buildroot), 'w') as f:
+                json.dump(settings, f, indent=2)
+
+        self.report(ctx, machine_state(), settings)
+
+        if ctx.args.audit:
+            self.audit(ctx, settings)
+
+    def apply(self, ctx, state):
+        errors = apply_settings(
+            governor=state.get('governor', '').split(',')[0] or None,
+            turbo={'on': True, 'off': False}.get(state.get('turbo')),
+            thp=state.get('thp'),
+            aslr=int(state['aslr']) if state.get('aslr') else None)
+        for error in errors:
+            ctx.log.error(error)
+
+    def report(self, ctx, state, settings):
+        for name, value in state.items():
+            want = recommended.get(name)
+            flag = '' if want is None or value == want or value is None \
+                else '  (recommended: %s)' % want
+            print('%-11s %s%s' % (name, value, flag))
+
+        if not state['isolated']:
+            print('no isolated CPUs, boot with isolcpus=<cpus> to reduce '
+                  'interference')
+        elif not settings.get('cpus'):
+            print('runs are not pinned, use --pin %s' % state['isolated'])
+        print('per-run:    cpus=%s aslr=%s stage=%s' %
+              (settings.get('cpus') or 'all',
+               'off' if settings.get('no_aslr') else 'on',
+               settings.get('stage') or 'off'))
+
+    def audit(self, ctx, settings):
+        prepare_process(settings)
+        times = calibrate(ctx.args.runs)
+        cv = variance(times) ** 0.5 / mean(times)
+
+        result = {
+            'time': time.time(),
+            'runs': len(times),
+            'mean': mean(times),
+            'cv': cv,
+            'ok': cv <= ctx.args.max_cv,
+            'state': machine_state(),
+            'settings': settings,
+        }
+        with open(audit_path(ctx.paths.buildroot), 'w') as f:
+            json.dump(result, f, indent=2)
+
+        print('audit:      mean %.3fs, cv %.2f%% over %d runs' %
+              (result['mean'], cv * 100, len(times)))
+        if not result['ok']:
+            raise FatalError('the machine is too noisy: cv %.2f%% > %.2f%%' %
+                             (cv * 100, ctx.args.max_cv * 100))
@@ -0,0 +1,167 @@
+import glob
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from infra.command import Command
+from infra.util import FatalError
+from tools.checkpoint import iteration_runtimes, read_journal
+from tools.machine import load_json, parse_cpus, run_settings_path
+from tools.schedule import estimate, longest_first, makespan, timeout
+
+
+class Sweep(Command):
+    """
+    Runs every (instance, benchmark) of a sweep as a separate ``setup.py
+    run`` job on a pool of workers, longest job first. Durations are
+    estimated from the run journals, or for instances without history from
+    the fastest instance that ran the benchmark times the
+    ``expected_slowdown`` of the instance (e.g. 30 for Memcheck), so slow
+    instances start first instead of forming a long tail. Each job gets a
+    timeout scaled from its own estimate, instead of a global one.
+
+    With ``-j`` > 1, the CPUs runs are pinned to (``setup.py stabilize
+    --pin``, or all available CPUs) are split between the workers, so that
+    concurrent jobs do not compete for the same CPUs. They still share
+    caches and memory bandwidth.
+    """
+    name = 'sweep'
+    description = 'run benchmarks longest first with adaptive timeouts'
+
+    def add_args(self, parser):
+        parser.add_argument('target', help='the target to run, e.g. spec2006')
+        parser.add_argument('instances', nargs='+', metavar='INSTANCE',
+                help='instances to run')
+        parser.add_argument('--benchmarks', nargs='+', required=True,
+                metavar='BENCHMARK', help='benchmarks to run')
+        parser.add_argument('-i', '--iterations', type=int, default=1,
+                help='iterations per job (default: 1)')
+        parser.add_argument('-j', '--jobs', type=int, default=1,
+                help='number of jobs to run in parallel (default: 1)')
+        parser.add_argument('--timeout-factor', type=float, default=3.0,
+                help='timeout as a multiple of the estimate (default: 3)')
+        parser.add_argument('--timeout-margin', type=float, default=600,
+                help='seconds added to every timeout (default: 600)')
+        parser.add_argument('--max-timeout', type=float,
+                help='upper bound on timeouts in seconds (default: none)')
+        parser.add_argument('--no-timeout', action='store_true',
+                help='never kill jobs')
+        parser.add_argument('--run-args', default='',
+                help='extra arguments for setup.py run')
+        parser.add_argument('-n', '--dry-run', action='store_true',
+                help='only print the schedule')
+
+    def run(self, ctx):
+        history = {}
+        for path in glob.glob(os.path.join(ctx.paths.buildroot, 'journal',
+                                           '*.jsonl')):
+            instance = os.path.basename(path)[:-len('.jsonl')]
+            history[instance] = iteration_runtimes(read_journal(path))
+
+        jobs = []
+        for instance in ctx.args.instances:
+            if instance not in self.instances:
+                raise FatalError('unknown instance ' + instance)
+            slowdown = getattr(self.instances[instance], 'expected_slowdown',
+                               1.0)
+            for bench in ctx.args.benchmarks:
+                runtime, source = estimate(history, instance, bench, slowdown)
+                jobs.append((instance, bench, source,
+                             runtime * ctx.args.iterations))
+
+        ordered = longest_first(jobs)
+        for instance, bench, source, duration in ordered:
+            print('%-20s %-20s %8.0fs (%s)' % (instance, bench, duration,
+                                               source))
+        print('expected duration: %.0fs, %.0fs in the given order' %
+              (makespan([job[-1] for job in ordered], ctx.args.jobs),
+               makespan([job[-1] for job in jobs], ctx.args.jobs)))
+
+        if ctx.args.dry_run:
+            return
+
+        # each worker takes a CPU group for a job and returns it afterwards
+        groups = Queue()
+        for group in self.cpu_groups(ctx):
+            groups.put(group)
+
+        def run(job):
+            cpus = groups.get()
+            try:
+                return self.run_job(ctx, logdir, cpus, *job)
+            finally:
+                groups.put(cpus)
+
+        logdir = os.path.join(ctx.paths.buildroot, 'sweep')
+        os.makedirs(logdir, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=ctx.args.jobs) as pool:
+            results = list(pool.map(run, ordered))
+
+        failed = [r for r in results if r[2] != 'ok']
+        for instance, bench, status, elapsed, duration in results:
+            print('%-20s %-20s %-8s %8.0fs (estimated %.0fs)' %
+                  (instance, bench, status, elapsed, duration))
+        if failed:
+            raise FatalError('%d of %d jobs failed or timed out' %
+                             (len(failed), len(results)))
+
+    def cpu_groups(self, ctx):
+        """
+        Splits the CPUs that runs are pinned to into a group per worker, or
+        returns a single group of None (no pinning) for one worker.
+        """
+        if ctx.args.jobs == 1:
+            return [None]
+
+        settings = load_json(run_settings_path(ctx.paths.buildroot))
+        cpus = parse_cpus(settings['cpus']) if settings.get('cpus') else \
+            sorted(os.sched_getaffinity(0))
+        if len(cpus) < ctx.args.jobs:
+            raise FatalError('cannot give %d workers their own CPUs out of '
+                             '%d, use a lower -j or pin to more CPUs' %
+                             (ctx.args.jobs, len(cpus)))
+        ctx.log.warning('running %d jobs concurrently, they share caches and '
+                        'memory bandwidth' % ctx.args.jobs)
+        size = len(cpus) // ctx.args.jobs
+        return [cpus[i * size:(i + 1) * size] for i in range(ctx.args.jobs)]
+
+    def run_job(self, ctx, logdir, cpus, instance, bench, source, duration):
+        cmd = [sys.executable, os.path.join(ctx.paths.root, 'setup.py'),
+               'run', '--journal', ctx.args.target, instance,
+               '--benchmarks', bench, '-i', str(ctx.args.iterations),
+               *shlex.split(ctx.args.run_args)]
+        limit = None if ctx.args.no_timeout else \
+            timeout(duration, ctx.args.timeout_factor,
+                    ctx.args.timeout_margin, ctx.args.max_timeout)
+
+        ctx.log.info('starting %s %s (timeout %s)' %
+                     (instance, bench, '%.0fs' % limit if limit else 'none'))
+        start = time.time()
+        logpath = os.path.join(logdir, '%s.%s.log' % (instance, bench))
+        with open(logpath, 'w') as log:
+            # own session, so that a timeout kills runspec and the benchmark;
+            # the journal wrapper pins runs within the inherited CPUs
+            proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT,
+                                    start_new_session=True,
+                                    preexec_fn=cpus and
+                                    (lambda: os.sched_setaffinity(0, cpus)))
+            try:
+                status = 'ok' if proc.wait(limit) == 0 else 'failed'
+            except subprocess.TimeoutExpired:
+                os.killpg(proc.pid, signal.SIGTERM)
+                try:
+                    proc.wait(30)
+                except subprocess.TimeoutExpired:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                    proc.wait()
+                status = 'timeout'
+
+        elapsed = time.time() - start
+        if status != 'ok':
+            ctx.log.error('%s %s: %s after %.0fs, see %s' %
+                          (instance, bench, status, elapsed, logpath))
+        return instance, bench, status, elapsed, duration
@@ -0,0 +1,40 @@
+import os
+import sys
+from infra.command import Command
+from tools.symbolizer import Symbolizer, symbolize_lines
+
+
+class Symbolize(Command):
+    """
+    Symbolizes sanitizer reports offline. Instances that are constructed
+    with ``offline_symbolize=True`` run with symbolization disabled and
+    print module offsets instead, which this command resolves in batch.
+    """
+    name = 'symbolize'
+    description = 'symbolize sanitizer reports offline'
+
+    def add_args(self, parser):
+        parser.add_argument('logs', nargs='+', metavar='LOG',
+                help='report logs to symbolize')
+        parser.add_argument('-i', '--in-place', action='store_true',
+                help='rewrite the logs instead of printing to stdout')
+        parser.add_argument('--symbolizer', metavar='PATH',
+                help='llvm-symbolizer binary (default: from PATH)')
+        parser.add_argument('--cache-dir', metavar='DIR',
+                help='symbol cache directory '
+                     '(default: <buildroot>/symbol-cache)')
+
+    def run(self, ctx):
+        cache_dir = ctx.args.cache_dir or \
+            os.path.join(ctx.paths.buildroot, 'symbol-cache')
+
+        with Symbolizer(cache_dir, ctx.args.symbolizer) as symbolizer:
+            for log in ctx.args.logs:
+                with open(log, errors='replace') as f:
+                    if not ctx.args.in_place:
+                        sys.stdout.writelines(symbolize_lines(f, symbolizer))
+                        continue
+                    with open(log + '.tmp', 'w') as out:
+                        out.writelines(symbolize_lines(f, symbolizer))
+                os.replace(log + '.tmp', log)
+                ctx.log.info('symbolized ' + log)
@@ -0,0 +1,70 @@
+import json
+from infra.command import Command
+import tools.toolchain as toolchain
+
+
+def walk(deps, seen):
+    for package in deps or ():
+        if package.ident() not in seen:
+            seen.add(package.ident())
+            walk(package.dependencies(), seen)
+
+
+class Toolchain(Command):
+    """
+    Resolves the build tool versions (``Make``, ``CMake``, ``AutoConf``,
+    ``M4``) declared with :func:`tools.toolchain.tool` by the selected
+    instances to a minimal compatible set. It reports which tool builds that
+    eliminates, and pins the chosen versions in ``toolchain.json`` for
+    subsequent builds.
+    """
+    name = 'toolchain'
+    description = 'consolidate build tool versions across instances'
+
+    def add_args(self, parser):
+        parser.add_argument('instances', nargs='*', metavar='INSTANCE',
+                help='instances to consolidate (default: all)')
+        parser.add_argument('-n', '--dry-run', action='store_true',
+                help='only report, do not write toolchain.json')
+        parser.add_argument('--clear', action='store_true',
+                help='remove all pins, use the preferred versions again')
+
+    def run(self, ctx):
+        if ctx.args.clear:
+            self._write_pins(ctx, {})
+            return
+
+        names = ctx.args.instances or list(self.instances.keys())
+
+        # collect requirements with the preferred versions, without pins
+        toolchain._pins = {}
+        toolchain.requirements.clear()
+        for name in names:
+            toolchain.current_requester = name
+            walk(self.instances[name].dependencies(), set())
+        toolchain.current_requester = None
+
+        reqs = [r for rs in toolchain.requirements.values() for r in rs]
+        chosen = toolchain.resolve(reqs)
+
+        pins = {}
+        for tool, versions in sorted(chosen.items()):
+            requested = sorted({v for t, v, _ in reqs if t == tool},
+                               key=toolchain.parse_version)
+            eliminated = [v for v in requested if v not in versions]
+            print('%-10s %s' % (tool, ', '.join(versions)))
+            for version in eliminated:
+                users = sorted(r for r, rs in toolchain.requirements.items()
+                               if any(t == tool and v == version
+                                      for t, v, _ in rs))
+                print('           eliminates %s %s (%s)' %
+                      (tool, version, ', '.join(users)))
+            pins[tool] = versions
+
+        if not ctx.args.dry_run:
+            self._write_pins(ctx, pins)
+
+    def _write_pins(self, ctx, pins):
+        with open(toolchain.pins_path, 'w') as f:
+            json.dump(pins, f, indent=2, sort_keys=True)
+        ctx.log.info('wrote %d pins to %s' % (len(pins), toolchain.pins_path))
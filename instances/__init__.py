@@ -1,10 +1,159 @@
-from .clang import ClangCFI, MSan, UbSan
-from .dangsan import DangSan, DangSanBaseline
-from .deltapointers import DeltaTags
-from .hextype import HexType, HexTypeBaseline
-from .hexvasan import HexVasan
-from .lowfat import LowFat, LowFatBaseline
-from .markus import MarkUs
-from .memcheck import Memcheck
-from .typesan import TypeSan, TypeSanBaseline
-from .ffmalloc import FFMalloc
\ No newline at end of file
+import importlib
+import os
+import time
+import infra
+from tools.buildtime import install_build_timer
+from tools.machine import load_json, run_settings_path
+from tools.memo import record_build
+from tools.staging import prewarm, spec_run_paths
+from tools.results import package_commit, record_config, simple_params
+import util
+
+# instance class -> module in this package that defines it; modules are only
+# imported when an instance of one of their classes is used
+index = {
+    'ClangCFI': 'clang',
+    'MSan': 'clang',
+    'UbSan': 'clang',
+    'DangSan': 'dangsan',
+    'DangSanBaseline': 'dangsan',
+    'DeltaTags': 'deltapointers',
+    'FFMalloc': 'ffmalloc',
+    'HexType': 'hextype',
+    'HexTypeBaseline': 'hextype',
+    'HexVasan': 'hexvasan',
+    'LowFat': 'lowfat',
+    'LowFatBaseline': 'lowfat',
+    'MarkUs': 'markus',
+    'Memcheck': 'memcheck',
+    'TypeSan': 'typesan',
+    'TypeSanBaseline': 'typesan',
+}
+
+
+def load(cls: str) -> type:
+    """
+    Imports and returns an instance class by name, e.g. ``'DangSan'``.
+    """
+    if cls not in index:
+        raise infra.util.FatalError('unknown instance class ' + cls)
+    module = importlib.import_module('.' + index[cls], __name__)
+    return getattr(module, cls)
+
+
+class Journaled(infra.Instance):
+    """
+    Wraps an instance so that its runs with ``--journal`` are recorded in the
+    run journal and the memo store (see ``setup.py journal``), and its
+    compiler invocations in builds with ``--time-builds`` are timed (see
+    ``setup.py buildtime``). Use this for
+    instances that are constructed directly, e.g. the infra ``Clang``
+    baselines; :class:`LazyInstance` already does it.
+
+    :name: the name of the wrapped instance
+    :param instance: the instance to wrap
+    """
+    def __init__(self, instance: infra.Instance):
+        self.name = instance.name
+        self._instance = instance
+
+    @property
+    def instance(self) -> infra.Instance:
+        return self._instance
+
+    # attributes of the wrapper itself, never forwarded to the instance
+    _own_attrs = ('_instance',)
+
+    def __getattr__(self, attr):
+        # only called for attributes that are not set on the wrapper
+        if attr.startswith('__') or attr in self._own_attrs:
+            raise AttributeError(attr)
+        return getattr(self.instance, attr)
+
+    def dependencies(self):
+        return self.instance.dependencies()
+
+    def configure(self, ctx):
+        self.instance.configure(ctx)
+        if util.time_builds:
+            install_build_timer(ctx, self.name)
+        ctx.hooks.post_build += [self._record_build]
+
+    def _record_build(self, ctx, binary):
+        # fingerprinted once per build, so that runs only look it up
+        record_build(ctx.paths.buildroot, self.name, binary)
+
+    def prepare_run(self, ctx):
+        self.instance.prepare_run(ctx)
+
+        # outermost wrapper, so that runs are journaled for setup.py journal
+        if util.journal_runs:
+            config = self.record_config(ctx)
+            util.add_run_wrapper(ctx, util.journal_wrapper(ctx, self.name,
+                                                           config))
+
+        settings = load_json(run_settings_path(ctx.paths.buildroot))
+        if settings.get('stage') == 'prewarm' and \
+                getattr(ctx.args, 'command', None) == 'run':
+            self.prewarm(ctx)
+        elif settings.get('stage') == 'tmpfs':
+            ctx.log.warning('tmpfs staging is no longer supported, use '
+                            'setup.py stabilize --stage prewarm or off')
+
+    def prewarm(self, ctx):
+        """
+        Reads the inputs, binaries and run directories of the benchmarks
+        about to run into the page cache, once per benchmark and before
+        runspec starts, so the time it takes is not part of any measured
+        runtime (see ``setup.py stabilize --stage prewarm``).
+        """
+        specdir = os.path.join(ctx.paths.targets, ctx.args.target, 'install')
+        paths = spec_run_paths(specdir, getattr(ctx.args, 'benchmarks', None),
+                               self.name)
+        for bench, files in sorted(paths.items()):
+            start = time.time()
+            size = prewarm(files)
+            ctx.log.info('prewarmed %s: %d MiB in %.1fs' %
+                         (bench, size >> 20, time.time() - start))
+
+    def record_config(self, ctx) -> str:
+        """
+        Records the configuration the instance runs with now, i.e. its
+        parameters and the commit of each source package, for the results
+        database. Returns its id, which the journal stores with each run.
+        """
+        packages = {package.ident(): package_commit(ctx, package)
+                    for package in util.iter_packages(self.dependencies())}
+        return record_config(ctx.paths.buildroot,
+                             simple_params(self.instance), packages)
+
+
+class LazyInstance(Journaled):
+    """
+    Placeholder for an instance that is only imported and constructed when
+    it is used, so that ``setup.py --help`` and argument completion do not
+    pay for importing and constructing every instance and its packages.
+
+    :name: given by ``name``, must match the name of the constructed instance
+    :param name: the instance name
+    :param cls: name of the instance class (see ``index``)
+    :param args: constructor arguments
+    :param kwargs: constructor keyword arguments
+    """
+    _own_attrs = Journaled._own_attrs + ('cls', 'args', 'kwargs')
+
+    def __init__(self, name: str, cls: str, *args, **kwargs):
+        self.name = name
+        self.cls = cls
+        self.args = args
+        self.kwargs = kwargs
+        self._instance = None
+
+    @property
+    def instance(self) -> infra.Instance:
+        if self._instance is None:
+            self._instance = load(self.cls)(*self.args, **self.kwargs)
+            assert self._instance.name == self.name, \
+                'instance %s is registered as %s' % (self._instance.name,
+                                                     self.name)
+        return self._instance
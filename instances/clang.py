@@ -1,7 +1,10 @@
+import os
 from typing import Optional
 from infra.instances.clang import Clang
 from infra.util import param_attrs
 from packages.instr_libcxx import InstrumentedLibcxx
+from tools.link_limiter import limit_link_jobs
+from util import add_run_wrapper, add_sanitizer_options, report_filter_wrapper
 
 
 class MSan(Clang):
@@ -17,11 +20,22 @@ class MSan(Clang):
     :param use_after_dtor: toggle use-after-destruction detection
     :param debug: toggle debugging options
     :param ignorelist_path: absolute path to ignorelist (default: None)
+    :param offline_symbolize: print module offsets instead of symbolizing
+                              reports at runtime (see ``setup.py symbolize``)
+    :param dedup_reports: deduplicate reports while running and write a
+                          report index per run (see ``setup.py reports``)
+    :param report_log_limit: maximum stderr size per run with ``dedup_reports``
     """
+    # typical slowdown over native, for scheduling runs without history
+    # (see setup.py sweep)
+    expected_slowdown = 3.0
+
     @param_attrs
     def __init__(self, llvm, tail_call_elim=True, origin_tracking_level=0,
                  use_after_dtor=True, debug=False,
-                 ignorelist_path: Optional[str] = None):
+                 ignorelist_path: Optional[str] = None,
+                 offline_symbolize=False,
+                 dedup_reports=False, report_log_limit=64 << 20):
         assert llvm.compiler_rt, 'Msan needs LLVM with runtime support'
         assert origin_tracking_level in (
             0, 1, 2), 'origin tracking should be 0, 1 or 2'
@@ -69,7 +83,14 @@ class MSan(Clang):
 
     def prepare_run(self, ctx):
         if not self.use_after_dtor:
-            ctx.runenv.MSAN_OPTIONS = 'poison_in_dtor=0'
+            add_sanitizer_options(ctx, 'MSAN_OPTIONS', poison_in_dtor=0)
+
+        if self.offline_symbolize:
+            add_sanitizer_options(ctx, 'MSAN_OPTIONS', symbolize=0)
+
+        if self.dedup_reports:
+            add_run_wrapper(ctx, report_filter_wrapper(
+                ctx, self.name, self.report_log_limit))
 
 
 class ClangCFI(Clang):
@@ -87,12 +108,24 @@ class ClangCFI(Clang):
     :param thin_lto: toggle thinLTO. if it set to false ``-flto`` is used
     :param no_check: list cfi schemes not to check
     :param ignorelist_path: absolute path to ignorelist (default: None)
+    :param lto_jobs: number of parallel ThinLTO backends, or of codegen
+                     partitions for full LTO (default: None, linker default)
+    :param lto_cache: keep a persistent ThinLTO cache per instance in
+                      ``<buildroot>/lto-cache/<name>`` (requires ``thin_lto``)
+    :param lto_cache_policy: LLVM cache pruning policy for the ThinLTO cache
+    :param dedup_reports: deduplicate reports while running and write a
+                          report index per run (see ``setup.py reports``)
+    :param report_log_limit: maximum stderr size per run with ``dedup_reports``
     """
     @param_attrs
     def __init__(self, llvm, check=['cfi'], no_trap=['cfi'], recover=['all'],
                  visibility='hidden', thin_lto=False, no_check: Optional[str] = None,
-                 ignorelist_path: Optional[str] = None):
+                 ignorelist_path: Optional[str] = None,
+                 lto_jobs: Optional[int] = None, lto_cache=False,
+                 lto_cache_policy='prune_interval=1h:prune_after=168h:cache_size=10%',
+                 dedup_reports=False, report_log_limit=64 << 20):
         assert llvm.compiler_rt, 'ClangCFI needs LLVM with runtime support'
+        assert thin_lto or not lto_cache, 'LTO cache requires ThinLTO'
         super().__init__(llvm, lto=True)
 
     @property
@@ -123,13 +156,35 @@ class ClangCFI(Clang):
             flags += ['-fsanitize-blacklist=%s' % self.ignorelist_path]
 
         if self.thin_lto:
+            ctx.cflags += ['-flto=thin']
+            ctx.cxxflags += ['-flto=thin']
             ctx.ldflags += ['-flto=thin']
         else:
             ctx.ldflags += ['-flto']
 
+        if self.lto_jobs:
+            opt = 'jobs' if self.thin_lto else 'lto-partitions'
+            ctx.ldflags += ['-Wl,-plugin-opt,%s=%d' % (opt, self.lto_jobs)]
+
+        if self.lto_cache:
+            cache_dir = os.path.join(ctx.paths.buildroot, 'lto-cache', self.name)
+            os.makedirs(cache_dir, exist_ok=True)
+            ctx.ldflags += ['-Wl,-plugin-opt,cache-dir=' + cache_dir]
+            if self.lto_cache_policy:
+                ctx.ldflags += ['-Wl,-plugin-opt,cache-policy=' +
+                                self.lto_cache_policy]
+
         # why do i need to link the ubsan here?
         ctx.ldflags += ['-fsanitize=undefined']
 
+        # LTO links need several GB each, limit how many run concurrently
+        limit_link_jobs(ctx)
+
+    def prepare_run(self, ctx):
+        if self.dedup_reports:
+            add_run_wrapper(ctx, report_filter_wrapper(
+                ctx, self.name, self.report_log_limit))
+
 
 class UbSan(Clang):
     """
@@ -144,12 +199,19 @@ class UbSan(Clang):
     :param no_recover: list of checks that exit the program
     :param debug: toggle debugging options
     :param ignorelist_path: absolute path to ignorelist (default: None)
+    :param offline_symbolize: print module offsets instead of symbolizing
+                              reports at runtime (see ``setup.py symbolize``)
+    :param dedup_reports: deduplicate reports while running and write a
+                          report index per run (see ``setup.py reports``)
+    :param report_log_limit: maximum stderr size per run with ``dedup_reports``
     """
     @param_attrs
     def __init__(self, llvm, check=['undefined'], minimal_runtime=False,
                  no_check: Optional[str] = None, trap: Optional[str] = None,
                  no_recover: Optional[str] = None, debug=False,
-                 ignorelist_path: Optional[str] = None):
+                 ignorelist_path: Optional[str] = None,
+                 offline_symbolize=False,
+                 dedup_reports=False, report_log_limit=64 << 20):
         assert llvm.compiler_rt, 'UbSan needs LLVM with runtime support'
         assert check, 'No check flags are specified'
 
@@ -193,4 +255,11 @@ class UbSan(Clang):
 
     def prepare_run(self, ctx):
         if self.debug:
-            ctx.runenv.UBSAN_OPTIONS = 'print_stacktrace=1'
+            add_sanitizer_options(ctx, 'UBSAN_OPTIONS', print_stacktrace=1)
+
+        if self.offline_symbolize:
+            add_sanitizer_options(ctx, 'UBSAN_OPTIONS', symbolize=0)
+
+        if self.dedup_reports:
+            add_run_wrapper(ctx, report_filter_wrapper(
+                ctx, self.name, self.report_log_limit))
@@ -1,18 +1,24 @@
 import os
 import shutil
+from typing import Optional
 import infra
 from infra.packages.cmake import CMake
 from infra.packages.gnu import (
     M4, AutoConf, AutoMake, Bash, BinUtils, CoreUtils, LibTool, Make
 )
 from infra.packages.gperftools import LibUnwind
-from util import add_env_var, git_fetch
+from tools.checkpoint import clear_steps, step
+from tools.fetch import GitSource, fetch_git
+from tools.pass_stats import enable_pass_stats
+from tools.link_limiter import limit_link_jobs, link_limiter_cmake_flags
+from tools.toolchain import tool
+from util import add_env_var, source_commit
 
 
 class DangSanSource(infra.Package):
 
     def __init__(self, commit='master'):
-        self.commit = commit
+        self.commit = source_commit(self, commit)
         self.binutils = BinUtils('2.30')
         self.libunwind = LibUnwind('1.2-rc1')
 
@@ -21,9 +27,12 @@ class DangSanSource(infra.Package):
 
     def dependencies(self):
         yield Bash('4.3')
-        yield Make('4.3')
-        yield AutoMake('1.15.1', AutoConf('2.68', M4('1.4.18')), LibTool('2.4.6'))
-        yield CMake('3.4.1')
+        yield tool(Make, '4.3', '>=4.1')
+        yield AutoMake('1.15.1',
+                       tool(AutoConf, '2.68', '>=2.68,<2.70',
+                            tool(M4, '1.4.18', '>=1.4.18')),
+                       LibTool('2.4.6'))
+        yield tool(CMake, '3.4.1', '>=3.4.1,<3.15')
         yield CoreUtils('8.22')
         yield self.libunwind
         yield self.binutils
@@ -31,12 +40,16 @@ class DangSanSource(infra.Package):
     def is_fetched(self, ctx):
         return os.path.exists('src')
 
+    def fetch_sources(self):
+        yield GitSource('https://github.com/vusec/dangsan.git', self.commit)
+        yield GitSource('git@github.com:llvm/llvm-project.git', '43dff0c03324')
+
     def fetch(self, ctx):
-        git_fetch(ctx, 'https://github.com/vusec/dangsan.git', self.commit)
+        dangsan, llvm = self.fetch_sources()
+        fetch_git(ctx, dangsan, 'src')
 
         os.chdir('src')
-        git_fetch(ctx, 'git@github.com:llvm/llvm-project.git',
-                  '43dff0c03324', 'llvm-project')
+        fetch_git(ctx, llvm, 'llvm-project')
 
         # Apply LLVM patches
         os.chdir('llvm-project/llvm')
@@ -67,7 +80,17 @@ class DangSanSource(infra.Package):
     def build(self, ctx):
         metapagetable_obj_dir = self.path(ctx, 'obj', 'metapagetable')
 
+        # set outside of the metapagetable step, which is skipped when an
+        # interrupted build resumes after it
+        ctx.runenv.METALLOC_OPTIONS = (
+            '-DFIXEDCOMPRESSION=false '
+            '-DMETADATABYTES=8 '
+            '-DDEEPMETADATA=false '
+            '-DALLOC_SIZE_HOOK=dang_alloc_size_hook'
+        )
+
         self._build_llvm(ctx)
+        self._install_llvm(ctx)
         self._build_metapagetable(ctx, metapagetable_obj_dir)
         self._build_gperftools(ctx, metapagetable_obj_dir)
 
@@ -77,7 +100,9 @@ class DangSanSource(infra.Package):
 
         self._build_staticlib(ctx, metapagetable_obj_dir)
         self._build_llvm_plugins(ctx)
+        clear_steps(ctx, self)
 
+    @step
     def _build_llvm(self, ctx):
         os.chdir(self.path(ctx))
         os.makedirs('obj/llvm', exist_ok=True)
@@ -92,22 +117,22 @@ class DangSanSource(infra.Package):
             '-DLLVM_BINUTILS_INCDIR=' +
             self.binutils.path(ctx, 'install/include'),
             '-DCMAKE_INSTALL_PREFIX=' + self.path(ctx, 'install'),
+            *link_limiter_cmake_flags(ctx),
             '../../src/llvm-project/llvm'
         ])
         infra.util.run(ctx, 'make -j %d' % ctx.jobs)
+
+    @step
+    def _install_llvm(self, ctx):
+        os.chdir(self.path(ctx, 'obj/llvm'))
         infra.util.run(ctx, 'make install')
 
+    @step
     def _build_metapagetable(self, ctx, metapagetable_obj_dir):
         os.chdir(self.path(ctx))
         os.makedirs(metapagetable_obj_dir, exist_ok=True)
         os.chdir(self.path(ctx, 'src', 'metapagetable'))
 
-        ctx.runenv.METALLOC_OPTIONS = (
-            '-DFIXEDCOMPRESSION=false '
-            '-DMETADATABYTES=8 '
-            '-DDEEPMETADATA=false '
-            '-DALLOC_SIZE_HOOK=dang_alloc_size_hook'
-        )
         infra.util.run(ctx, [
             'make',
             'OBJDIR=' + metapagetable_obj_dir,
@@ -119,6 +144,7 @@ class DangSanSource(infra.Package):
             '-j' + str(ctx.jobs)
         ])
 
+    @step
     def _build_gperftools(self, ctx, metapagetable_obj_dir):
         libwind_incl_dir = self.libunwind.path(ctx, 'install/include')
         libwind_lib_dir = self.libunwind.path(ctx, 'install/lib')
@@ -143,6 +169,7 @@ class DangSanSource(infra.Package):
             '-j%d' % ctx.jobs
         ])
 
+    @step
     def _build_staticlib(self, ctx, metapagetable_obj_dir):
         staticlib_obj_dir = self.path(ctx, 'obj', 'staticlib')
         os.makedirs(staticlib_obj_dir, exist_ok=True)
@@ -155,6 +182,7 @@ class DangSanSource(infra.Package):
             '-j' + str(ctx.jobs)
         ])
 
+    @step
     def _build_llvm_plugins(self, ctx):
         os.chdir(self.path(ctx, 'src/llvm-plugins'))
         infra.util.run(ctx, [
@@ -195,10 +223,18 @@ class DangSan(infra.Instance):
     DangSan instance.
 
     :name: dangsan
+    :param pass_stats: collect per-pass compile time and LLVM statistics
+    :param lto_jobs: number of parallel LTO codegen jobs (default: None,
+                     single-threaded)
     """
     name = 'dangsan'
+    # typical slowdown over native, for scheduling runs without history
+    # (see setup.py sweep)
+    expected_slowdown = 3.0
 
-    def __init__(self):
+    def __init__(self, pass_stats=False, lto_jobs: Optional[int] = None):
+        self.pass_stats = pass_stats
+        self.lto_jobs = lto_jobs
         self.source = DangSanSource()
 
     def dependencies(self):
@@ -237,11 +273,24 @@ class DangSan(infra.Instance):
             '-uinitialize_global_metadata'
         ]
 
+        if self.lto_jobs:
+            ldflags += ['-Wl,-plugin-opt=jobs=%d' % self.lto_jobs]
+
+        # -stats may only be passed once, enable_pass_stats adds it
+        if self.pass_stats:
+            ldflags.remove('-Wl,-plugin-opt=-stats')
+
         ctx.cflags += flags
         ctx.cxxflags += flags + ['-DSOPLEX_DANGSAN_MASK']
         ctx.ldflags += ldflags
         ctx.lib_ldflags += ['-flto']
 
+        # LTO links need several GB each, limit how many run concurrently
+        limit_link_jobs(ctx)
+
+        if self.pass_stats:
+            enable_pass_stats(ctx, self.name, plugin_flags=False)
+
     def prepare_run(self, ctx):
         ctx.runenv.SAFESTACK_OPTIONS = 'largestack=true'
 
@@ -264,3 +313,6 @@ class DangSanBaseline(infra.Instance):
         ctx.cxxflags += flags
         ctx.ldflags += ['-flto']
         ctx.lib_ldflags += ['-flto']
+
+        # LTO links need several GB each, limit how many run concurrently
+        limit_link_jobs(ctx)
@@ -1,8 +1,18 @@
+import glob
+import gzip
 import os
+import shutil
+from typing import Iterable, Optional
 import infra
 from infra.packages import LLVM, LLVMPasses, LibShrink
 from infra.packages.gnu import BinUtils
-from util import git_fetch
+from tools.fetch import GitSource, fetch_git
+from tools.link_limiter import limit_link_jobs
+from tools.pass_stats import enable_pass_stats, target_build_dir
+from util import (
+    add_run_wrapper, source_commit, stats_report_wrapper,
+    write_pkg_config_responder
+)
 
 
 def strbool(b):
@@ -27,16 +37,26 @@ class DeltaPointersPasses(LLVMPasses):
 
 
 class DeltaPointersSource(infra.Package):
-
-    addrspace_bits = 32
-    overflow_bit = True
-    runtime_stats = False
+    """
+    :identifier: deltapointers-<commit>[-<addrspace_bits>bit][-nooverflowbit][-stats][-debug]
+    :param commit: the deltapointers commit to build
+    :param addrspace_bits: number of pointer bits reserved for the address
+                           space, the remaining upper bits hold the tag
+    :param overflow_bit: toggle the overflow bit in pointer tags
+    :param runtime_stats: build the runtime with statistics counters
+    :param debug: build the runtime with debugging options
+    """
     llvm_patches = ['gold-plugins', 'statsfilter']
     llvm = LLVM('3.8.0', compiler_rt=False, patches=llvm_patches)
     llvm.binutils = BinUtils('2.30')
 
-    def __init__(self, commit='master', debug=False) -> None:
-        self.commit = commit
+    def __init__(self, commit='master', addrspace_bits=32, overflow_bit=True,
+                 runtime_stats=False, debug=False) -> None:
+        assert 0 < addrspace_bits < 64, 'address space must leave tag bits'
+        self.commit = source_commit(self, commit)
+        self.addrspace_bits = addrspace_bits
+        self.overflow_bit = overflow_bit
+        self.runtime_stats = runtime_stats
         self.debug = debug
         self.llvm_passes = DeltaPointersPasses(
             llvm=self.llvm,
@@ -45,18 +65,32 @@ class DeltaPointersSource(infra.Package):
             use_builtins=True)
 
     def ident(self):
-        return 'deltapointers-' + self.commit
+        ident = 'deltapointers-' + self.commit
+        if self.addrspace_bits != 32:
+            ident += '-%dbit' % self.addrspace_bits
+        if not self.overflow_bit:
+            ident += '-nooverflowbit'
+        if self.runtime_stats:
+            ident += '-stats'
+        if self.debug:
+            ident += '-debug'
+        return ident
 
     def dependencies(self):
         yield self.llvm
         yield self.llvm_passes
-        yield LibShrink(self.addrspace_bits)
+        yield LibShrink(self.addrspace_bits, debug=self.debug)
 
     def is_fetched(self, ctx):
         return os.path.exists('src')
 
+    def fetch_sources(self):
+        yield GitSource(
+            'https://github.com/vusec/deltapointers.git', self.commit)
+
     def fetch(self, ctx):
-        git_fetch(ctx, 'https://github.com/vusec/deltapointers.git', self.commit)
+        deltapointers, = self.fetch_sources()
+        fetch_git(ctx, deltapointers, 'src')
 
         os.chdir('src')
         infra.util.apply_patch(ctx, os.path.join(
@@ -82,10 +116,15 @@ class DeltaPointersSource(infra.Package):
             'RUNTIME_STATS': strbool(self.runtime_stats),
             'DEBUG': strbool(self.debug)
         }
-        setup_path = os.path.join(ctx.paths.root, 'setup.py')
+        # the Makefile queries pkg-config for every object, answer from a
+        # script rather than starting setup.py each time
+        pkg_config = write_pkg_config_responder(
+            ctx, self.path(ctx, 'obj', 'pkg-config.sh'),
+            [self.llvm, self.llvm_passes,
+             LibShrink(self.addrspace_bits, debug=self.debug)])
         return infra.util.run(ctx, [
             'make',
-            f'PKG_CONFIG=python3 {setup_path} pkg-config',
+            'PKG_CONFIG=' + pkg_config,
             *args],
             env=env)
 
@@ -124,15 +163,51 @@ class DeltaPointersSource(infra.Package):
 
 
 class DeltaTags(infra.Instance):
-    addrspace_bits = 32
-
-    def __init__(self, name, overflow_check, optimizer, debug=False):
+    """
+    DeltaTags instance. Runs the deltapointers passes in the gold plugin and
+    runs the target under the libshrink run wrapper.
+
+    :name: given by ``name``
+    :param name: the instance name
+    :param overflow_check: overflow check mode (``none`` or ``satarith``)
+    :param optimizer: safe-allocs optimizer (``None``, ``old`` or ``new``)
+    :param debug: toggle debugging options
+    :param addrspace_bits: number of pointer bits for the address space, this
+                           bounds the heap size and determines the mask
+    :param overflow_bit: toggle the overflow bit in pointer tags
+    :param runtime_stats: collect runtime check counters into the results
+    :param pass_stats: collect per-pass compile time and LLVM statistics
+    :param dump_ir: directory to store IR dumps of the LTO module in, relative
+                    to the root directory (default: None, no dumping)
+    :param dump_ir_passes: pass names (e.g. ``deltatags-alloc``) after which
+                           to dump IR (default: after the full pipeline)
+    :param dump_ir_benchmarks: only keep dumps of binaries whose name contains
+                               one of these (default: all benchmarks)
+    :param dump_ir_compress: gzip the stored dumps
+    """
+    def __init__(self, name, overflow_check, optimizer, debug=False,
+                 addrspace_bits=32, overflow_bit=True, runtime_stats=False,
+                 pass_stats=False, dump_ir: Optional[str] = None,
+                 dump_ir_passes: Iterable[str] = (),
+                 dump_ir_benchmarks: Iterable[str] = (),
+                 dump_ir_compress=False):
         self.name = name
         self.overflow_check = overflow_check
         self.optimizer = optimizer
         self.debug = debug
-        self.libshrink = LibShrink(self.addrspace_bits, debug=debug)
-        self.source = DeltaPointersSource(debug=debug)
+        self.addrspace_bits = addrspace_bits
+        self.overflow_bit = overflow_bit
+        self.runtime_stats = runtime_stats
+        self.pass_stats = pass_stats
+        self.dump_ir = dump_ir
+        self.dump_ir_passes = [p.lstrip('-') for p in dump_ir_passes]
+        self.dump_ir_benchmarks = list(dump_ir_benchmarks)
+        self.dump_ir_compress = dump_ir_compress
+        self.libshrink = LibShrink(addrspace_bits, debug=debug)
+        self.source = DeltaPointersSource(addrspace_bits=addrspace_bits,
+                                          overflow_bit=overflow_bit,
+                                          runtime_stats=runtime_stats,
+                                          debug=debug)
 
     def dependencies(self):
         yield self.source
@@ -155,6 +230,8 @@ class DeltaTags(infra.Instance):
 
         def add_stats_pass(name, *args):
             LLVM.add_plugin_flags(ctx, name, '-stats-only=' + name, *args)
+            if self.dump_ir and name.lstrip('-') in self.dump_ir_passes:
+                LLVM.add_plugin_flags(ctx, '-dump-ir')
 
         # prepare initalizations of globals so that the next passes only have to
         # operate on instructions (rather than constantexprs)
@@ -177,7 +254,7 @@ class DeltaTags(infra.Instance):
 
         # tag heap/stack/global allocations
         add_stats_pass('-deltatags-alloc',
-                       '-address-space-bits=%d' % self.addrspace_bits)
+                       '-address-space-bits=%d' % self.source.addrspace_bits)
 
         # propagate size tags on ptr arith and libc calls
         add_stats_pass('-deltatags-prop',
@@ -192,15 +269,55 @@ class DeltaTags(infra.Instance):
             LLVM.add_plugin_flags(ctx, '-simplifycfg')
 
         # dump IR for debugging
-        LLVM.add_plugin_flags(ctx, '-dump-ir')
+        if self.dump_ir:
+            if not self.dump_ir_passes:
+                LLVM.add_plugin_flags(ctx, '-dump-ir')
+            ctx.hooks.post_build += [self._store_ir_dumps]
 
         # inline statically linked helpers
         LLVM.add_plugin_flags(ctx, '-custominline')
 
+        # LTO links need several GB each, limit how many run concurrently
+        limit_link_jobs(ctx)
+
+        # print the statistics of the passes above and time all passes
+        if self.pass_stats:
+            enable_pass_stats(ctx, self.name)
+
+    def _store_ir_dumps(self, ctx, binary):
+        # -dump-ir writes .ll files to the working directory of the LTO link,
+        # move them out of the build directory or drop them if the benchmark
+        # is not selected
+        benchmark = os.path.basename(binary)
+        keep = not self.dump_ir_benchmarks or \
+            any(b in benchmark for b in self.dump_ir_benchmarks)
+        outdir = os.path.join(ctx.paths.root, self.dump_ir, self.name,
+                              benchmark)
+
+        for dump in glob.glob(os.path.join(target_build_dir(binary), '*.ll')):
+            if not keep:
+                os.remove(dump)
+                continue
+
+            os.makedirs(outdir, exist_ok=True)
+            dest = os.path.join(outdir, os.path.basename(dump))
+            if self.dump_ir_compress:
+                with open(dump, 'rb') as fin, gzip.open(dest + '.gz', 'wb') as fout:
+                    shutil.copyfileobj(fin, fout)
+                os.remove(dump)
+            else:
+                shutil.move(dump, dest)
+
+            ctx.log.debug('stored IR dump of %s in %s' % (benchmark, outdir))
+
     def prepare_run(self, ctx):
         assert 'target_run_wrapper' not in ctx
         ctx.target_run_wrapper = self.libshrink.run_wrapper(ctx)
 
+        # report the counters printed by the runtime at exit as results
+        if self.runtime_stats:
+            add_run_wrapper(ctx, stats_report_wrapper(ctx, 'deltatags'))
+
     @ classmethod
     def make_instances(cls):
         # cls(name, overflow_check, optimizer)
@@ -3,7 +3,7 @@ import shutil
 from pathlib import Path
 import infra
 from infra.packages.llvm import LLVM
-from util import git_fetch
+from tools.fetch import GitSource, fetch_git
 
 
 class FFMallocAlloc(infra.Package):
@@ -15,8 +15,12 @@ class FFMallocAlloc(infra.Package):
     def is_fetched(self, ctx):
         return Path('src').exists()
 
+    def fetch_sources(self):
+        yield GitSource('https://github.com/bwickman97/ffmalloc.git')
+
     def fetch(self, ctx):
-        git_fetch(ctx, 'https://github.com/bwickman97/ffmalloc.git')
+        ffmalloc, = self.fetch_sources()
+        fetch_git(ctx, ffmalloc, 'src')
 
     def is_built(self, ctx):
         pkgdir = Path(self.path(ctx))
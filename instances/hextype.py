@@ -1,25 +1,32 @@
 import os
 import infra
 from infra.packages.cmake import CMake
-from util import git_fetch
+from tools.fetch import GitSource, fetch_git
+from tools.link_limiter import link_limiter_cmake_flags
+from tools.toolchain import tool
+from util import source_commit
 
 
 class HexTypeSource(infra.Package):
 
     def __init__(self, commit='master'):
-        self.commit = commit
+        self.commit = source_commit(self, commit)
 
     def ident(self):
         return 'hextype-' + self.commit
 
     def dependencies(self):
-        yield CMake('3.14.0')
+        yield tool(CMake, '3.14.0', '>=3.13')
 
     def is_fetched(self, ctx):
         return os.path.exists('src')
 
+    def fetch_sources(self):
+        yield GitSource('https://github.com/HexHive/HexType.git', self.commit)
+
     def fetch(self, ctx):
-        git_fetch(ctx, 'https://github.com/HexHive/HexType.git', self.commit)
+        hextype, = self.fetch_sources()
+        fetch_git(ctx, hextype, 'src')
         
         os.chdir('src')
         infra.util.run(ctx, './scripts/get_llvm_src_tree.sh')
@@ -47,6 +54,7 @@ class HexTypeSource(infra.Package):
             '-DBUILD_SHARED_LIBS=ON',
             '-DLLVM_TARGETS_TO_BUILD=X86',
             '-DCMAKE_INSTALL_PREFIX=' + self.path(ctx, 'install'),
+            *link_limiter_cmake_flags(ctx),
             '../src/llvm'
         ])
         infra.util.run(ctx, 'cmake --build . -- -j %d' % ctx.jobs)
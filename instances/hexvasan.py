@@ -4,7 +4,9 @@ import infra
 import shutil
 from infra.packages import LLVM
 from infra.packages.gnu import BinUtils
-from util import git_fetch
+from tools.fetch import GitSource, fetch_git
+from tools.link_limiter import link_limiter_cmake_flags
+from util import add_run_wrapper, report_filter_wrapper, source_commit
 
 
 class HexVasanSource(infra.Package):
@@ -12,7 +14,7 @@ class HexVasanSource(infra.Package):
     config_path = dirname(dirname(os.path.abspath(__file__)))
 
     def __init__(self, commit='master'):
-        self.commit = commit
+        self.commit = source_commit(self, commit)
         self.llvm = LLVM(
             version='3.9.1',
             compiler_rt=True,
@@ -29,8 +31,12 @@ class HexVasanSource(infra.Package):
     def is_fetched(self, ctx):
         return os.path.exists('src')
 
+    def fetch_sources(self):
+        yield GitSource('https://github.com/HexHive/HexVASAN.git', self.commit)
+
     def fetch(self, ctx):
-        git_fetch(ctx, 'https://github.com/HexHive/HexVASAN.git', self.commit)
+        hexvasan, = self.fetch_sources()
+        fetch_git(ctx, hexvasan, 'src')
 
         os.chdir('src')
         shutil.copytree(self.llvm.path(ctx, 'src'), 'llvm')
@@ -112,6 +118,7 @@ class HexVasanSource(infra.Package):
             '-DCMAKE_C_FLAGS=-fstandalone-debug',
             '-DCMAKE_CXX_FLAGS=-fstandalone-debug',
             '-DCMAKE_INSTALL_PREFIX=' + self.path(ctx, 'install'),
+            *link_limiter_cmake_flags(ctx),
             '../src/llvm'
         ])
         infra.util.run(ctx, 'cmake --build . -- -j %d' % ctx.jobs)
@@ -133,14 +140,20 @@ class HexVasan(infra.Instance):
     :param halt_on_error: toggles early termination on error
     :param backtrace: runs vasan with the backtrace option (allows logging)
     :error_log_path: path to the log file (works only if backtrace is enabled)
+    :param dedup_reports: deduplicate reports while running and write a
+                          report index per run (see ``setup.py reports``)
+    :param report_log_limit: maximum stderr size per run with ``dedup_reports``
     """
     name = 'hexvasan'
 
     def __init__(self, halt_on_error=True, backtrace=False,
-                 error_log_path: str = None):
+                 error_log_path: str = None,
+                 dedup_reports=False, report_log_limit=64 << 20):
         self.halt_on_error = halt_on_error
         self.backtrace = backtrace
         self.error_log_path = error_log_path
+        self.dedup_reports = dedup_reports
+        self.report_log_limit = report_log_limit
 
     def dependencies(self):
         yield HexVasanSource()
@@ -162,3 +175,7 @@ class HexVasan(infra.Instance):
 
         if self.backtrace and self.error_log_path:
             ctx.runenv.VASAN_ERR_LOG_PATH = self.error_log_path
+
+        if self.dedup_reports:
+            add_run_wrapper(ctx, report_filter_wrapper(
+                ctx, self.name, self.report_log_limit))
@@ -3,13 +3,15 @@ import infra
 from infra import Instance, Package
 from infra.packages import Bash, CoreUtils, Make, AutoMake, CMake
 from infra.util import param_attrs
-from util import git_fetch
+from tools.fetch import GitSource, fetch_git
+from tools.toolchain import tool
+from util import source_commit
 
 
 class LowFatSource(Package):
 
     def __init__(self, commit='master'):
-        self.commit = commit
+        self.commit = source_commit(self, commit)
 
     def ident(self):
         return 'lowfat-' + self.commit
@@ -17,15 +19,19 @@ class LowFatSource(Package):
     def dependencies(self):
         yield Bash('4.3')
         yield CoreUtils('8.22')
-        yield Make('4.1')
+        yield tool(Make, '4.1', '>=4.1')
         yield AutoMake.default()
-        yield CMake('3.8.2')
+        yield tool(CMake, '3.8.2', '>=3.8.2,<3.15')
 
     def is_fetched(self, ctx):
         return os.path.exists('src')
 
+    def fetch_sources(self):
+        yield GitSource('https://github.com/GJDuck/LowFat.git', self.commit)
+
     def fetch(self, ctx):
-        git_fetch(ctx, 'https://github.com/GJDuck/LowFat.git', self.commit)
+        lowfat, = self.fetch_sources()
+        fetch_git(ctx, lowfat, 'src')
 
     def is_built(self, ctx):
         return os.path.exists('src/build/bin/clang')
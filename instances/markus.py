@@ -5,13 +5,15 @@ from infra.packages import AutoConf, M4, LibTool, Make
 from infra.packages.llvm import LLVM
 from packages.gnu_tools import AutoGen, Guile
 from infra.packages.gnu import AutoMake
-from util import git_fetch
+from tools.fetch import GitSource, fetch_git
+from tools.toolchain import tool
+from util import source_commit
 
 
 class MarkUsAlloc(infra.Package):
 
     def __init__(self, commit='master'):
-        self.commit = commit
+        self.commit = source_commit(self, commit)
         self.libs = ('libgc.so', 'libgccpp.so')
 
     def ident(self):
@@ -20,16 +22,21 @@ class MarkUsAlloc(infra.Package):
     def dependencies(self):
         yield AutoGen('5.18.7', Guile('2.0.11'))
         yield AutoMake.default()
-        yield AutoConf('2.69', M4('1.4.19'))
+        yield tool(AutoConf, '2.69', '>=2.69,<2.70',
+                   tool(M4, '1.4.19', '>=1.4.18'))
         yield LibTool('2.4.6')
-        yield Make('4.3')
+        yield tool(Make, '4.3', '>=4.1')
 
     def is_fetched(self, ctx):
         return os.path.exists(self.path(ctx, 'src'))
 
+    def fetch_sources(self):
+        yield GitSource(
+            'https://github.com/SamAinsworth/MarkUs-sp2020.git', self.commit)
+
     def fetch(self, ctx):
-        git_fetch(
-            ctx, 'https://github.com/SamAinsworth/MarkUs-sp2020.git', self.commit)
+        markus, = self.fetch_sources()
+        fetch_git(ctx, markus, 'src')
 
     def is_built(self, ctx):
         return all(os.path.exists(self.path(ctx, 'obj/.libs', lib))
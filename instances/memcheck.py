@@ -3,26 +3,35 @@ from typing import Optional
 import infra
 from infra.packages.gnu import AutoConf, AutoMake, Bash, LibTool, M4
 from infra.packages.llvm import LLVM
-from util import git_fetch
+from tools.fetch import GitSource, fetch_git
+from tools.toolchain import tool
+from util import add_run_wrapper, report_filter_wrapper, source_commit
 
 
 class Valgrind(infra.Package):
 
     def __init__(self, commit='master'):
-        self.commit = commit
+        self.commit = source_commit(self, commit)
 
     def ident(self):
         return 'valgrind-' + self.commit
 
     def dependencies(self):
-        yield AutoMake('1.15.1', AutoConf('2.69', M4('1.4.19')), LibTool('2.4.6'))
+        yield AutoMake('1.15.1',
+                       tool(AutoConf, '2.69', '>=2.69,<2.70',
+                            tool(M4, '1.4.19', '>=1.4.18')),
+                       LibTool('2.4.6'))
         yield Bash('4.3')
 
     def is_fetched(self, ctx):
         return os.path.exists('src')
 
+    def fetch_sources(self):
+        yield GitSource('git://sourceware.org/git/valgrind.git', self.commit)
+
     def fetch(self, ctx):
-        git_fetch(ctx, 'git://sourceware.org/git/valgrind.git', self.commit)
+        valgrind, = self.fetch_sources()
+        fetch_git(ctx, valgrind, 'src')
 
     def is_built(self, ctx):
         return os.path.exists('obj')
@@ -56,12 +65,21 @@ class Memcheck(infra.Instance):
 
     :name: memcheck
     :param llvm: optionally use LLVM as compiler
+    :param dedup_reports: deduplicate reports while running and write a
+                          report index per run (see ``setup.py reports``)
+    :param report_log_limit: maximum stderr size per run with ``dedup_reports``
     """
     name = 'memcheck'
+    # typical slowdown over native, for scheduling runs without history
+    # (see setup.py sweep)
+    expected_slowdown = 30.0
 
-    def __init__(self, llvm: Optional[LLVM] = None):
+    def __init__(self, llvm: Optional[LLVM] = None,
+                 dedup_reports=False, report_log_limit=64 << 20):
         self.valgrind = Valgrind()
         self.llvm = llvm
+        self.dedup_reports = dedup_reports
+        self.report_log_limit = report_log_limit
 
     def dependencies(self):
         if self.llvm:
@@ -77,3 +95,7 @@ class Memcheck(infra.Instance):
 
     def prepare_run(self, ctx):
         ctx.target_run_wrapper = self.valgrind.run_wrapper(ctx)
+
+        if self.dedup_reports:
+            add_run_wrapper(ctx, report_filter_wrapper(
+                ctx, self.name, self.report_log_limit))
@@ -5,13 +5,17 @@ from infra.packages.cmake import CMake
 from infra.packages.gnu import AutoMake, Bash, BinUtils, CoreUtils, LibTool, Make
 from infra.packages.gperftools import LibUnwind
 from infra.packages.ninja import Ninja
-from util import git_fetch
+from tools.checkpoint import clear_steps, step
+from tools.fetch import GitSource, fetch_git
+from tools.link_limiter import link_limiter_cmake_flags
+from tools.toolchain import tool
+from util import source_commit
 
 
 class TypeSanSource(infra.Package):
 
     def __init__(self, commit='master'):
-        self.commit = commit
+        self.commit = source_commit(self, commit)
         self.binutils = BinUtils('2.30')
         self.libunwind = LibUnwind('1.2-rc1')
 
@@ -20,10 +24,10 @@ class TypeSanSource(infra.Package):
 
     def dependencies(self):
         yield Bash('4.3')
-        yield Make('4.3')
+        yield tool(Make, '4.3', '>=4.1')
         yield AutoMake.default()
         yield LibTool('2.4.6')
-        yield CMake('3.4.1')
+        yield tool(CMake, '3.4.1', '>=3.4.1,<3.15')
         yield CoreUtils('8.22')
         yield Ninja('1.8.2')
         yield self.libunwind
@@ -32,16 +36,21 @@ class TypeSanSource(infra.Package):
     def is_fetched(self, ctx):
         return os.path.exists('src')
 
+    def fetch_sources(self):
+        yield GitSource('https://github.com/vusec/typesan.git', self.commit)
+        yield GitSource('https://github.com/gperftools/gperftools.git',
+                        'c46eb1f3d2f7a2bdc54a52ff7cf5e7392f5aa668')
+
     def fetch(self, ctx):
+        typesan, gperftools = self.fetch_sources()
+
         # Get typesan
-        git_fetch(ctx, 'https://github.com/vusec/typesan.git', self.commit)
+        fetch_git(ctx, typesan, 'src')
 
         # Get gperftools
         os.chdir('src')
-        gperftools_commit = 'c46eb1f3d2f7a2bdc54a52ff7cf5e7392f5aa668'
         gperftools_dir = 'gperftools-metalloc'
-        git_fetch(ctx, 'https://github.com/gperftools/gperftools.git',
-                  gperftools_commit, gperftools_dir)
+        fetch_git(ctx, gperftools, gperftools_dir)
 
         # Patch gperftools
         os.chdir(gperftools_dir)
@@ -59,6 +68,7 @@ class TypeSanSource(infra.Package):
                 os.path.exists('obj/gperftools/.libs') and
                 os.path.exists('src/metapagetable/.libs'))
 
+    @step
     def _build_llvm(self, ctx, libwind_incl_dir):
         os.chdir(self.path(ctx))
         os.makedirs('obj/llvm', exist_ok=True)
@@ -79,22 +89,20 @@ class TypeSanSource(infra.Package):
             '-DCMAKE_C_FLAGS=-I' + libwind_incl_dir,
             '-DCMAKE_CXX_FLAGS=-I' + libwind_incl_dir,
             '-DCMAKE_INSTALL_PREFIX=' + self.path(ctx, 'install'),
+            *link_limiter_cmake_flags(ctx),
             '../../src/llvm'
         ])
         infra.util.run(ctx, 'cmake --build . -- -j %d' % ctx.jobs)
 
+    @step
     def _build_metapagetable(self, ctx):
         os.chdir(self.path(ctx))
         os.chdir(self.path(ctx, 'src/metapagetable'))
 
-        ctx.runenv.METALLOC_OPTIONS = (
-            '-DFIXEDCOMPRESSION=false '
-            '-DMETADATABYTES=16 '
-            '-DDEEPMETADATA=false'
-        )
         infra.util.run(ctx, ['make', 'config'])
         infra.util.run(ctx, ['make', '-j' + str(ctx.jobs)])
 
+    @step
     def _build_gperftools(self, ctx, libwind_incl_dir, libwind_lib_dir):
         os.chdir(self.path(ctx, 'src/gperftools-metalloc'))
         infra.util.run(ctx, 'autoreconf -vfi')
@@ -116,18 +124,35 @@ class TypeSanSource(infra.Package):
         libwind_incl_dir = self.libunwind.path(ctx, 'install/include')
         libwind_lib_dir = self.libunwind.path(ctx, 'install/lib')
 
+        # set outside of the metapagetable step, which is skipped when an
+        # interrupted build resumes after it
+        ctx.runenv.METALLOC_OPTIONS = (
+            '-DFIXEDCOMPRESSION=false '
+            '-DMETADATABYTES=16 '
+            '-DDEEPMETADATA=false'
+        )
+
         self._build_llvm(ctx, libwind_incl_dir)
         self._build_metapagetable(ctx)
         self._build_gperftools(ctx, libwind_incl_dir, libwind_lib_dir)
+        clear_steps(ctx, self)
 
     def is_installed(self, ctx):
         return (os.path.exists('install/bin/pprof') and
                 os.path.exists('install/bin/clang++'))
 
     def install(self, ctx):
-        os.chdir('obj/gperftools')
+        self._install_gperftools(ctx)
+        self._install_llvm(ctx)
+        clear_steps(ctx, self)
+
+    @step
+    def _install_gperftools(self, ctx):
+        os.chdir(self.path(ctx, 'obj/gperftools'))
         infra.util.run(ctx, 'make install')
 
+    @step
+    def _install_llvm(self, ctx):
         os.chdir(self.path(ctx, 'obj/llvm'))
         infra.util.run(ctx, 'cmake --build . --target install')
 
@@ -1,11 +1,20 @@
 import os
 import shutil
 import infra
-from infra.packages.gnu import AutoMake, GNUTarPackage
+from infra.packages.gnu import GNUTarPackage
+from packages.host_tools import AutoMake, HostTool
+from tools.fetch import FileSource, fetch_file
 from util import add_env_var
 
 
-class Bdw_gc(GNUTarPackage):
+# sha256 of the release tarballs, by file name
+sha256sums = {
+    'gc-7.4.4.tar.gz':
+        'e5ca9b628b765076b6ab26f882af3a1a29cde786341e08b9f366604f74e4db84',
+}
+
+
+class Bdw_gc(HostTool, GNUTarPackage):
     """
     :identifier: bdw_gc-<version>
     :param str version: version to download
@@ -15,28 +24,34 @@ class Bdw_gc(GNUTarPackage):
     built_path = '.libs/libgc.so'
     installed_path = 'lib'
     tar_compression = 'gz'
+    host_pkg_config = 'bdw-gc'
+    host_compat = 'major'
 
     def __init__(self, version, automake: AutoMake):
         self.version = version
         self.automake = automake
 
-    def dependencies(self):
+    def source_dependencies(self):
         yield self.automake
 
-    def fetch(self, ctx):
+    def fetch_sources(self):
         tarname = 'gc-%s.tar.%s' % (self.version, self.tar_compression)
-        infra.util.download(
-            ctx, 'https://hboehm.info/gc/gc_source/%s' % (tarname))
+        yield FileSource('https://hboehm.info/gc/gc_source/' + tarname,
+                         sha256sums.get(tarname))
+        yield FileSource('https://github.com/ivmai/libatomic_ops/releases/'
+                         'download/v7.2j/libatomic_ops-7.2j.tar.gz')
+
+    def fetch(self, ctx):
+        gc, libatomic = self.fetch_sources()
+        tarname = fetch_file(ctx, gc)
         infra.util.untar(ctx, tarname, self.path(ctx, 'src'))
 
-        libatomic_tar = 'libatomic_ops-7.2j.tar.gz'
-        infra.util.download(
-            ctx, 'https://github.com/ivmai/libatomic_ops/releases/download/v7.2j/' + libatomic_tar)
+        libatomic_tar = fetch_file(ctx, libatomic)
         infra.util.run(ctx, ['tar', '-xf', libatomic_tar])
         os.remove(libatomic_tar)
         shutil.move('libatomic_ops-7.2', self.path(ctx, 'src/libatomic_ops'))
 
-    def install_env(self, ctx):
-        super().install_env(ctx)
+    def source_install_env(self, ctx):
+        super().source_install_env(ctx)
         add_env_var(ctx, 'PKG_CONFIG_PATH', self.path(
             ctx, 'install', 'lib', 'pkgconfig'))
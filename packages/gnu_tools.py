@@ -1,29 +1,44 @@
 import os
 import infra
 from util import add_env_var
-from infra.packages.gnu import AutoMake, GNUTarPackage, LibTool
+from infra.packages.gnu import GNUTarPackage
 from packages.bdw_gc import Bdw_gc
+from packages.host_tools import AutoMake, HostTool, LibTool
+from tools.fetch import FileSource, fetch_file
 
 
-class Libffi(GNUTarPackage):
+# sha256 of the release tarballs, by file name
+sha256sums = {
+    'libffi-3.3.tar.gz':
+        '72fba7922703ddfa7a028d513ac15a85c8d54c8d67f55fa5a4802885dc652056',
+}
+
+
+class Libffi(HostTool, GNUTarPackage):
     """
     :identifier: libffi-<version>
     :param str version: version to download
     """
     name = 'libffi'
+    host_pkg_config = 'libffi'
+    host_compat = 'major'
     built_path = '.libs/libffi.so'
     installed_path = 'lib/libffi.so'
     tar_compression = 'gz'
 
-    def fetch(self, ctx):
+    def fetch_sources(self):
         ident = '%s-%s' % (self.name, self.version)
         tarname = ident + '.tar.' + self.tar_compression
-        infra.util.download(
-            ctx, 'https://gcc.gnu.org/pub/%s/%s' % (self.name, tarname))
+        yield FileSource('https://gcc.gnu.org/pub/%s/%s' %
+                         (self.name, tarname), sha256sums.get(tarname))
+
+    def fetch(self, ctx):
+        libffi, = self.fetch_sources()
+        tarname = fetch_file(ctx, libffi)
         infra.util.untar(ctx, tarname, self.path(ctx, 'src'))
 
-    def install_env(self, ctx):
-        super().install_env(ctx)
+    def source_install_env(self, ctx):
+        super().source_install_env(ctx)
         add_env_var(ctx, 'PKG_CONFIG_PATH', self.path(
             ctx, 'install', 'lib', 'pkgconfig'))
 
@@ -44,22 +59,24 @@ class Libunistring(GNUTarPackage):
         add_env_var(ctx, 'CPATH', self.path(ctx, 'install/include'))
 
 
-class GMP(GNUTarPackage):
+class GMP(HostTool, GNUTarPackage):
     """
     :identifier: gmp-<version>
     :param str version: version to download
     """
     name = 'gmp'
+    host_pkg_config = 'gmp'
+    host_compat = 'major'
     built_path = '.libs/libgmp.so'
     installed_path = 'lib/libgmp.so'
     tar_compression = 'bz2'
 
-    def install_env(self, ctx):
-        super().install_env(ctx)
+    def source_install_env(self, ctx):
+        super().source_install_env(ctx)
         add_env_var(ctx, 'CPATH', self.path(ctx, 'install/include'))
 
 
-class Guile(GNUTarPackage):
+class Guile(HostTool, GNUTarPackage):
     """
     :identifier: guile-<version>
     :param str version: version to download
@@ -69,6 +86,7 @@ class Guile(GNUTarPackage):
     :param bdw_gc: bdw_gc package
     """
     name = 'guile'
+    host_program = 'guile'
     built_path = 'libguile'
     installed_path = 'bin/guile'
     tar_compression = 'gz'
@@ -86,7 +104,7 @@ class Guile(GNUTarPackage):
         self.bdw_gc = bdw_gc
         self.libtool = libtool
 
-    def dependencies(self):
+    def source_dependencies(self):
         yield self.gmp
         yield self.libunistring
         yield self.libffi
@@ -97,27 +115,31 @@ class Guile(GNUTarPackage):
         return super().build(ctx)
 
     def build(self, ctx):
-        add_env_var(ctx, 'LDFLAGS', '-L'+self.libtool.path(ctx, 'install/lib'))
+        configure_args = ['--prefix=' + self.path(ctx, 'install')]
+        if not self.libtool.use_host():
+            add_env_var(ctx, 'LDFLAGS', '-L'+self.libtool.path(ctx, 'install/lib'))
+        if not self.gmp.use_host():
+            configure_args += ['--with-libgmp-prefix='+self.gmp.path(ctx, 'install')]
         os.makedirs('obj', exist_ok=True)
         os.chdir('obj')
         if not os.path.exists('Makefile'):
-            infra.util.run(ctx, ['../src/configure', '--prefix=' + self.path(
-                ctx, 'install'), '--with-libgmp-prefix='+self.gmp.path(ctx, 'install')])
+            infra.util.run(ctx, ['../src/configure', *configure_args])
         infra.util.run(ctx, ['make', '-j%d' % ctx.jobs])
 
-    def install_env(self, ctx):
-        super().install_env(ctx)
+    def source_install_env(self, ctx):
+        super().source_install_env(ctx)
         add_env_var(ctx, 'PKG_CONFIG_PATH', self.path(
             ctx, 'install', 'lib', 'pkgconfig'))
 
 
-class AutoGen(GNUTarPackage):
+class AutoGen(HostTool, GNUTarPackage):
     """
     :identifier: autogen-<version>
     :param str version: version to download
     :param guile: guile package
     """
     name = 'autogen'
+    host_program = 'autogen'
     built_path = ''
     installed_path = 'bin/autogen'
     tar_compression = 'gz'
@@ -126,16 +148,18 @@ class AutoGen(GNUTarPackage):
         super().__init__(version)
         self.guile = guile
 
-    def dependencies(self):
+    def source_dependencies(self):
         yield self.guile
 
 
-class Gawk(GNUTarPackage):
+class Gawk(HostTool, GNUTarPackage):
     """
     :identifier: gawk-<version>
     :param str version: version to download
     """
     name = 'gawk'
+    host_program = 'gawk'
+    host_compat = 'major'
     built_path = 'gawk'
     installed_path = 'bin/gawk'
     tar_compression = 'gz'
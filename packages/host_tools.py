@@ -0,0 +1,159 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+from typing import Optional
+from infra.packages import gnu
+from tools.toolchain import parse_version, satisfies
+
+# set to False by ``setup.py --no-host-tools`` to always build from source
+enabled = True
+
+# the setup context, set in setup.py; detection runs when dependencies are
+# resolved, before any package method gets the context
+context = None
+
+_cache = None
+_checked = set()
+
+
+def cache_path() -> str:
+    # detection results, revalidated when the detected file changes
+    return os.path.join(context.paths.buildroot, 'host-tools.json')
+
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        try:
+            with open(cache_path()) as f:
+                _cache = json.load(f)
+        except (OSError, ValueError):
+            _cache = {}
+    return _cache
+
+
+def _save_cache():
+    path = cache_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(_cache, f, indent=2, sort_keys=True)
+    os.rename(path + '.tmp', path)
+
+
+def _output(cmd):
+    try:
+        return subprocess.run(cmd, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL,
+                              universal_newlines=True).stdout
+    except OSError:
+        return ''
+
+
+class HostTool:
+    """
+    Mixin for packages that can use a host-installed version instead of
+    building from source, if the host version satisfies the version
+    constraints. A found host tool also drops the dependencies of the
+    package, so e.g. a host ``autogen`` avoids building Guile, GMP,
+    libunistring, libffi and bdw-gc.
+
+    Subclasses set ``host_program`` (detected with ``<program> --version``)
+    or ``host_pkg_config`` (detected with ``pkg-config --modversion``), and
+    ``host_compat``: ``'minor'`` accepts newer patch versions only and
+    ``'major'`` also newer minor versions. Instead of ``dependencies`` and
+    ``install_env``, subclasses override ``source_dependencies`` and
+    ``source_install_env``, which only apply when building from source.
+    """
+    host_program = None
+    host_pkg_config = None
+    host_compat = 'minor'
+
+    def host_spec(self) -> str:
+        version = parse_version(self.version)
+        if self.host_compat == 'major':
+            bound = '%d' % (version[0] + 1)
+        else:
+            bound = '%d.%d' % (version[0], version[1] + 1)
+        return '>=%s,<%s' % (self.version, bound)
+
+    def _detect(self):
+        if self.host_program:
+            path = shutil.which(self.host_program)
+            if not path:
+                return None, None
+            first = _output([path, '--version']).splitlines()[:1]
+        else:
+            prefix = _output(['pkg-config', '--variable=pcfiledir',
+                              self.host_pkg_config]).strip()
+            path = os.path.join(prefix, self.host_pkg_config + '.pc')
+            if not prefix or not os.path.exists(path):
+                return None, None
+            first = [_output(['pkg-config', '--modversion',
+                              self.host_pkg_config])]
+
+        match = re.search(r'\d+(?:\.\d+)+', first[0]) if first else None
+        return path, match.group() if match else None
+
+    def host_version(self) -> Optional[str]:
+        """
+        Returns the version of the host tool if it is suitable, or None.
+        """
+        if not enabled:
+            return None
+
+        cache = _load_cache()
+        key = self.host_program or 'pkg-config:' + self.host_pkg_config
+        entry = cache.get(key)
+        if key not in _checked and (
+                entry is None or not os.path.exists(entry['path'] or '') or
+                os.path.getmtime(entry['path']) != entry['mtime']):
+            path, version = self._detect()
+            entry = cache[key] = {
+                'path': path,
+                'version': version,
+                'mtime': os.path.getmtime(path) if path else None,
+            }
+            _save_cache()
+        _checked.add(key)
+
+        version = entry['version']
+        if version and satisfies(version, self.host_spec()):
+            return version
+        return None
+
+    def use_host(self) -> bool:
+        return self.host_version() is not None
+
+    def dependencies(self):
+        if not self.use_host():
+            yield from self.source_dependencies()
+
+    def source_dependencies(self):
+        yield from super().dependencies() or ()
+
+    def is_fetched(self, ctx):
+        return self.use_host() or super().is_fetched(ctx)
+
+    def is_built(self, ctx):
+        return self.use_host() or super().is_built(ctx)
+
+    def is_installed(self, ctx):
+        return self.use_host() or super().is_installed(ctx)
+
+    def install_env(self, ctx):
+        if not self.use_host():
+            self.source_install_env(ctx)
+
+    def source_install_env(self, ctx):
+        super().install_env(ctx)
+
+
+class LibTool(HostTool, gnu.LibTool):
+    host_program = 'libtoolize'
+    host_compat = 'major'
+
+
+class AutoMake(HostTool, gnu.AutoMake):
+    host_program = 'automake'
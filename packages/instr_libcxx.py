@@ -2,6 +2,16 @@ import os
 import shutil
 import infra
 from infra.packages.llvm import LLVM
+from tools.fetch import FileSource, fetch_file
+
+
+# sha256 of the release tarballs, by file name
+sha256sums = {
+    'libcxx-6.0.0.src.tar.xz':
+        '70931a87bde9d358af6cb7869e7535ec6b015f7e6df64def6d2ecdd954040dd9',
+    'libcxxabi-6.0.0.src.tar.xz':
+        '91c6d9c5426306ce28d0627d6a4448e7d164d6a3f64b01cb1d196003b16d641b',
+}
 
 
 class InstrumentedLibcxx(infra.Package):
@@ -30,18 +40,22 @@ class InstrumentedLibcxx(infra.Package):
         return (os.path.exists('src/projects/libcxx') and
                 os.path.exists('src/projects/libcxxabi'))
 
+    def fetch_sources(self):
+        for project in ('libcxx', 'libcxxabi'):
+            tarname = '%s-%s.src.tar.xz' % (project, self.llvm.version)
+            yield FileSource('http://releases.llvm.org/%s/%s' %
+                             (self.llvm.version, tarname),
+                             sha256sums.get(tarname))
+
     def fetch(self, ctx):
+        libcxx, libcxxabi = self.fetch_sources()
         shutil.copytree(self.llvm.path(ctx, 'src'), 'src')
 
-        libcxx_tar = 'libcxx-%s.src.tar.xz' % self.llvm.version
-        infra.util.download(ctx, 'http://releases.llvm.org/%s/%s' %
-                            (self.llvm.version, libcxx_tar))
+        libcxx_tar = fetch_file(ctx, libcxx)
         infra.util.untar(ctx, libcxx_tar, self.path(
             ctx, 'src', 'projects', 'libcxx'))
 
-        libcxxabi_tar = 'libcxxabi-%s.src.tar.xz' % self.llvm.version
-        infra.util.download(ctx, 'http://releases.llvm.org/%s/%s' %
-                            (self.llvm.version, libcxxabi_tar))
+        libcxxabi_tar = fetch_file(ctx, libcxxabi)
         infra.util.untar(ctx, libcxxabi_tar, self.path(
             ctx, 'src', 'projects', 'libcxxabi'))
 
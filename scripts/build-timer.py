@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Compiler driver wrapper that times target builds. It is installed as
+symlinks named ``cc`` and ``cxx`` in ``<buildroot>/buildtime/<instance>/bin``,
+and the instance uses the symlinks as ``CC`` and ``CXX``.
+
+The wrapper runs the real compiler and appends the wall time, CPU time and
+peak memory of the invocation to ``invocations.jsonl`` next to the ``bin``
+directory. Invocations without ``-c``, ``-S`` or ``-E`` are links; their
+peak memory covers the linker (and LTO) since it is a child of the driver.
+
+The wrapper reads ``config.json`` from its own directory, which maps each
+symlink name (``cc`` or ``cxx``) to the compiler command it replaces.
+"""
+import fcntl
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+source_suffixes = ('.c', '.cc', '.cpp', '.cxx', '.C', '.c++', '.f', '.f90',
+                   '.F', '.F90', '.s', '.S', '.ll', '.bc')
+
+
+def find_real_compiler(name, wrapper_dir):
+    if os.path.isabs(name):
+        return name
+    for path in os.environ.get('PATH', '').split(os.pathsep):
+        candidate = os.path.join(path, name)
+        if os.path.realpath(path) == os.path.realpath(wrapper_dir):
+            continue
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    sys.exit('build-timer: no %s found in PATH' % name)
+
+
+def classify(args):
+    kind = 'link'
+    output = None
+    sources = []
+    for i, arg in enumerate(args):
+        if arg in ('-c', '-S', '-E'):
+            kind = 'compile'
+        elif arg == '-o' and i + 1 < len(args):
+            output = args[i + 1]
+        elif arg.startswith('-o') and len(arg) > 2:
+            output = arg[2:]
+        elif not arg.startswith('-') and arg.endswith(source_suffixes):
+            sources.append(arg)
+    if output is None and kind == 'link':
+        output = 'a.out'
+    elif output is None and sources:
+        output = os.path.splitext(os.path.basename(sources[0]))[0] + '.o'
+    return kind, output or '-', sources
+
+
+def record(logfile, entry):
+    with open(logfile, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(json.dumps(entry, sort_keys=True) + '\n')
+
+
+def main():
+    wrapper_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
+    name = os.path.basename(sys.argv[0])
+    args = sys.argv[1:]
+
+    with open(os.path.join(wrapper_dir, 'config.json')) as f:
+        config = json.load(f)
+    command = config[name].split()
+    command[0] = find_real_compiler(command[0], wrapper_dir)
+
+    start = time.time()
+    returncode = subprocess.call(command + args)
+    end = time.time()
+
+    # only one child was waited for, so these are its (and its children's)
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    kind, output, sources = classify(args)
+    record(os.path.join(os.path.dirname(wrapper_dir), 'invocations.jsonl'), {
+        'start': start,
+        'kind': kind,
+        'compiler': os.path.basename(command[0]),
+        'variable': name,
+        'cwd': os.getcwd(),
+        'output': output,
+        'sources': sources,
+        'wall_s': end - start,
+        'user_s': usage.ru_utime,
+        'sys_s': usage.ru_stime,
+        'maxrss_kb': usage.ru_maxrss,
+        'returncode': returncode,
+    })
+
+    return returncode if returncode >= 0 else 128 - returncode
+
+
+if __name__ == '__main__':
+    sys.exit(main())
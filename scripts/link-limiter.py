@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Memory-aware linker wrapper. It is installed as ``ld``/``ld.gold``/``ld.bfd``
+symlinks in a directory that is passed to the compiler driver with ``-B``,
+so that the driver runs it instead of the real linker.
+
+Before running the real linker, the wrapper reserves the peak memory that
+this link needed last time, or a default estimate for new links. It waits
+while the reservations of running links would exceed the memory budget. At
+least one link always runs. The observed peak memory of every link is
+recorded for the next build.
+
+The wrapper reads ``config.json`` from its own directory. The file holds the
+budget as a fraction of total RAM, the default estimate in MiB and the
+maximum number of concurrent links.
+"""
+import fcntl
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+poll_interval = 1.0
+
+
+def find_real_linker(name, wrapper_dir):
+    for path in os.environ.get('PATH', '').split(os.pathsep):
+        candidate = os.path.join(path, name)
+        if os.path.realpath(path) == os.path.realpath(wrapper_dir):
+            continue
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    sys.exit('link-limiter: no %s found in PATH' % name)
+
+
+def total_memory_mb():
+    with open('/proc/meminfo') as f:
+        for line in f:
+            if line.startswith('MemTotal:'):
+                return int(line.split()[1]) // 1024
+    return 0
+
+
+def link_key(args):
+    output = 'a.out'
+    for i, arg in enumerate(args):
+        if arg == '-o' and i + 1 < len(args):
+            output = args[i + 1]
+        elif arg.startswith('-o') and len(arg) > 2:
+            output = arg[2:]
+    return os.path.join(os.path.basename(os.getcwd()),
+                        os.path.basename(output))
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def locked_state(state_dir):
+    with open(os.path.join(state_dir, 'lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        path = os.path.join(state_dir, 'state.json')
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {'running': {}, 'peaks': {}}
+
+        state['running'] = {pid: mb for pid, mb in state['running'].items()
+                            if pid_alive(int(pid))}
+        yield state
+
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.rename(path + '.tmp', path)
+
+
+def acquire(state_dir, config, key):
+    budget = total_memory_mb() * config['mem_fraction']
+    pid = str(os.getpid())
+
+    while True:
+        with locked_state(state_dir) as state:
+            estimate = state['peaks'].get(key, config['default_mb'])
+            reserved = sum(state['running'].values())
+            running = len(state['running'])
+            if running == 0 or (running < config['max_jobs'] and
+                                reserved + estimate <= budget):
+                state['running'][pid] = estimate
+                return
+        time.sleep(poll_interval)
+
+
+def release(state_dir, key, peak_mb):
+    with locked_state(state_dir) as state:
+        state['running'].pop(str(os.getpid()), None)
+        if peak_mb:
+            state['peaks'][key] = peak_mb
+
+
+def main():
+    wrapper_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
+    name = os.path.basename(sys.argv[0])
+    args = sys.argv[1:]
+    real_linker = find_real_linker(name, wrapper_dir)
+
+    with open(os.path.join(wrapper_dir, 'config.json')) as f:
+        config = json.load(f)
+
+    key = link_key(args)
+    acquire(wrapper_dir, config, key)
+    try:
+        returncode = subprocess.call([real_linker] + args)
+    finally:
+        # ru_maxrss is in KiB and covers the linker and its children
+        peak_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        release(wrapper_dir, key, peak_kb // 1024)
+
+    return returncode if returncode >= 0 else 128 - returncode
+
+
+if __name__ == '__main__':
+    sys.exit(main())
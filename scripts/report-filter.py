@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Run wrapper that parses sanitizer and Valgrind reports from the stderr of
+the wrapped command while it runs. Reports are deduplicated by stack hash
+and a compact JSON index is written to the index directory when the
+command exits. The forwarded stderr is capped at a maximum size, so noisy
+runs cannot fill the disk.
+
+Usage: report-filter.py <index-dir> <max-raw-bytes> <keep> <command> [args...]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.reports import ReportIndex, ReportParser
+
+
+def index_name():
+    # SPEC runs in <benchmark>/run/<rundir>, keep some context in the name
+    parts = os.getcwd().rstrip(os.sep).split(os.sep)[-3:]
+    return '%s.%d.%d.json' % ('_'.join(parts), time.time(), os.getpid())
+
+
+def main():
+    if len(sys.argv) < 5:
+        print(__doc__.strip(), file=sys.stderr)
+        return 2
+
+    index_dir = sys.argv[1]
+    max_raw_bytes = int(sys.argv[2])
+    index = ReportIndex(keep=int(sys.argv[3]))
+    parser = ReportParser(index.add)
+    cmd = sys.argv[4:]
+
+    raw_bytes = 0
+    truncated = False
+    proc = subprocess.Popen(cmd, stderr=subprocess.PIPE)
+
+    for line in proc.stderr:
+        parser.feed(line.decode('utf-8', 'replace'))
+        raw_bytes += len(line)
+        if raw_bytes <= max_raw_bytes:
+            sys.stderr.buffer.write(line)
+        elif not truncated:
+            truncated = True
+            sys.stderr.buffer.write(b'[report-filter] stderr truncated at %d '
+                                    b'bytes, see the report index\n'
+                                    % max_raw_bytes)
+
+    returncode = proc.wait()
+    parser.close()
+    sys.stderr.flush()
+
+    result = index.to_json()
+    result.update(command=cmd, cwd=os.getcwd(), returncode=returncode,
+                  raw_bytes=raw_bytes, truncated=truncated)
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, index_name()), 'w') as f:
+        json.dump(result, f)
+
+    return returncode if returncode >= 0 else 128 - returncode
+
+
+if __name__ == '__main__':
+    sys.exit(main())
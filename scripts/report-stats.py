@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Run wrapper that reports statistics counters printed by an instrumentation
+runtime at exit. The wrapped command's stderr is forwarded unmodified. The
+trailing block of ``<name>: <integer>`` lines is re-emitted as
+``[setup-report] <prefix>_<name>: <value>`` lines, which end up in the
+benchmark results.
+
+Usage: report-stats.py <prefix> <command> [args...]
+"""
+import re
+import subprocess
+import sys
+
+counter_re = re.compile(r'^\s*([A-Za-z_][\w .-]*?)\s*[:=]\s*(-?\d+)\s*$')
+
+
+def report_key(prefix, name):
+    return prefix + '_' + re.sub(r'[^\w]+', '_', name.strip()).lower()
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__.strip(), file=sys.stderr)
+        return 2
+
+    prefix = sys.argv[1]
+    proc = subprocess.Popen(sys.argv[2:], stderr=subprocess.PIPE)
+    counters = []
+
+    for line in proc.stderr:
+        sys.stderr.buffer.write(line)
+        match = counter_re.match(line.decode('utf-8', 'replace'))
+        if match:
+            counters.append(match.groups())
+        else:
+            counters = []
+
+    returncode = proc.wait()
+    for name, value in counters:
+        print('[setup-report] %s: %s' % (report_key(prefix, name), value),
+              file=sys.stderr)
+    sys.stderr.flush()
+
+    return returncode if returncode >= 0 else 128 - returncode
+
+
+if __name__ == '__main__':
+    sys.exit(main())
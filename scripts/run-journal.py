@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Run wrapper that appends an entry to the run journal of an instance when
+the wrapped command exits. Entries record the benchmark, a hash of the
+command line, the exit status, the start and end times, the peak memory
+and the machine state, so that an interrupted sweep can be resumed with
+only the iterations that did not complete (see ``setup.py journal``). The
+entry is also added to the memo store with the fingerprint of the run (see
+``tools/memo.py``), so that later sweeps can reuse it. The fingerprint
+combines the fingerprint of the binary, recorded when it was built, with
+that of the instance runtime, passed by ``setup.py run``; nothing is hashed
+here. Runs of binaries that were not built by a journaled instance get no
+fingerprint.
+
+The command runs with the per-run settings of ``setup.py stabilize`` (CPU
+pinning, ASLR). Staging is not done here, since the target times this
+wrapper (see ``Journaled.prepare_run``).
+
+Usage: run-journal.py --buildroot <path> --instance <name> --runtime <fp>
+                      --wrapped <n> [--config <id>] [--journal <path>]
+                      -- <command> [args...]
+
+where the first <n> words of the command are the inner run wrappers and
+<id> is the configuration of the instance (see ``tools/results.py``). The
+journal defaults to <buildroot>/journal/<instance>.jsonl.
+"""
+import argparse
+import fcntl
+import json
+import os
+import resource
+import signal
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.machine import (
+    audit_path, load_json, machine_state, prepare_process, run_settings_path
+)
+from tools.memo import (
+    command_key, fingerprint, load_builds, lookup_build, memo_path
+)
+
+
+def benchmark_name():
+    # SPEC runs in <benchmark>/run/<rundir>
+    parts = os.getcwd().rstrip(os.sep).split(os.sep)
+    return parts[-3] if len(parts) >= 3 and parts[-2] == 'run' else parts[-1]
+
+
+def append(path, entry):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(json.dumps(entry) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(usage=__doc__.split('Usage: ')[1])
+    parser.add_argument('--buildroot', required=True)
+    parser.add_argument('--instance', required=True)
+    parser.add_argument('--runtime', required=True)
+    parser.add_argument('--wrapped', type=int, default=0)
+    parser.add_argument('--config')
+    parser.add_argument('--journal')
+    parser.add_argument('cmd', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    cmd = args.cmd[1:] if args.cmd[:1] == ['--'] else args.cmd
+    if len(cmd) <= args.wrapped:
+        parser.error('no command to run')
+
+    buildroot = args.buildroot
+    journal = args.journal or \
+        os.path.join(buildroot, 'journal', args.instance + '.jsonl')
+
+    settings = load_json(run_settings_path(buildroot))
+    prepare_process(settings)
+
+    binary = cmd[args.wrapped:]
+    build = lookup_build(load_builds(buildroot, args.instance),
+                         os.path.abspath(binary[0]))
+    fp = fingerprint(build, args.runtime, binary[1:]) if build else None
+
+    audit = load_json(audit_path(buildroot))
+    machine = dict(machine_state(), audit_cv=audit.get('cv'),
+                   audit_time=audit.get('time'))
+
+    key = command_key(cmd)
+
+    start = time.time()
+    status = subprocess.call(cmd)
+    end = time.time()
+
+    entry = {
+        'benchmark': benchmark_name(),
+        'cmd': key,
+        'fingerprint': fp,
+        'build': build,
+        'config': args.config,
+        'status': status,
+        'start': round(start, 3),
+        'end': round(end, 3),
+        'maxrss_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        'machine': machine,
+    }
+
+    # an interrupted run (e.g. ^C of the sweep) is not recorded
+    if status != -signal.SIGINT:
+        append(journal, entry)
+        if fp:
+            append(memo_path(buildroot), entry)
+
+    return status if status >= 0 else 128 - status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,44 +7,100 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.join(BASE_DIR, 'infra'))
 
 import infra
-from instances import *
+import packages.host_tools
+import util
+from instances import Journaled, LazyInstance
+from commands import (
+    Adaptive, BinStats, BuildTime, ExportLaunchers, Journal, PassStats,
+    Prefetch, Regress, Reports, Results, Stabilize, Sweep, Symbolize,
+    Toolchain
+)
+from targets import Startup, TypeCheck
 from infra.instances.clang import Clang
 from infra.packages.llvm import LLVM
 from infra.instances import ASan
 from infra.packages.gnu import BinUtils
 
+# build tools and libraries from source even if the host has suitable ones
+if '--no-host-tools' in sys.argv:
+    sys.argv.remove('--no-host-tools')
+    packages.host_tools.enabled = False
+
+# record runs in the run journal (see setup.py journal): run ... --journal
+if '--journal' in sys.argv:
+    sys.argv.remove('--journal')
+    util.journal_runs = True
+
+# record runs in a separate journal directory: run ... --journal-dir <dir>
+if '--journal-dir' in sys.argv:
+    i = sys.argv.index('--journal-dir')
+    util.journal_dir = os.path.abspath(sys.argv[i + 1])
+    util.journal_runs = True
+    del sys.argv[i:i + 2]
+
+# time the compiler invocations of target builds (see setup.py buildtime)
+if '--time-builds' in sys.argv:
+    sys.argv.remove('--time-builds')
+    util.time_builds = True
+
+# build a source package at another commit: --commit DangSanSource=<sha>
+while '--commit' in sys.argv:
+    i = sys.argv.index('--commit')
+    package, commit = sys.argv[i + 1].split('=', 1)
+    util.commit_overrides[package] = commit
+    del sys.argv[i:i + 2]
+
 setup = infra.Setup(__file__)
+packages.host_tools.context = setup.ctx
 llvm = LLVM('6.0.0', True)
 llvm.binutils = BinUtils('2.30')
 
 ''' Sanitizers '''
-setup.add_instance(DeltaTags('deltatags', 'none', 'old'))
-setup.add_instance(ClangCFI(llvm))
-setup.add_instance(UbSan(llvm))
-setup.add_instance(DangSan())
-setup.add_instance(FFMalloc(llvm))
-setup.add_instance(HexType())
-setup.add_instance(MarkUs(llvm=llvm))
-setup.add_instance(Memcheck(llvm))
-setup.add_instance(HexVasan())
-setup.add_instance(ASan(llvm))
-setup.add_instance(TypeSan(
+# instances are declared by name and class, and are only imported and
+# constructed when they are used (see instances/__init__.py)
+setup.add_instance(LazyInstance('deltatags', 'DeltaTags', 'deltatags', 'none', 'old'))
+setup.add_instance(LazyInstance('clang-%s-cfi' % llvm.version, 'ClangCFI', llvm))
+setup.add_instance(LazyInstance('clang-%s-ubsan' % llvm.version, 'UbSan', llvm))
+setup.add_instance(LazyInstance('dangsan', 'DangSan'))
+setup.add_instance(LazyInstance('ffmalloc', 'FFMalloc', llvm))
+setup.add_instance(LazyInstance('hextype', 'HexType'))
+setup.add_instance(LazyInstance('markus', 'MarkUs', llvm=llvm))
+setup.add_instance(LazyInstance('memcheck', 'Memcheck', llvm))
+setup.add_instance(LazyInstance('hexvasan', 'HexVasan'))
+setup.add_instance(Journaled(ASan(llvm)))
+setup.add_instance(LazyInstance('typesan', 'TypeSan',
     ignorelist_path=os.path.join(
         BASE_DIR, 'ignorelists', 'typesan_ignorelist.txt'),
 ))
-setup.add_instance(LowFat(
+setup.add_instance(LazyInstance('lowfat', 'LowFat',
     ignorelist_path=os.path.join(
         BASE_DIR, 'ignorelists', 'lowfat_ignorelist.txt')
 ))
-setup.add_instance(MSan(llvm))
+setup.add_instance(LazyInstance('clang-%s-msan' % llvm.version, 'MSan', llvm))
 
 ''' Baselines '''
-setup.add_instance(Clang(llvm))
-setup.add_instance(Clang(llvm, lto=True))
-setup.add_instance(HexTypeBaseline())
-setup.add_instance(DangSanBaseline())
-setup.add_instance(LowFatBaseline())
-setup.add_instance(TypeSanBaseline())
+setup.add_instance(Journaled(Clang(llvm)))
+setup.add_instance(Journaled(Clang(llvm, lto=True)))
+setup.add_instance(LazyInstance('hextype-baseline', 'HexTypeBaseline'))
+setup.add_instance(LazyInstance('dangsan-baseline', 'DangSanBaseline'))
+setup.add_instance(LazyInstance('lowfat-baseline', 'LowFatBaseline'))
+setup.add_instance(LazyInstance('typesan-baseline', 'TypeSanBaseline'))
+
+''' Commands '''
+setup.add_command(PassStats())
+setup.add_command(Symbolize())
+setup.add_command(Reports())
+setup.add_command(ExportLaunchers())
+setup.add_command(Toolchain())
+setup.add_command(Prefetch())
+setup.add_command(Journal())
+setup.add_command(Adaptive())
+setup.add_command(Results())
+setup.add_command(Regress())
+setup.add_command(Stabilize())
+setup.add_command(Sweep())
+setup.add_command(BinStats())
+setup.add_command(BuildTime())
 
 ''' Targets '''
 patches = ['asan', 'dealII-stddef', 'omnetpp-invalid-ptrcheck', 'gcc-init-ptr', 'libcxx']
@@ -55,5 +111,7 @@ setup.add_target(infra.targets.SPEC2006(
     source_type='mounted',   # SET THIS FOR SPEC
     patches=patches
 ))
+setup.add_target(Startup())
+setup.add_target(TypeCheck())
 
 setup.main()
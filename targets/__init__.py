@@ -0,0 +1,2 @@
+from .startup import Startup
+from .typecheck import TypeCheck
@@ -0,0 +1,14 @@
+/*
+ * Trivial C program for the startup target: prints the CLOCK_MONOTONIC
+ * time at which main is entered, so that the launcher can compute the
+ * exec-to-main latency, and exits.
+ */
+#include <stdio.h>
+#include <time.h>
+
+int main(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    printf("%lld\n", (long long)ts.tv_sec * 1000000000LL + ts.tv_nsec);
+    return 0;
+}
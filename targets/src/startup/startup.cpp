@@ -0,0 +1,29 @@
+/*
+ * Trivial C++ program for the startup target: like startup.c, but it also
+ * pulls in the C++ runtime with a static constructor, a heap-allocated
+ * polymorphic object and a standard container.
+ */
+#include <cstdio>
+#include <ctime>
+#include <memory>
+#include <string>
+#include <vector>
+
+struct Base {
+    virtual ~Base() {}
+    virtual int value() const { return 1; }
+};
+
+struct Derived : Base {
+    int value() const override { return 2; }
+};
+
+static std::vector<std::string> names = {"startup"};
+
+int main() {
+    timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    std::unique_ptr<Base> object(new Derived);
+    std::printf("%lld\n", (long long)ts.tv_sec * 1000000000LL + ts.tv_nsec);
+    return object->value() == 2 && !names.empty() ? 0 : 1;
+}
@@ -0,0 +1,256 @@
+/*
+ * Cast- and type-check-heavy workloads for the typecheck target. Every
+ * cast is valid, so type confusion sanitizers (HexType, TypeSan) check
+ * them without reporting anything.
+ *
+ * Usage: typecheck <workload> <iterations>
+ * Prints: <workload> <casts> <nanoseconds>
+ *
+ * Only the workload loop is timed. <casts> is the number of casts and
+ * placement-new constructions it performed, i.e. the number of type checks
+ * or type updates an instrumented build executes.
+ */
+#include <chrono>
+#include <cstdint>
+#include <cstdio>
+#include <cstdlib>
+#include <functional>
+#include <map>
+#include <memory>
+#include <new>
+#include <random>
+#include <string>
+#include <vector>
+
+static const int depth = 8;
+static const int objects = 4096;
+
+volatile long sink;
+
+struct Shape {
+    explicit Shape(int kind) : kind(kind) {}
+    virtual ~Shape() {}
+    virtual long area() const { return kind; }
+    int kind;
+};
+
+// a deep single-inheritance hierarchy, Level<N> derives from Level<N - 1>
+template <int N>
+struct Level : Level<N - 1> {
+    explicit Level(int kind = N) : Level<N - 1>(kind), value(N) {}
+    long area() const override { return Level<N - 1>::area() + value; }
+    long value;
+};
+
+template <>
+struct Level<0> : Shape {
+    explicit Level(int kind = 0) : Shape(kind) {}
+};
+
+// a second base, for cross casts through multiple inheritance
+struct Named {
+    virtual ~Named() {}
+    virtual long id() const { return 1; }
+};
+
+struct Widget : Level<depth - 2>, Named {
+    Widget() : Level<depth - 2>(depth + 1) {}
+    long id() const override { return 2; }
+};
+
+template <int N>
+static Shape *make_level(int kind) {
+    if (kind == N)
+        return new Level<N>();
+    return make_level<N - 1>(kind);
+}
+
+template <>
+Shape *make_level<0>(int) {
+    return new Level<0>();
+}
+
+// kinds 0..depth are Level<kind>, kind depth + 1 is a Widget
+static Shape *make_shape(int kind) {
+    if (kind > depth)
+        return new Widget();
+    return make_level<depth>(kind);
+}
+
+static std::vector<Shape *> make_shapes(int min_kind, int max_kind) {
+    std::mt19937 rng(42);
+    std::uniform_int_distribution<int> dist(min_kind, max_kind);
+    std::vector<Shape *> shapes;
+    for (int i = 0; i < objects; i++)
+        shapes.push_back(make_shape(dist(rng)));
+    return shapes;
+}
+
+static void free_shapes(std::vector<Shape *> &shapes) {
+    for (Shape *shape : shapes)
+        delete shape;
+    shapes.clear();
+}
+
+// dynamic_cast down the hierarchy and across to a second base
+static void dynamic_casts(long iterations) {
+    std::vector<Shape *> shapes = make_shapes(0, depth + 1);
+    long casts = 0, sum = 0;
+    auto start = std::chrono::steady_clock::now();
+    for (long i = 0; i < iterations; i++) {
+        for (Shape *shape : shapes) {
+            if (auto *level = dynamic_cast<Level<depth / 2> *>(shape))
+                sum += level->value;
+            if (auto *deep = dynamic_cast<Level<depth - 1> *>(shape))
+                sum += deep->value;
+            if (auto *named = dynamic_cast<Named *>(shape))
+                sum += named->id();
+            casts += 3;
+        }
+    }
+    auto end = std::chrono::steady_clock::now();
+    sink = sum;
+    free_shapes(shapes);
+    std::printf("dynamic-cast %ld %lld\n", casts, (long long)
+        std::chrono::duration_cast<std::chrono::nanoseconds>(end - start).count());
+}
+
+// static_cast downcasts to intermediate levels, all objects are at least
+// Level<3>
+static void static_casts(long iterations) {
+    std::vector<Shape *> shapes = make_shapes(3, depth + 1);
+    long casts = 0, sum = 0;
+    auto start = std::chrono::steady_clock::now();
+    for (long i = 0; i < iterations; i++) {
+        for (Shape *shape : shapes) {
+            auto *one = static_cast<Level<1> *>(shape);
+            auto *two = static_cast<Level<2> *>(one);
+            auto *three = static_cast<Level<3> *>(two);
+            sum += one->value + two->value + three->value;
+            // keep the compiler from folding the loop over iterations
+            three->value = sum & 3;
+            casts += 3;
+        }
+    }
+    auto end = std::chrono::steady_clock::now();
+    sink = sum;
+    free_shapes(shapes);
+    std::printf("static-cast %ld %lld\n", casts, (long long)
+        std::chrono::duration_cast<std::chrono::nanoseconds>(end - start).count());
+}
+
+// objects passed around as opaque handles and cast back with
+// reinterpret_cast, as C callback APIs do
+static void reinterpret_casts(long iterations) {
+    std::vector<Shape *> shapes = make_shapes(5, depth);
+    std::vector<std::uintptr_t> handles;
+    for (Shape *shape : shapes)
+        handles.push_back(
+            reinterpret_cast<std::uintptr_t>(static_cast<Level<5> *>(shape)));
+    long casts = 0, sum = 0;
+    auto start = std::chrono::steady_clock::now();
+    for (long i = 0; i < iterations; i++) {
+        for (std::uintptr_t handle : handles) {
+            auto *level = reinterpret_cast<Level<5> *>(handle);
+            sum += level->value;
+            void *opaque = level;
+            sum += reinterpret_cast<Level<5> *>(opaque)->area();
+            casts += 2;
+        }
+    }
+    auto end = std::chrono::steady_clock::now();
+    sink = sum;
+    free_shapes(shapes);
+    std::printf("reinterpret-cast %ld %lld\n", casts, (long long)
+        std::chrono::duration_cast<std::chrono::nanoseconds>(end - start).count());
+}
+
+// objects of changing types constructed with placement new in a reused
+// arena, as pool allocators and variant types do
+static void placement_new(long iterations) {
+    const size_t slot = sizeof(Widget) > sizeof(Level<depth>) ?
+        sizeof(Widget) : sizeof(Level<depth>);
+    const size_t align = alignof(Widget) > alignof(Level<depth>) ?
+        alignof(Widget) : alignof(Level<depth>);
+    const size_t stride = (slot + align - 1) / align * align;
+    const int slots = objects / 4;
+    unsigned char *arena = static_cast<unsigned char *>(
+        std::malloc(stride * slots + align));
+    unsigned char *base = reinterpret_cast<unsigned char *>(
+        (reinterpret_cast<std::uintptr_t>(arena) + align - 1) / align * align);
+
+    long casts = 0, sum = 0;
+    auto start = std::chrono::steady_clock::now();
+    for (long i = 0; i < iterations; i++) {
+        for (int j = 0; j < slots; j++) {
+            void *memory = base + j * stride;
+            Shape *shape;
+            switch ((i + j) % 3) {
+            case 0: shape = new (memory) Level<2>(); break;
+            case 1: shape = new (memory) Level<depth>(); break;
+            default: shape = new (memory) Widget(); break;
+            }
+            sum += static_cast<Level<2> *>(shape)->value + shape->area();
+            shape->~Shape();
+            casts += 2;
+        }
+    }
+    auto end = std::chrono::steady_clock::now();
+    sink = sum;
+    std::free(arena);
+    std::printf("placement-new %ld %lld\n", casts, (long long)
+        std::chrono::duration_cast<std::chrono::nanoseconds>(end - start).count());
+}
+
+// polymorphic containers with allocation churn: objects are created,
+// looked up by key, down-cast and destroyed
+static void containers(long iterations) {
+    std::mt19937 rng(42);
+    std::uniform_int_distribution<int> dist(1, depth + 1);
+    std::vector<std::unique_ptr<Shape>> shapes;
+    std::map<int, Shape *> index;
+    long casts = 0, sum = 0;
+    auto start = std::chrono::steady_clock::now();
+    for (long i = 0; i < iterations; i++) {
+        for (int j = 0; j < objects / 4; j++) {
+            shapes.emplace_back(make_shape(dist(rng)));
+            index[j] = shapes.back().get();
+        }
+        for (auto &entry : index) {
+            Shape *shape = entry.second;
+            sum += static_cast<Level<1> *>(shape)->value;
+            if (auto *named = dynamic_cast<Named *>(shape))
+                sum += named->id();
+            casts += 2;
+        }
+        for (auto &shape : shapes)
+            sum += shape->area();
+        // drop the older half
+        shapes.erase(shapes.begin(), shapes.begin() + shapes.size() / 2);
+        index.clear();
+    }
+    auto end = std::chrono::steady_clock::now();
+    sink = sum;
+    std::printf("containers %ld %lld\n", casts, (long long)
+        std::chrono::duration_cast<std::chrono::nanoseconds>(end - start).count());
+}
+
+int main(int argc, char **argv) {
+    static const std::map<std::string, std::function<void(long)>> workloads = {
+        {"dynamic-cast", dynamic_casts},
+        {"static-cast", static_casts},
+        {"reinterpret-cast", reinterpret_casts},
+        {"placement-new", placement_new},
+        {"containers", containers},
+    };
+    if (argc != 3 || !workloads.count(argv[1])) {
+        std::fprintf(stderr, "usage: %s <workload> <iterations>\n", argv[0]);
+        std::fprintf(stderr, "workloads:");
+        for (auto &workload : workloads)
+            std::fprintf(stderr, " %s", workload.first.c_str());
+        std::fprintf(stderr, "\n");
+        return 1;
+    }
+    workloads.at(argv[1])(std::atol(argv[2]));
+    return 0;
+}
@@ -0,0 +1,86 @@
+import json
+import os
+import shlex
+import infra
+from infra.util import run
+from tools.startup import measure, summarize
+from util import target_run_command
+
+srcdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src',
+                      'startup')
+
+
+class Startup(infra.Target):
+    """
+    Startup microbenchmarks: trivial C and C++ programs that are launched
+    many times under an instance, to measure the latency from exec to main
+    and from exec to exit. For short-lived processes this is dominated by
+    sanitizer runtime initialization (shadow mappings, metadata setup,
+    LD_PRELOADed allocators) and by run wrappers like Valgrind, which are
+    included. The run journal wrapper is left out.
+
+    Results are printed and written to ``<buildroot>/startup/<instance>.json``
+    with latencies in microseconds.
+    """
+    name = 'startup'
+
+    # program -> (source, compiler, compiler flags)
+    programs = {
+        'startup-c': ('startup.c', 'cc', 'cflags'),
+        'startup-cxx': ('startup.cpp', 'cxx', 'cxxflags'),
+    }
+
+    def add_run_args(self, parser):
+        parser.add_argument('-n', '--launches', type=int, default=1000,
+                help='measured launches per program (default: 1000)')
+        parser.add_argument('--warmup', type=int, default=10,
+                help='unmeasured launches per program (default: 10)')
+        parser.add_argument('--programs', nargs='+', metavar='PROGRAM',
+                choices=sorted(self.programs), default=sorted(self.programs),
+                help='programs to run (default: all)')
+
+    def is_fetched(self, ctx):
+        return True
+
+    def fetch(self, ctx):
+        pass
+
+    def build(self, ctx, instance, pool=None):
+        for program, (source, compiler, flags) in self.programs.items():
+            # one directory per program, so that setup.py buildtime
+            # attributes the invocations to the program
+            builddir = self.path(ctx, instance.name, program)
+            os.makedirs(builddir, exist_ok=True)
+            os.chdir(builddir)
+            cc = shlex.split(getattr(ctx, compiler))
+            run(ctx, [*cc, *getattr(ctx, flags), '-c',
+                      os.path.join(srcdir, source), '-o', program + '.o'])
+            run(ctx, [*cc, program + '.o', *ctx.ldflags, '-o', program])
+
+    def binary_paths(self, ctx, instance):
+        return [self.path(ctx, instance.name, program, program)
+                for program in self.programs]
+
+    def run(self, ctx, instance, pool=None):
+        env, wrapper = target_run_command(ctx)
+
+        results = {}
+        for program in ctx.args.programs:
+            binary = self.path(ctx, instance.name, program, program)
+            ctx.log.info('launching %s %d times' % (program,
+                                                    ctx.args.launches))
+            samples = measure(wrapper + [binary], env, ctx.args.launches,
+                              ctx.args.warmup)
+            results[program] = {point: summarize(latencies)
+                                for point, latencies in samples.items()}
+
+            for point, summary in sorted(results[program].items()):
+                print('%-12s %-16s exec-to-%-4s %s' % (instance.name, program,
+                      point, '  '.join('%s %8.1fus' % (key, summary[key])
+                                      for key in ('min', 'p50', 'p90', 'p99',
+                                                  'mean'))))
+
+        outdir = os.path.join(ctx.paths.buildroot, 'startup')
+        os.makedirs(outdir, exist_ok=True)
+        with open(os.path.join(outdir, instance.name + '.json'), 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
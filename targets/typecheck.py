@@ -0,0 +1,117 @@
+import json
+import os
+import shlex
+import subprocess
+import infra
+from infra.util import FatalError, run
+from tools.stats import percentile
+from util import target_run_command
+
+source = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src',
+                      'typecheck', 'typecheck.cpp')
+
+
+class TypeCheck(infra.Target):
+    """
+    C++ workloads that stress type confusion checks: dynamic_cast and
+    static_cast hot loops over a deep class hierarchy, reinterpret_cast of
+    opaque handles, placement new in a reused arena, and polymorphic
+    containers with allocation churn. Meant for ``HexType`` and ``TypeSan``
+    and their baselines.
+
+    Every workload runs ``--repetitions`` times. Results (median time and
+    checks per second) are printed and written to
+    ``<buildroot>/typecheck/<instance>.json``. With ``--baseline``, the
+    overhead over the stored results of the baseline instance is printed as
+    well, so run the baseline first.
+    """
+    name = 'typecheck'
+
+    # workload -> default iterations, about half a second each natively
+    workloads = {
+        'dynamic-cast': 500,
+        'static-cast': 50000,
+        'reinterpret-cast': 8000,
+        'placement-new': 50000,
+        'containers': 1000,
+    }
+
+    def add_run_args(self, parser):
+        parser.add_argument('--workloads', nargs='+', metavar='WORKLOAD',
+                choices=sorted(self.workloads), default=sorted(self.workloads),
+                help='workloads to run (default: all)')
+        parser.add_argument('-r', '--repetitions', type=int, default=5,
+                help='runs per workload (default: 5)')
+        parser.add_argument('--scale', type=float, default=1.0,
+                help='multiply the iterations of every workload')
+        parser.add_argument('--baseline', metavar='INSTANCE',
+                help='report the overhead over this instance')
+
+    def is_fetched(self, ctx):
+        return True
+
+    def fetch(self, ctx):
+        pass
+
+    def build(self, ctx, instance, pool=None):
+        builddir = self.path(ctx, instance.name)
+        os.makedirs(builddir, exist_ok=True)
+        os.chdir(builddir)
+        cxx = shlex.split(ctx.cxx)
+        run(ctx, [*cxx, *ctx.cxxflags, '-c', source, '-o', 'typecheck.o'])
+        run(ctx, [*cxx, 'typecheck.o', *ctx.ldflags, '-o', 'typecheck'])
+
+    def binary_paths(self, ctx, instance):
+        return [self.path(ctx, instance.name, 'typecheck')]
+
+    def run(self, ctx, instance, pool=None):
+        env, wrapper = target_run_command(ctx)
+        binary = self.path(ctx, instance.name, 'typecheck')
+        outdir = os.path.join(ctx.paths.buildroot, 'typecheck')
+
+        baseline = {}
+        if ctx.args.baseline:
+            path = os.path.join(outdir, ctx.args.baseline + '.json')
+            if not os.path.exists(path):
+                raise FatalError('no results for %s, run it first' %
+                                 ctx.args.baseline)
+            with open(path) as f:
+                baseline = json.load(f)
+
+        results = {}
+        for workload in ctx.args.workloads:
+            iterations = max(1, int(self.workloads[workload] *
+                                    ctx.args.scale))
+            seconds = []
+            for _ in range(ctx.args.repetitions):
+                proc = subprocess.run(wrapper + [binary, workload,
+                                                 str(iterations)],
+                                      env=env, stdout=subprocess.PIPE,
+                                      universal_newlines=True)
+                if proc.returncode:
+                    raise FatalError('%s %s exited with %d' % (
+                                     instance.name, workload, proc.returncode))
+                # the last line, run wrappers may print to stdout as well
+                _, casts, ns = proc.stdout.split('\n')[-2].split()
+                seconds.append(int(ns) / 1e9)
+
+            median = percentile(seconds, 50)
+            result = results[workload] = {
+                'iterations': iterations,
+                'casts': int(casts),
+                'seconds': seconds,
+                'median': median,
+                'checks_per_second': int(casts) / median,
+            }
+
+            line = '%-20s %-18s %9.3fs %14.0f checks/s' % (instance.name,
+                   workload, median, result['checks_per_second'])
+            base = baseline.get(workload)
+            if base and base['iterations'] == iterations:
+                result['overhead'] = median / base['median']
+                line += ' %8.2fx' % result['overhead']
+            print(line)
+
+        os.makedirs(outdir, exist_ok=True)
+        with open(os.path.join(outdir, instance.name + '.json'), 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
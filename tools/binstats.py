@@ -0,0 +1,159 @@
+import fnmatch
+import re
+import struct
+import subprocess
+from collections import Counter
+from typing import Dict, Iterable
+
+# sanitizer runtime entry points whose call sites are counted
+runtime_patterns = (
+    '__noinstrument_*', 'metaset_*', 'metaget_*', 'metacheck_*',
+    'initialize_global_metadata', '__vasan*', '__msan_*', '__ubsan_handle_*',
+    '__asan_*', '__cfi_*', '__typesan*', '__hextype*', '__lowfat*',
+    'lowfat_*', '__safestack*', 'dang_*',
+)
+
+SHF_WRITE = 0x1
+SHF_ALLOC = 0x2
+SHF_EXECINSTR = 0x4
+SHT_NOBITS = 8
+
+
+def section_sizes(path: str) -> Dict[str, int]:
+    """
+    Returns the sizes of the loaded parts of an ELF64 binary: ``text``
+    (executable sections), ``rodata`` (read-only data), ``data`` (writable
+    data) and ``bss`` (zero-initialized data).
+    """
+    sizes = Counter(text=0, rodata=0, data=0, bss=0)
+    with open(path, 'rb') as f:
+        ident = f.read(16)
+        if ident[:4] != b'\x7fELF' or ident[4] != 2:
+            raise ValueError('%s is not an ELF64 binary' % path)
+        endian = '<' if ident[5] == 1 else '>'
+        f.seek(0x28)
+        shoff, = struct.unpack(endian + 'Q', f.read(8))
+        f.seek(0x3a)
+        shentsize, shnum = struct.unpack(endian + 'HH', f.read(4))
+
+        for i in range(shnum):
+            f.seek(shoff + i * shentsize)
+            _, sh_type, flags, _, _, size = \
+                struct.unpack(endian + 'IIQQQQ', f.read(40))
+            if not flags & SHF_ALLOC:
+                continue
+            if flags & SHF_EXECINSTR:
+                sizes['text'] += size
+            elif sh_type == SHT_NOBITS:
+                sizes['bss'] += size
+            elif flags & SHF_WRITE:
+                sizes['data'] += size
+            else:
+                sizes['rodata'] += size
+    return dict(sizes)
+
+
+func_re = re.compile(r'^[0-9a-f]+ <(.+)>:$')
+insn_re = re.compile(r'^\s+[0-9a-f]+:\s+(\S+)\s*(.*)$')
+target_re = re.compile(r'<([^>+]+)(?:\+0x[0-9a-f]+)?>')
+
+
+def analyze(path: str, patterns: Iterable[str] = runtime_patterns) -> Dict:
+    """
+    Disassembles a binary with ``objdump`` and counts per function the
+    instructions, conditional branches, traps (``ud2``, used by CFI and
+    trapping UBSan checks) and calls into sanitizer runtime functions.
+    """
+    patterns = list(patterns)
+
+    def is_runtime(symbol):
+        symbol = symbol.split('@')[0]
+        return any(fnmatch.fnmatchcase(symbol, p) for p in patterns)
+
+    functions = {}
+    current = None
+    proc = subprocess.Popen(['objdump', '-d', '--no-show-raw-insn', path],
+                            stdout=subprocess.PIPE, universal_newlines=True)
+    for line in proc.stdout:
+        m = func_re.match(line)
+        if m:
+            current = functions.setdefault(m.group(1), {
+                'insns': 0, 'branches': 0, 'traps': 0, 'calls': Counter()})
+            continue
+        m = insn_re.match(line)
+        if not m or current is None:
+            continue
+        mnemonic, operands = m.groups()
+        current['insns'] += 1
+        if mnemonic.startswith('j') and not mnemonic.startswith('jmp'):
+            current['branches'] += 1
+        elif mnemonic == 'ud2':
+            current['traps'] += 1
+        elif mnemonic.startswith(('call', 'jmp')):
+            target = target_re.search(operands)
+            if target and is_runtime(target.group(1)):
+                current['calls'][target.group(1).split('@')[0]] += 1
+    if proc.wait():
+        raise OSError('objdump failed on ' + path)
+
+    # runtime functions themselves (linked in statically) are not call sites
+    functions = {name: f for name, f in functions.items()
+                 if not is_runtime(name) and not name.endswith('@plt')}
+    runtime_calls = Counter()
+    for f in functions.values():
+        runtime_calls.update(f['calls'])
+
+    return {
+        'sections': section_sizes(path),
+        'functions': functions,
+        'runtime_calls': dict(runtime_calls),
+    }
+
+
+def compare(instance: Dict, baseline: Dict, top: int = 20) -> Dict:
+    """
+    Compares the analysis of an instance binary with that of its baseline:
+    section size deltas, runtime call counts, and the functions that grew
+    the most, with their extra instructions, branches and traps (the
+    inserted check sequences).
+    """
+    sections = {name: {'baseline': baseline['sections'].get(name, 0),
+                       'instance': size,
+                       'delta': size - baseline['sections'].get(name, 0)}
+                for name, size in instance['sections'].items()}
+
+    empty = {'insns': 0, 'branches': 0, 'traps': 0, 'calls': {}}
+    functions = []
+    for name, f in instance['functions'].items():
+        b = baseline['functions'].get(name, empty)
+        functions.append({
+            'function': name,
+            'insns': f['insns'],
+            'baseline_insns': b['insns'],
+            'added_insns': f['insns'] - b['insns'],
+            'added_branches': f['branches'] - b['branches'],
+            'added_traps': f['traps'] - b['traps'],
+            'runtime_calls': sum(f['calls'].values()),
+        })
+    functions.sort(key=lambda f: -f['added_insns'])
+
+    # whole-binary totals, including functions only one of them has
+    def total(analysis, key):
+        return sum(f[key] for f in analysis['functions'].values())
+
+    insns = total(instance, 'insns')
+    base_insns = total(baseline, 'insns')
+    calls = sum(instance['runtime_calls'].values())
+    return {
+        'sections': sections,
+        'insns': insns,
+        'baseline_insns': base_insns,
+        'added_insns': insns - base_insns,
+        'runtime_calls': instance['runtime_calls'],
+        # runtime call sites per 1000 instructions
+        'call_density': 1000.0 * calls / insns if insns else 0.0,
+        'added_branches': total(instance, 'branches') -
+                          total(baseline, 'branches'),
+        'added_traps': total(instance, 'traps') - total(baseline, 'traps'),
+        'top_functions': functions[:top],
+    }
@@ -0,0 +1,101 @@
+import json
+import os
+from collections import defaultdict
+from typing import Dict, List
+from infra.util import Namespace
+
+
+def buildtime_dir(buildroot: str, instance: str) -> str:
+    return os.path.join(buildroot, 'buildtime', instance)
+
+
+def install_build_timer(ctx: Namespace, instance: str) -> None:
+    """
+    Makes the compiler invocations of a target build go through the timing
+    wrapper (``scripts/build-timer.py``) by replacing ``ctx.cc`` and
+    ``ctx.cxx`` with symlinks to it in ``<buildroot>/buildtime/<instance>/
+    bin``, named after the variable, since both may be the same program
+    (e.g. ``ccache``). Call this after the instance has configured its
+    compilers.
+
+    :param ctx: the configuration context
+    :param instance: name of the instance to attribute invocations to
+    """
+    bindir = os.path.join(buildtime_dir(ctx.paths.buildroot, instance), 'bin')
+    os.makedirs(bindir, exist_ok=True)
+    script = os.path.join(ctx.paths.root, 'scripts', 'build-timer.py')
+
+    config = {}
+    for var in ('cc', 'cxx'):
+        command = ctx.get(var)
+        if not command or command.split()[0].startswith(bindir):
+            continue
+        config[var] = command
+        link = os.path.join(bindir, var)
+        if os.path.realpath(link) != os.path.realpath(script):
+            if os.path.lexists(link):
+                os.remove(link)
+            os.symlink(script, link)
+        setattr(ctx, var, link)
+
+    with open(os.path.join(bindir, 'config.json'), 'w') as f:
+        json.dump(config, f, indent=2, sort_keys=True)
+
+
+def benchmark_of(cwd: str) -> str:
+    """
+    Returns the benchmark a build directory belongs to: the directory after
+    ``benchspec/<suite>/`` for SPEC, otherwise the directory name.
+    """
+    parts = cwd.split(os.sep)
+    if 'benchspec' in parts:
+        i = parts.index('benchspec')
+        if i + 2 < len(parts):
+            return parts[i + 2]
+    return os.path.basename(cwd)
+
+
+def load_invocations(buildroot: str, instance: str) -> List[Dict]:
+    """
+    Loads the recorded compiler invocations of an instance. Of repeated
+    invocations producing the same output in the same directory (rebuilds),
+    only the newest one is kept. Failed invocations are skipped.
+    """
+    path = os.path.join(buildtime_dir(buildroot, instance),
+                        'invocations.jsonl')
+    newest = {}
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry['returncode'] != 0:
+                continue
+            entry['benchmark'] = benchmark_of(entry['cwd'])
+            key = (entry['benchmark'], entry['kind'],
+                   os.path.join(entry['cwd'], entry['output']))
+            if key not in newest or newest[key]['start'] < entry['start']:
+                newest[key] = entry
+    return sorted(newest.values(), key=lambda e: e['start'])
+
+
+def summarize(invocations: List[Dict]) -> Dict[str, Dict]:
+    """
+    Sums the invocations per benchmark and kind.
+
+    :returns: ``{benchmark: {kind: {'count', 'wall_s', 'cpu_s',
+              'maxrss_kb'}}}``, where ``maxrss_kb`` is the largest peak of a
+              single invocation
+    """
+    totals = defaultdict(lambda: defaultdict(
+        lambda: {'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'maxrss_kb': 0}))
+    for entry in invocations:
+        total = totals[entry['benchmark']][entry['kind']]
+        total['count'] += 1
+        total['wall_s'] += entry['wall_s']
+        total['cpu_s'] += entry['user_s'] + entry['sys_s']
+        total['maxrss_kb'] = max(total['maxrss_kb'], entry['maxrss_kb'])
+    return {bench: dict(kinds) for bench, kinds in totals.items()}
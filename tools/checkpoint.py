@@ -0,0 +1,109 @@
+import functools
+import json
+import os
+import shutil
+from typing import Dict, Iterable, List
+from infra.util import Namespace
+
+
+def steps_dir(ctx: Namespace, package) -> str:
+    return package.path(ctx, 'steps')
+
+
+def step(fn):
+    """
+    Decorator for a build or install phase of a package, e.g.
+    ``_build_llvm``. When the phase completes, a stamp with its arguments is
+    written to ``<package>/steps/<phase>``. If a build is interrupted and
+    restarted, phases with a stamp for the same arguments are skipped, so
+    the build resumes at the phase that failed. Call :func:`clear_steps`
+    when the whole build has completed, so that a forced rebuild runs every
+    phase again.
+    """
+    @functools.wraps(fn)
+    def wrapper(self, ctx, *args, **kwargs):
+        name = fn.__name__.lstrip('_')
+        stamp = os.path.join(steps_dir(ctx, self), name)
+        key = json.dumps([args, kwargs], sort_keys=True, default=str)
+
+        if os.path.exists(stamp):
+            with open(stamp) as f:
+                if f.read() == key:
+                    ctx.log.info('skipping %s of %s, completed by an '
+                                 'earlier build' % (name, self.ident()))
+                    return
+
+        cwd = os.getcwd()
+        fn(self, ctx, *args, **kwargs)
+        os.chdir(cwd)
+
+        os.makedirs(os.path.dirname(stamp), exist_ok=True)
+        with open(stamp, 'w') as f:
+            f.write(key)
+
+    return wrapper
+
+
+def clear_steps(ctx: Namespace, package) -> None:
+    """
+    Removes the phase stamps of a package after its build or install has
+    completed.
+    """
+    shutil.rmtree(steps_dir(ctx, package), ignore_errors=True)
+
+
+def journal_path(ctx: Namespace, instance: str) -> str:
+    return os.path.join(ctx.paths.buildroot, 'journal', instance + '.jsonl')
+
+
+def strip_journal_wrapper(wrapper: List[str]) -> List[str]:
+    """
+    Removes the journal wrapper (see ``util.journal_wrapper``) from a run
+    wrapper command, leaving the wrappers it runs.
+    """
+    if wrapper and os.path.basename(wrapper[0]) == 'run-journal.py':
+        return wrapper[wrapper.index('--') + 1:]
+    return wrapper
+
+
+def read_journal(path: str) -> Iterable[dict]:
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # a line cut short by an interrupted run
+                continue
+
+
+def completed_iterations(entries: Iterable[dict]) -> Dict[str, int]:
+    """
+    Counts the completed iterations per benchmark in a run journal. A
+    benchmark may run several commands (e.g. one per input); an iteration
+    is complete when every command of the benchmark succeeded once more.
+    """
+    counts = {}
+    for entry in entries:
+        cmds = counts.setdefault(entry['benchmark'], {})
+        cmds.setdefault(entry['cmd'], 0)
+        if entry['status'] == 0:
+            cmds[entry['cmd']] += 1
+    return {bench: min(cmds.values()) for bench, cmds in counts.items()}
+
+
+def iteration_runtimes(entries: Iterable[dict]) -> Dict[str, List[float]]:
+    """
+    Returns the runtime of every completed iteration per benchmark in a run
+    journal: the sum of the runtimes of the n-th successful run of each
+    command of the benchmark.
+    """
+    runtimes = {}
+    for entry in entries:
+        if entry['status'] == 0:
+            cmds = runtimes.setdefault(entry['benchmark'], {})
+            cmds.setdefault(entry['cmd'], []).append(
+                entry['end'] - entry['start'])
+    return {bench: [sum(its) for its in zip(*cmds.values())]
+            for bench, cmds in runtimes.items()}
@@ -0,0 +1,218 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Iterable, List, Optional
+from infra.util import FatalError, Namespace
+
+
+class GitSource:
+    """
+    A git repository, optionally at a specific commit.
+    """
+    def __init__(self, url: str, sha: Optional[str] = None):
+        self.url = url
+        self.sha = sha
+
+    def __str__(self):
+        return self.url + ('@' + self.sha if self.sha else '')
+
+
+class FileSource:
+    """
+    A file download, verified against ``sha256`` before use. Declare it for
+    every fixed release file. Without it, the checksum of the first download
+    is recorded in ``checksums.json`` in the download cache and only later
+    uses of the cached file are verified against it.
+    """
+    def __init__(self, url: str, sha256: Optional[str] = None):
+        self.url = url
+        self.sha256 = sha256
+
+    def __str__(self):
+        return self.url
+
+
+def cache_dir(ctx: Namespace) -> str:
+    return os.path.join(ctx.paths.buildroot, 'downloads')
+
+
+def cache_key(url: str) -> str:
+    parsed = urllib.parse.urlparse(url)
+    path = parsed.path if parsed.netloc else url.split(':', 1)[-1]
+    name = re.sub(r'[^\w.-]+', '_', path.strip('/'))
+    return '%s-%s' % (name, hashlib.sha1(url.encode()).hexdigest()[:8])
+
+
+@contextmanager
+def cache_lock(ctx: Namespace, key: str):
+    # serializes downloads of the same source between threads and between a
+    # build and a concurrent "setup.py prefetch"
+    os.makedirs(cache_dir(ctx), exist_ok=True)
+    with open(os.path.join(cache_dir(ctx), key + '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _run(cmd: List[str], cwd: Optional[str] = None) -> str:
+    # no infra.util.run here: prefetching runs in threads, so no chdir
+    proc = subprocess.run(cmd, cwd=cwd, stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT, universal_newlines=True)
+    if proc.returncode:
+        raise FatalError('command failed: %s\n%s' % (' '.join(cmd), proc.stdout))
+    return proc.stdout
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def is_commit_id(sha: Optional[str]) -> bool:
+    return bool(sha) and re.fullmatch(r'[0-9a-f]{40}', sha) is not None
+
+
+def ensure_git(ctx: Namespace, source: GitSource) -> str:
+    """
+    Makes sure the cache has an up-to-date bare mirror of a repository that
+    contains ``source.sha``. Returns the path of the mirror. Only a full
+    commit id that is already in the mirror skips the update; branch and tag
+    names always resolve in an existing mirror but may have moved upstream.
+    """
+    key = cache_key(source.url)
+    mirror = os.path.join(cache_dir(ctx), key + '.git')
+
+    with cache_lock(ctx, key):
+        if not os.path.exists(mirror):
+            _run(['git', 'clone', '--mirror', '--quiet', source.url,
+                  mirror + '.tmp'])
+            os.rename(mirror + '.tmp', mirror)
+        elif not is_commit_id(source.sha) or subprocess.call(
+                ['git', 'cat-file', '-e', source.sha + '^{commit}'],
+                cwd=mirror, stderr=subprocess.DEVNULL):
+            _run(['git', 'remote', 'update', '--prune'], cwd=mirror)
+
+    return mirror
+
+
+def ensure_file(ctx: Namespace, source: FileSource) -> str:
+    """
+    Makes sure the cache has a verified copy of a file download. Returns the
+    path of the cached file.
+    """
+    key = cache_key(source.url)
+    path = os.path.join(cache_dir(ctx), key)
+    sums_path = os.path.join(cache_dir(ctx), 'checksums.json')
+
+    with cache_lock(ctx, key):
+        if not os.path.exists(path):
+            try:
+                with urllib.request.urlopen(source.url) as response, \
+                        open(path + '.tmp', 'wb') as f:
+                    shutil.copyfileobj(response, f)
+            except OSError as e:
+                raise FatalError('download of %s failed: %s' % (source.url, e))
+            os.rename(path + '.tmp', path)
+
+        with cache_lock(ctx, 'checksums'):
+            try:
+                with open(sums_path) as f:
+                    sums = json.load(f)
+            except (OSError, ValueError):
+                sums = {}
+
+            if not source.sha256:
+                ctx.log.warning('no pinned checksum for %s, using the one '
+                                'recorded at its first download' % source.url)
+            expected = source.sha256 or sums.get(source.url)
+            actual = _sha256(path)
+            if expected and actual != expected:
+                os.remove(path)
+                raise FatalError('checksum mismatch for %s: expected %s, '
+                                 'got %s' % (source.url, expected, actual))
+
+            if not source.sha256 and sums.get(source.url) != actual:
+                sums[source.url] = actual
+                with open(sums_path, 'w') as f:
+                    json.dump(sums, f, indent=2, sort_keys=True)
+
+    return path
+
+
+def fetch_git(ctx: Namespace, source: GitSource, destination: str) -> None:
+    """
+    Clones a repository from the download cache to ``destination`` and
+    checks out ``source.sha``, verifying that the checkout matches it.
+    """
+    mirror = ensure_git(ctx, source)
+    _run(['git', 'clone', '--quiet', mirror, destination])
+    _run(['git', 'remote', 'set-url', 'origin', source.url], cwd=destination)
+
+    if source.sha:
+        _run(['git', 'checkout', '--quiet', source.sha], cwd=destination)
+        head = _run(['git', 'rev-parse', 'HEAD'], cwd=destination).strip()
+        if re.fullmatch(r'[0-9a-f]{7,40}', source.sha) and \
+                not head.startswith(source.sha):
+            raise FatalError('checked out %s instead of %s for %s' %
+                             (head, source.sha, source.url))
+
+
+def fetch_file(ctx: Namespace, source: FileSource) -> str:
+    """
+    Copies a verified file download from the download cache to the current
+    directory, like ``infra.util.download``. Returns the file name.
+    """
+    filename = os.path.basename(urllib.parse.urlparse(source.url).path)
+    shutil.copyfile(ensure_file(ctx, source), filename)
+    return filename
+
+
+def iter_sources(deps: Iterable, seen: Optional[set] = None):
+    """
+    Yields the sources of all packages in a dependency tree that declare
+    them with a ``fetch_sources`` method.
+    """
+    seen = set() if seen is None else seen
+    for package in deps or ():
+        if package.ident() in seen:
+            continue
+        seen.add(package.ident())
+        yield from iter_sources(package.dependencies(), seen)
+        if hasattr(package, 'fetch_sources'):
+            yield from package.fetch_sources()
+
+
+def prefetch(ctx: Namespace, sources: Iterable, jobs: int) -> int:
+    """
+    Downloads sources into the cache with at most ``jobs`` concurrent
+    downloads. Returns the number of failed downloads.
+    """
+    unique = {str(s): s for s in sources}
+    failed = 0
+
+    def ensure(source):
+        if isinstance(source, GitSource):
+            return ensure_git(ctx, source)
+        return ensure_file(ctx, source)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(ensure, s): s for s in unique.values()}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                ctx.log.info('fetched ' + str(futures[future]))
+            except FatalError as e:
+                ctx.log.error(str(e))
+                failed += 1
+
+    return failed
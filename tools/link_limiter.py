@@ -0,0 +1,67 @@
+import json
+import os
+from typing import List, Optional
+from infra.util import Namespace
+
+linker_names = ('ld', 'ld.gold', 'ld.bfd')
+
+
+def install_link_limiter(ctx: Namespace, default_mb: int = 4096,
+                         mem_fraction: float = 0.8,
+                         max_jobs: Optional[int] = None) -> str:
+    """
+    Installs the memory-aware linker wrapper (``scripts/link-limiter.py``) in
+    ``<buildroot>/link-limiter``. Concurrent links through the wrapper are
+    limited so that their observed peak memory fits in ``mem_fraction`` of
+    the total RAM. Compile jobs are not affected and still use ``ctx.jobs``.
+
+    :param ctx: the configuration context
+    :param default_mb: memory estimate for links that were not observed yet
+    :param mem_fraction: fraction of the total RAM that links may use
+    :param max_jobs: maximum number of concurrent links (default: ctx.jobs)
+    :returns: the directory to pass to the compiler driver with ``-B``
+    """
+    limiter_dir = os.path.join(ctx.paths.buildroot, 'link-limiter')
+    os.makedirs(limiter_dir, exist_ok=True)
+
+    config = {
+        'default_mb': default_mb,
+        'mem_fraction': mem_fraction,
+        'max_jobs': max_jobs or ctx.jobs,
+    }
+    with open(os.path.join(limiter_dir, 'config.json'), 'w') as f:
+        json.dump(config, f, indent=2)
+
+    script = os.path.join(ctx.paths.root, 'scripts', 'link-limiter.py')
+    for name in linker_names:
+        link = os.path.join(limiter_dir, name)
+        if os.path.realpath(link) != os.path.realpath(script):
+            if os.path.lexists(link):
+                os.remove(link)
+            os.symlink(script, link)
+
+    return limiter_dir
+
+
+def limit_link_jobs(ctx: Namespace, **kwargs) -> None:
+    """
+    Makes target links go through the memory-aware linker wrapper. Use this
+    for LTO instances where each link may need several GB of memory. Keyword
+    arguments are passed to :func:`install_link_limiter`.
+
+    :param ctx: the configuration context
+    """
+    ctx.ldflags += ['-B' + install_link_limiter(ctx, **kwargs)]
+
+
+def link_limiter_cmake_flags(ctx: Namespace, **kwargs) -> List[str]:
+    """
+    Returns CMake options that make the link steps of a CMake build (e.g.
+    LLVM) go through the memory-aware linker wrapper. Keyword arguments are
+    passed to :func:`install_link_limiter`.
+
+    :param ctx: the configuration context
+    """
+    flag = '-B' + install_link_limiter(ctx, **kwargs)
+    return ['-DCMAKE_EXE_LINKER_FLAGS=' + flag,
+            '-DCMAKE_SHARED_LINKER_FLAGS=' + flag]
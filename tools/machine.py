@@ -0,0 +1,176 @@
+import ctypes
+import glob
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+cpu_root = '/sys/devices/system/cpu'
+thp_root = '/sys/kernel/mm/transparent_hugepage'
+aslr_path = '/proc/sys/kernel/randomize_va_space'
+
+# personality(2) flag that disables address space layout randomization for
+# the calling process and the programs it executes
+ADDR_NO_RANDOMIZE = 0x0040000
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _write(path: str, value: str) -> Optional[str]:
+    try:
+        with open(path, 'w') as f:
+            f.write(value)
+        return None
+    except OSError as e:
+        return '%s: %s' % (path, e.strerror)
+
+
+def _selected(value: Optional[str]) -> Optional[str]:
+    # sysfs lists choices as "always [madvise] never"
+    if value and '[' in value:
+        return value[value.index('[') + 1:value.index(']')]
+    return value
+
+
+def governor_paths() -> List[str]:
+    return sorted(glob.glob(os.path.join(cpu_root, 'cpu[0-9]*', 'cpufreq',
+                                         'scaling_governor')))
+
+
+def turbo_path() -> Optional[str]:
+    for path in (os.path.join(cpu_root, 'intel_pstate', 'no_turbo'),
+                 os.path.join(cpu_root, 'cpufreq', 'boost')):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def machine_state() -> Dict[str, Optional[str]]:
+    """
+    Reads the machine settings that affect measurements: the CPU frequency
+    governor(s), turbo boost, transparent huge pages, ASLR, isolated CPUs
+    and the current load.
+    """
+    governors = sorted({_read(p) for p in governor_paths()} - {None})
+    turbo = turbo_path()
+    turbo_on = None
+    if turbo:
+        value = _read(turbo)
+        if value is not None:
+            on = value == '1'
+            turbo_on = 'on' if on != turbo.endswith('no_turbo') else 'off'
+
+    return {
+        'governor': ','.join(governors) or None,
+        'turbo': turbo_on,
+        'thp': _selected(_read(os.path.join(thp_root, 'enabled'))),
+        'thp_defrag': _selected(_read(os.path.join(thp_root, 'defrag'))),
+        'aslr': _read(aslr_path),
+        'isolated': _read(os.path.join(cpu_root, 'isolated')) or None,
+        'loadavg': (_read('/proc/loadavg') or '').split(' ')[0] or None,
+    }
+
+
+def apply_settings(governor: Optional[str] = None,
+                   turbo: Optional[bool] = None, thp: Optional[str] = None,
+                   aslr: Optional[int] = None) -> List[str]:
+    """
+    Changes machine settings; settings that are None are left alone. This
+    needs root. Returns the errors of settings that could not be changed.
+    """
+    errors = []
+    if governor:
+        errors += [_write(p, governor) for p in governor_paths()]
+    if turbo is not None:
+        path = turbo_path()
+        if path is None:
+            errors.append('turbo boost cannot be controlled on this machine')
+        else:
+            # no_turbo is inverted
+            one = turbo != path.endswith('no_turbo')
+            errors.append(_write(path, '1' if one else '0'))
+    if thp:
+        errors.append(_write(os.path.join(thp_root, 'enabled'), thp))
+    if aslr is not None:
+        errors.append(_write(aslr_path, str(aslr)))
+    return [e for e in errors if e]
+
+
+def parse_cpus(spec: str) -> List[int]:
+    """
+    Parses a CPU list like ``2-5,8``.
+    """
+    cpus = []
+    for part in spec.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            cpus += range(int(first), int(last) + 1)
+        elif part:
+            cpus.append(int(part))
+    return cpus
+
+
+def run_settings_path(buildroot: str) -> str:
+    return os.path.join(buildroot, 'machine', 'run.json')
+
+
+def audit_path(buildroot: str) -> str:
+    return os.path.join(buildroot, 'machine', 'audit.json')
+
+
+def load_json(path: str) -> Dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def prepare_process(settings: Dict) -> None:
+    """
+    Applies the per-run settings of ``setup.py stabilize`` to the current
+    process, so that the programs it runs inherit them: CPU pinning and
+    disabled ASLR. These do not need root. Runs are pinned to the pinned
+    CPUs this process may run on, so that a caller (e.g. ``setup.py sweep``)
+    can split them between concurrent runs.
+    """
+    if settings.get('cpus'):
+        cpus = set(parse_cpus(settings['cpus']))
+        os.sched_setaffinity(0, cpus & os.sched_getaffinity(0) or cpus)
+    if settings.get('no_aslr'):
+        libc = ctypes.CDLL(None, use_errno=True)
+        # keep the other persona flags, like setarch -R
+        current = libc.personality(0xffffffff)
+        if current != -1:
+            libc.personality(current | ADDR_NO_RANDOMIZE)
+
+
+calibration = '''
+import time
+start = time.perf_counter()
+x = 0
+for i in range(%d):
+    x = (x * 31 + i) %% 1000003
+print(time.perf_counter() - start)
+'''
+
+
+def calibrate(runs: int, size: int = 3000000) -> List[float]:
+    """
+    Runs a fixed CPU-bound calibration workload ``runs`` times in fresh
+    processes, with the per-run settings, and returns the runtimes.
+    """
+    times = []
+    for _ in range(runs):
+        out = subprocess.check_output([sys.executable, '-c',
+                                       calibration % size],
+                                      universal_newlines=True)
+        times.append(float(out))
+    return times
@@ -0,0 +1,241 @@
+import fnmatch
+import hashlib
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import time
+from typing import Dict, Iterable, List, Optional
+
+# runtime environment variables that change what a run measures; the rest
+# of the environment (e.g. PWD, SPEC's own variables) is ignored
+env_patterns = ('LD_*', '*_OPTIONS', 'MALLOC*', 'TCMALLOC*', 'GLIBC_TUNABLES',
+                'OMP_*')
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def is_elf(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(4) == b'\x7fELF'
+
+
+def shared_libs(binary: str, env: Dict[str, str]) -> List[str]:
+    """
+    Returns the paths of the shared libraries that ``binary`` loads in
+    ``env``, as resolved by ``ldd``.
+    """
+    try:
+        out = subprocess.run(['ldd', binary], env=env, stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL,
+                             universal_newlines=True).stdout
+    except OSError:
+        return []
+    return sorted(set(re.findall(r'=> (/\S+)', out)))
+
+
+def machine_profile() -> Dict[str, str]:
+    """
+    Describes the machine a run is measured on.
+    """
+    profile = {
+        'kernel': platform.release(),
+        'cpus': str(os.cpu_count()),
+    }
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    profile['cpu'] = line.split(':', 1)[1].strip()
+                    break
+        with open('/proc/meminfo') as f:
+            profile['memory'] = f.readline().split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return profile
+
+
+def runtime_env(env: Dict[str, str]) -> Dict[str, str]:
+    return {var: value for var, value in sorted(env.items())
+            if any(fnmatch.fnmatchcase(var, p) for p in env_patterns)}
+
+
+def build_fingerprint(binary: str, env: Dict[str, str]) -> str:
+    """
+    Fingerprints a built binary: its contents and the shared libraries it
+    loads.
+    """
+    libs = shared_libs(binary, env) if is_elf(binary) else []
+    description = {
+        'binary': file_digest(binary),
+        'libs': sorted(file_digest(lib) for lib in libs),
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True)
+                          .encode()).hexdigest()[:24]
+
+
+def runtime_fingerprint(wrapper: List[str], env: Dict[str, str],
+                        settings: Optional[Dict] = None) -> str:
+    """
+    Fingerprints what an instance adds to a run around the binary: the run
+    wrappers and the shared libraries they load, the ``LD_PRELOAD``
+    libraries, the libraries in ``LD_LIBRARY_PATH`` directories that are
+    not in the environment of ``setup.py`` itself (i.e. the instance
+    runtime), the runtime environment, the per-run settings of ``setup.py
+    stabilize`` and the machine profile.
+    """
+    files = []
+    args = []
+    for i, arg in enumerate(wrapper):
+        path = arg if i or os.path.exists(arg) else \
+            shutil.which(arg, path=env.get('PATH')) or arg
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            files.append(os.path.realpath(path))
+        else:
+            args.append(arg)
+
+    libs = {lib for lib in re.split(r'[:\s]+', env.get('LD_PRELOAD', ''))
+            if os.path.isfile(lib)}
+    for path in files:
+        if is_elf(path):
+            libs.update(shared_libs(path, env))
+    inherited = os.environ.get('LD_LIBRARY_PATH', '').split(':')
+    for libdir in env.get('LD_LIBRARY_PATH', '').split(':'):
+        if libdir and libdir not in inherited and os.path.isdir(libdir):
+            libs.update(os.path.join(libdir, name)
+                        for name in os.listdir(libdir) if '.so' in name)
+
+    description = {
+        'files': [file_digest(path) for path in files],
+        'libs': sorted(file_digest(lib) for lib in libs
+                       if os.path.isfile(lib)),
+        'args': args,
+        'env': runtime_env(env),
+        'machine': machine_profile(),
+    }
+    if settings:
+        description['settings'] = settings
+    return hashlib.sha256(json.dumps(description, sort_keys=True)
+                          .encode()).hexdigest()[:24]
+
+
+def fingerprint(build: str, runtime: str, args: List[str]) -> str:
+    """
+    Fingerprints a run from the fingerprint of its binary (see
+    :func:`build_fingerprint`), the fingerprint of the instance runtime
+    (see :func:`runtime_fingerprint`) and the arguments of the binary. Runs
+    with the same fingerprint measure the same thing, so their results can
+    be reused.
+    """
+    return hashlib.sha256(json.dumps([build, runtime, args])
+                          .encode()).hexdigest()[:24]
+
+
+def command_key(argv: List[str]) -> str:
+    """
+    Identifies a command of a benchmark in the run journal. The run
+    directory differs per instance and iteration, so only the binary name
+    and the arguments are hashed.
+    """
+    key = json.dumps([os.path.basename(argv[0])] + argv[1:])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def builds_path(buildroot: str, instance: str) -> str:
+    return os.path.join(buildroot, 'builds', instance + '.json')
+
+
+def load_builds(buildroot: str, instance: str) -> Dict[str, dict]:
+    try:
+        with open(builds_path(buildroot, instance)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def sample_digest(path: str, block: int = 1 << 16, samples: int = 16) -> str:
+    """
+    Hashes the size, the first and last ``block`` bytes and ``samples``
+    evenly spaced blocks of a file: cheap enough to check before every run,
+    and it covers the ELF headers and build id of a binary.
+    """
+    h = hashlib.sha256()
+    size = os.path.getsize(path)
+    h.update(str(size).encode())
+    offsets = {0, max(size - block, 0)}
+    offsets.update(size * i // samples for i in range(1, samples))
+    with open(path, 'rb') as f:
+        for offset in sorted(offsets):
+            f.seek(offset)
+            h.update(f.read(block if offset in (0, size - block) else 4096))
+    return h.hexdigest()[:24]
+
+
+def record_build(buildroot: str, instance: str, binary: str) -> None:
+    """
+    Stores the fingerprint of a binary that was just built in the build
+    registry ``<buildroot>/builds/<instance>.json``, keyed by the binary
+    name, so that runs only have to look it up.
+    """
+    builds = load_builds(buildroot, instance)
+    builds[os.path.basename(binary)] = {
+        'fingerprint': build_fingerprint(binary, dict(os.environ)),
+        'sample': sample_digest(binary),
+        'time': round(time.time(), 3),
+    }
+    path = builds_path(buildroot, instance)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(builds, f, indent=2, sort_keys=True)
+    os.rename(path + '.tmp', path)
+
+
+def lookup_build(builds: Dict[str, dict], binary: str) -> Optional[str]:
+    """
+    Returns the recorded fingerprint of a binary (or a copy of it, e.g. in a
+    SPEC run directory), or None if it was not recorded or its contents
+    changed since, e.g. because it was rebuilt without the hook or copied
+    from another tree.
+    """
+    build = builds.get(os.path.basename(binary))
+    try:
+        if build and sample_digest(binary) == build.get('sample'):
+            return build['fingerprint']
+    except OSError:
+        pass
+    return None
+
+
+def memo_path(buildroot: str) -> str:
+    return os.path.join(buildroot, 'memo', 'samples.jsonl')
+
+
+def load_memo(path: str,
+              fingerprints: Optional[Iterable[str]] = None
+              ) -> Dict[str, List[dict]]:
+    """
+    Returns the successful runs in the memo store, per fingerprint.
+    """
+    wanted = set(fingerprints) if fingerprints is not None else None
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry['status'] != 0:
+                continue
+            if wanted is None or entry['fingerprint'] in wanted:
+                entries.setdefault(entry['fingerprint'], []).append(entry)
+    return entries
@@ -0,0 +1,188 @@
+import glob
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List
+from infra.packages.llvm import LLVM
+from infra.util import Namespace
+
+# file to which LLVM appends its -stats and -time-passes output, relative to
+# the working directory of each compile and link, i.e., the build directory
+# of the benchmark (see target_build_dir), so that records are kept per
+# benchmark
+info_output_file = 'llvm-pass-stats.txt'
+
+banner_re = re.compile(r'^===-+===$')
+stat_re = re.compile(r'^\s*(\d+)\s+(\S+)\s+-\s+(.+?)\s*$')
+timing_re = re.compile(r'^\s*((?:[\d.]+\s+\(\s*[\d.]+%\)\s+)+)(.+?)\s*$')
+time_value_re = re.compile(r'([\d.]+)\s+\(\s*[\d.]+%\)')
+
+
+def target_build_dir(binary: str) -> str:
+    """
+    Returns the directory in which the compiler and linker ran to build a
+    target binary, where files they write relative to their working
+    directory end up. SPEC builds ``<benchmark>/exe/<name>_base.<instance>``
+    in the newest ``<benchmark>/build/build_base_<instance>.<nnnn>``; other
+    targets build their binaries in place.
+
+    :param binary: path of the target binary, as passed to post-build hooks
+    """
+    exedir = os.path.dirname(os.path.abspath(binary))
+    match = re.match(r'.+_(base|peak)\.(.+)$', os.path.basename(binary))
+    if os.path.basename(exedir) != 'exe' or not match:
+        return exedir
+    pattern = os.path.join(os.path.dirname(exedir), 'build', 'build_%s_%s.*' %
+                           (match.group(1), glob.escape(match.group(2))))
+    builds = [path for path in glob.glob(pattern) if os.path.isdir(path)]
+    return max(builds, key=os.path.getmtime) if builds else exedir
+
+
+def enable_pass_stats(ctx: Namespace, instance: str, lto: bool = True,
+                      plugin_flags: bool = True) -> None:
+    """
+    Enables ``-stats`` and ``-time-passes`` output for every translation unit
+    and, when ``lto`` is set, for every LTO link. The output is parsed after
+    each target build and stored per instance and binary under
+    ``<buildroot>/pass-stats``.
+
+    :param ctx: the configuration context
+    :param instance: name of the instance to attribute the statistics to
+    :param lto: also collect statistics from the LTO link
+    :param plugin_flags: pass the LTO options via ``LLVM.add_plugin_flags``
+                         rather than as raw ``-Wl,-plugin-opt`` flags
+    """
+    options = ['-stats', '-time-passes', '-info-output-file=' + info_output_file]
+
+    for opt in options:
+        ctx.cflags += ['-mllvm', opt]
+        ctx.cxxflags += ['-mllvm', opt]
+
+    if lto:
+        if plugin_flags:
+            LLVM.add_plugin_flags(ctx, *options)
+        else:
+            ctx.ldflags += ['-Wl,-plugin-opt=' + opt for opt in options]
+
+    def collect(ctx, binary):
+        store_pass_stats(ctx, instance, binary)
+
+    ctx.hooks.post_build += [collect]
+
+
+def parse_pass_stats(lines: Iterable[str]) -> List[Dict]:
+    """
+    Parses the ``-stats`` and ``-time-passes`` output of one or more LLVM
+    invocations into records. Statistics become
+    ``{'kind': 'stat', 'pass', 'name', 'value'}`` and pass timings become
+    ``{'kind': 'time', 'group', 'pass', 'wall'}`` (wall time in seconds).
+
+    :param lines: the lines of the LLVM info output
+    :returns: the list of parsed records
+    """
+    records = []
+    section = None
+    in_header = False
+
+    for line in lines:
+        stripped = line.strip()
+
+        # section titles are enclosed by a pair of banner lines
+        if banner_re.match(stripped):
+            in_header = not in_header
+            continue
+
+        if in_header:
+            if stripped:
+                title = stripped.strip('.').strip()
+                section = 'stats' if title == 'Statistics Collected' else title
+            continue
+
+        if section == 'stats':
+            match = stat_re.match(line)
+            if match:
+                value, pass_name, desc = match.groups()
+                records.append({'kind': 'stat', 'pass': pass_name,
+                                'name': desc, 'value': int(value)})
+        elif section is not None:
+            match = timing_re.match(line)
+            if match and match.group(2) != 'Total':
+                times = time_value_re.findall(match.group(1))
+                records.append({'kind': 'time', 'group': section,
+                                'pass': match.group(2),
+                                'wall': float(times[-1])})
+
+    return records
+
+
+def aggregate_pass_stats(records: Iterable[Dict]) -> Dict:
+    """
+    Sums the records of several invocations (translation units or links).
+
+    :param records: records as returned by :func:`parse_pass_stats`
+    :returns: ``{'time': {pass: seconds}, 'stats': {pass: {name: value}}}``
+    """
+    times = defaultdict(float)
+    stats = defaultdict(lambda: defaultdict(int))
+
+    for record in records:
+        if record['kind'] == 'time':
+            times[record['pass']] += record['wall']
+        else:
+            stats[record['pass']][record['name']] += record['value']
+
+    return {'time': dict(times),
+            'stats': {p: dict(counters) for p, counters in stats.items()}}
+
+
+def pass_stats_dir(ctx: Namespace, instance: str = None) -> str:
+    path = os.path.join(ctx.paths.buildroot, 'pass-stats')
+    return os.path.join(path, instance) if instance else path
+
+
+def store_pass_stats(ctx: Namespace, instance: str, binary: str) -> None:
+    """
+    Parses the info output left in the build directory of ``binary`` by its
+    compiles and links, and stores the records as
+    ``<buildroot>/pass-stats/<instance>/<binary>.json``.
+    The info output is removed so that a rebuild starts from scratch.
+    """
+    infile = os.path.join(target_build_dir(binary), info_output_file)
+    if not os.path.exists(infile):
+        ctx.log.warning('no pass statistics found for ' + binary)
+        return
+
+    with open(infile) as f:
+        records = parse_pass_stats(f)
+    os.remove(infile)
+
+    outdir = pass_stats_dir(ctx, instance)
+    os.makedirs(outdir, exist_ok=True)
+    outfile = os.path.join(outdir, os.path.basename(binary) + '.json')
+    with open(outfile, 'w') as f:
+        json.dump(records, f)
+
+    ctx.log.debug('stored %d pass statistics records in %s' %
+                  (len(records), outfile))
+
+
+def load_pass_stats(ctx: Namespace) -> Dict[str, Dict[str, Dict]]:
+    """
+    Loads all stored statistics, aggregated per binary.
+
+    :returns: ``{instance: {binary: aggregate}}``
+    """
+    results = {}
+    root = pass_stats_dir(ctx)
+    if not os.path.exists(root):
+        return results
+
+    for instance in sorted(os.listdir(root)):
+        results[instance] = {}
+        for filename in sorted(os.listdir(os.path.join(root, instance))):
+            with open(os.path.join(root, instance, filename)) as f:
+                binary = filename[:-len('.json')]
+                results[instance][binary] = aggregate_pass_stats(json.load(f))
+
+    return results
@@ -0,0 +1,208 @@
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+# report headers
+sanitizer_header_re = re.compile(
+    r'^==\d+==\s*(?:ERROR|WARNING): (?P<kind>\w+Sanitizer):\s*(?P<message>.*)$')
+runtime_error_re = re.compile(
+    r'^(?P<location>\S+:\d+:\d+): runtime error: (?P<message>.*)$')
+vasan_header_re = re.compile(r'^Error: (?P<message>.+)$')
+valgrind_line_re = re.compile(r'^==\d+==(?: (?P<text>.*))?$')
+
+# report bodies
+sanitizer_frame_re = re.compile(r'^\s*#\d+\s+0x[0-9a-fA-F]+\s+(?P<frame>.*)$')
+valgrind_frame_re = re.compile(r'^\s*(?:at|by) 0x[0-9A-Fa-f]+: (?P<frame>.*)$')
+glibc_frame_re = re.compile(r'^\s*(?P<frame>\S+\(\S*\))\s*\[0x[0-9a-fA-F]+\]\s*$')
+summary_re = re.compile(r'^(?:==\d+==)?\s*(?:SUMMARY: |ABORTING)')
+
+number_re = re.compile(r'0x[0-9a-fA-F]+|\d+')
+
+# frames and lines kept per report, and frames that identify a report
+max_frames = 64
+max_lines = 256
+hash_frames = 5
+
+
+class Report:
+    def __init__(self, kind: str, message: str, location: Optional[str] = None):
+        self.kind = kind
+        self.message = message
+        self.location = location
+        self.frames = []
+        self.lines = []
+        self.stack_closed = False
+
+    def add_line(self, line: str) -> None:
+        if len(self.lines) < max_lines:
+            self.lines.append(line)
+
+    def add_frame(self, frame: str) -> None:
+        # only the first stack identifies the report, later stacks (e.g. of
+        # the allocation site) are kept in the report lines only
+        if not self.stack_closed and len(self.frames) < max_frames:
+            self.frames.append(frame.strip())
+
+    def end_stack(self) -> None:
+        if self.frames:
+            self.stack_closed = True
+
+    def stack_hash(self) -> str:
+        """
+        Hashes the report kind, the message without addresses and numbers,
+        the source location and the top frames. Reports from the same bug
+        at different addresses or iterations get the same hash.
+        """
+        h = hashlib.sha1()
+        h.update(self.kind.encode())
+        h.update(number_re.sub('N', self.message).encode())
+        if self.location:
+            h.update(self.location.encode())
+        for frame in self.frames[:hash_frames]:
+            # sanitizer frames without symbols still contain module offsets
+            h.update(frame.encode())
+        return h.hexdigest()[:16]
+
+
+class ReportParser:
+    """
+    Incremental parser for ASan/MSan/UBSan/CFI/VASAN/Valgrind reports in a
+    stderr stream. Every completed report is passed to ``on_report``.
+    """
+
+    def __init__(self, on_report: Callable[[Report], None]):
+        self.on_report = on_report
+        self.current = None
+        self.valgrind_pending = None
+
+    def _finish(self) -> None:
+        if self.current:
+            self.on_report(self.current)
+            self.current = None
+
+    def _start(self, report: Report, line: str) -> None:
+        self._finish()
+        self.current = report
+        report.add_line(line)
+
+    def feed(self, line: str) -> None:
+        line = line.rstrip('\n')
+
+        match = sanitizer_header_re.match(line)
+        if match:
+            return self._start(Report(match.group('kind'),
+                                      match.group('message')), line)
+
+        match = runtime_error_re.match(line)
+        if match:
+            message = match.group('message')
+            kind = 'CFI' if 'control flow integrity' in message else 'UBSan'
+            return self._start(Report(kind, message, match.group('location')),
+                               line)
+
+        match = vasan_header_re.match(line)
+        if match:
+            return self._start(Report('VASAN', match.group('message')), line)
+
+        match = valgrind_line_re.match(line)
+        if match:
+            return self._feed_valgrind(line, match.group('text') or '')
+
+        if self.current is None:
+            return
+
+        match = sanitizer_frame_re.match(line) or glibc_frame_re.match(line)
+        if match:
+            self.current.add_line(line)
+            self.current.add_frame(match.group('frame'))
+        elif summary_re.match(line):
+            self.current.add_line(line)
+            self._finish()
+        elif self.current.location:
+            # runtime errors are one line, optionally followed by a stack
+            self._finish()
+        elif self.current.kind == 'VASAN' and line.startswith('-----'):
+            self._finish()
+        else:
+            self.current.add_line(line)
+            self.current.end_stack()
+
+    def _feed_valgrind(self, line: str, text: str) -> None:
+        # valgrind errors are a header line followed by "at 0x..." frames and
+        # end at an empty "==PID==" line
+        match = valgrind_frame_re.match(text)
+        if match:
+            if self.valgrind_pending:
+                header, message = self.valgrind_pending
+                self.valgrind_pending = None
+                self._start(Report('Memcheck', message), header)
+            if self.current:
+                self.current.add_line(line)
+                self.current.add_frame(match.group('frame'))
+        elif not text.strip():
+            if self.current and self.current.kind == 'Memcheck':
+                self._finish()
+            self.valgrind_pending = None
+        elif self.current and self.current.kind == 'Memcheck':
+            # e.g. "Address 0x... is 0 bytes after a block of size 40"
+            self.current.add_line(line)
+            self.current.end_stack()
+        else:
+            self.valgrind_pending = (line, text.strip())
+
+    def close(self) -> None:
+        self._finish()
+
+
+class ReportIndex:
+    """
+    Deduplicates reports by stack hash, keeping a count and the first
+    ``keep`` instances of every unique report.
+    """
+
+    def __init__(self, keep: int = 3):
+        self.keep = keep
+        self.total = 0
+        self.entries = OrderedDict()
+
+    def add(self, report: Report) -> None:
+        self.total += 1
+        key = report.stack_hash()
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = {
+                'hash': key,
+                'kind': report.kind,
+                'message': report.message,
+                'location': report.location,
+                'frames': report.frames[:hash_frames],
+                'count': 0,
+                'examples': [],
+            }
+        entry['count'] += 1
+        if len(entry['examples']) < self.keep:
+            entry['examples'].append('\n'.join(report.lines))
+
+    def to_json(self) -> Dict:
+        return {
+            'total': self.total,
+            'unique': len(self.entries),
+            'reports': sorted(self.entries.values(), key=lambda e: -e['count']),
+        }
+
+
+def merge_indexes(indexes: List[Dict]) -> List[Dict]:
+    """
+    Merges the report lists of several run indexes by stack hash, summing
+    counts and the number of runs in which a report occurred.
+    """
+    merged = OrderedDict()
+    for index in indexes:
+        for entry in index['reports']:
+            dest = merged.get(entry['hash'])
+            if dest is None:
+                dest = merged[entry['hash']] = dict(entry, count=0, runs=0)
+            dest['count'] += entry['count']
+            dest['runs'] += 1
+    return sorted(merged.values(), key=lambda e: -e['count'])
@@ -0,0 +1,273 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+schema = '''
+CREATE TABLE IF NOT EXISTS configs (
+    id INTEGER PRIMARY KEY,
+    instance TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    params TEXT NOT NULL,
+    packages TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    UNIQUE (instance, hash)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    instance TEXT NOT NULL,
+    benchmark TEXT NOT NULL,
+    cmd TEXT NOT NULL,
+    fingerprint TEXT,
+    config INTEGER REFERENCES configs (id),
+    status INTEGER NOT NULL,
+    start REAL NOT NULL,
+    runtime REAL NOT NULL,
+    maxrss_kb INTEGER,
+    machine TEXT,
+    stage_s REAL
+);
+CREATE INDEX IF NOT EXISTS runs_by_benchmark
+    ON runs (benchmark, instance, start);
+CREATE INDEX IF NOT EXISTS runs_by_fingerprint ON runs (fingerprint);
+CREATE TABLE IF NOT EXISTS counters (
+    instance TEXT NOT NULL,
+    binary TEXT NOT NULL,
+    pass TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (instance, binary, pass, name)
+);
+CREATE TABLE IF NOT EXISTS ingested (
+    path TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL
+);
+'''
+
+
+def results_db(buildroot: str) -> str:
+    return os.path.join(buildroot, 'results.sqlite')
+
+
+def connect(path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(path)
+    db.executescript(schema)
+
+    # databases created before these columns were added
+    columns = [row[1] for row in db.execute('PRAGMA table_info(runs)')]
+    for column, sqltype in (('machine', 'TEXT'), ('stage_s', 'REAL')):
+        if column not in columns:
+            db.execute('ALTER TABLE runs ADD COLUMN %s %s' % (column, sqltype))
+    return db
+
+
+def simple_params(obj) -> Dict:
+    """
+    Returns the constructor parameters of an instance that are plain
+    values, as found in its attributes.
+    """
+    simple = (str, int, float, bool, type(None))
+    params = {}
+    for attr, value in sorted(vars(obj).items()):
+        if attr.startswith('_'):
+            continue
+        if isinstance(value, simple) or (isinstance(value, (list, tuple)) and
+                                         all(isinstance(v, simple)
+                                             for v in value)):
+            params[attr] = value
+    return params
+
+
+def package_commit(ctx, package) -> Optional[str]:
+    """
+    Returns the checked out commit of a source package, or the commit it was
+    declared with if it was not fetched yet.
+    """
+    src = package.path(ctx, 'src')
+    if os.path.exists(os.path.join(src, '.git')):
+        proc = subprocess.run(['git', '-C', src, 'rev-parse', 'HEAD'],
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL,
+                              universal_newlines=True)
+        if proc.returncode == 0:
+            return proc.stdout.strip()
+    return getattr(package, 'commit', None)
+
+
+def config_path(buildroot: str, digest: str) -> str:
+    return os.path.join(buildroot, 'configs', digest + '.json')
+
+
+def record_config(buildroot: str, params: Dict,
+                  packages: Dict[str, Optional[str]]) -> str:
+    """
+    Stores a configuration of an instance, i.e. its parameters and the
+    packages it depends on with their commits, in
+    ``<buildroot>/configs/<id>.json``. Returns its id, a hash of the
+    configuration.
+    """
+    params = json.dumps(params, sort_keys=True, default=str)
+    packages = json.dumps(packages, sort_keys=True)
+    digest = hashlib.sha1((params + packages).encode()).hexdigest()[:16]
+    path = config_path(buildroot, digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'params': params, 'packages': packages}, f)
+        os.rename(path + '.tmp', path)
+    return digest
+
+
+def add_config(db: sqlite3.Connection, buildroot: str, instance: str,
+               digest: str, start: float) -> Optional[int]:
+    """
+    Adds a configuration recorded with :func:`record_config` for a run of an
+    instance that started at ``start``. Returns the config id, or None if
+    the configuration was not recorded.
+    """
+    row = db.execute('SELECT id FROM configs WHERE instance = ? AND hash = ?',
+                     (instance, digest)).fetchone()
+    if row:
+        db.execute('UPDATE configs SET first_seen = min(first_seen, ?) '
+                   'WHERE id = ?', (start, row[0]))
+        return row[0]
+    try:
+        with open(config_path(buildroot, digest)) as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return db.execute('INSERT INTO configs (instance, hash, params, packages, '
+                      'first_seen) VALUES (?, ?, ?, ?, ?)',
+                      (instance, digest, config['params'], config['packages'],
+                       start)).lastrowid
+
+
+def ingest_journal(db: sqlite3.Connection, buildroot: str, path: str,
+                   instance: str) -> int:
+    """
+    Adds the journal entries that were appended since the last ingest of
+    ``path``, with the configuration each run recorded (see
+    :func:`record_config`). Returns the number of new runs.
+    """
+    row = db.execute('SELECT offset FROM ingested WHERE path = ?',
+                     (path,)).fetchone()
+    offset = row[0] if row else 0
+    if os.path.getsize(path) < offset:
+        # the journal was cleared and started again
+        offset = 0
+
+    rows = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                # still being written, pick it up next time
+                break
+            offset += len(line)
+            try:
+                e = json.loads(line.decode())
+            except ValueError:
+                continue
+            config = None
+            if e.get('config'):
+                config = add_config(db, buildroot, instance, e['config'],
+                                    e['start'])
+            rows.append((instance, e['benchmark'], e['cmd'],
+                         e.get('fingerprint'), config, e['status'],
+                         e['start'], e['end'] - e['start'],
+                         e.get('maxrss_kb'),
+                         json.dumps(e['machine'], sort_keys=True)
+                         if 'machine' in e else None,
+                         e.get('stage_s')))
+
+    db.executemany('INSERT INTO runs (instance, benchmark, cmd, fingerprint, '
+                   'config, status, start, runtime, maxrss_kb, machine, '
+                   'stage_s) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    db.execute('INSERT OR REPLACE INTO ingested (path, offset) VALUES (?, ?)',
+               (path, offset))
+    return len(rows)
+
+
+def ingest_counters(db: sqlite3.Connection,
+                    stats: Dict[str, Dict[str, Dict]]) -> None:
+    """
+    Stores the LLVM statistics collected with ``pass_stats=True`` (see
+    :func:`tools.pass_stats.load_pass_stats`).
+    """
+    rows = []
+    for instance, binaries in stats.items():
+        for binary, result in binaries.items():
+            for pass_name, wall in result['time'].items():
+                rows.append((instance, binary, pass_name, 'wall-time', wall))
+            for pass_name, counters in result['stats'].items():
+                for name, value in counters.items():
+                    rows.append((instance, binary, pass_name, name, value))
+    db.executemany('INSERT OR REPLACE INTO counters VALUES (?, ?, ?, ?, ?)',
+                   rows)
+
+
+def iteration_times(db: sqlite3.Connection, instance: str,
+                    benchmark: Optional[str], by: str) -> Dict[Tuple, float]:
+    """
+    Returns the mean iteration time per (benchmark, period), where an
+    iteration time is the sum of the mean runtimes of the commands of the
+    benchmark. ``by`` is a strftime format for the period, e.g. ``'%Y-%m-%d'``.
+    """
+    query = ('SELECT benchmark, strftime(?, start, \'unixepoch\'), cmd, '
+             'avg(runtime) FROM runs WHERE instance = ? AND status = 0')
+    args = [by, instance]
+    if benchmark:
+        query += ' AND benchmark = ?'
+        args.append(benchmark)
+    query += ' GROUP BY 1, 2, 3'
+
+    times = {}
+    for bench, period, _, runtime in db.execute(query, args):
+        times[(bench, period)] = times.get((bench, period), 0) + runtime
+    return times
+
+
+def overhead(db: sqlite3.Connection, instance: str, baseline: str,
+             benchmark: Optional[str] = None,
+             by: str = '%Y-%m-%d') -> List[Tuple[str, str, float]]:
+    """
+    Returns the runtime overhead ratio of ``instance`` over ``baseline`` per
+    period in which both were measured, per benchmark and as the geometric
+    mean over benchmarks (benchmark ``'geomean'``).
+    """
+    xs = iteration_times(db, instance, benchmark, by)
+    ys = iteration_times(db, baseline, benchmark, by)
+    rows = [(bench, period, xs[(bench, period)] / ys[(bench, period)])
+            for bench, period in sorted(xs) if ys.get((bench, period))]
+
+    if not benchmark:
+        periods = {}
+        for bench, period, ratio in rows:
+            periods.setdefault(period, []).append(math.log(ratio))
+        rows += [('geomean', period, math.exp(sum(logs) / len(logs)))
+                 for period, logs in sorted(periods.items())]
+    return rows
+
+
+def config_iterations(db: sqlite3.Connection,
+                      instance: str) -> Dict[int, Dict[str, List[float]]]:
+    """
+    Returns the iteration times per configuration and benchmark of an
+    instance, in the order the configurations were first seen. An iteration
+    time is the sum of the n-th successful run of each command of the
+    benchmark.
+    """
+    runs = {}
+    for config, bench, cmd, runtime in db.execute(
+            'SELECT runs.config, benchmark, cmd, runtime FROM runs '
+            'JOIN configs ON runs.config = configs.id '
+            'WHERE runs.instance = ? AND status = 0 '
+            'ORDER BY configs.first_seen, start', (instance,)):
+        cmds = runs.setdefault(config, {}).setdefault(bench, {})
+        cmds.setdefault(cmd, []).append(runtime)
+    return {config: {bench: [sum(its) for its in zip(*cmds.values())]
+                     for bench, cmds in benches.items()}
+            for config, benches in runs.items()}
@@ -0,0 +1,55 @@
+import statistics
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# per-iteration runtime of a benchmark without any history, in seconds
+default_runtime = 300.0
+
+
+def estimate(history: Dict[str, Dict[str, List[float]]], instance: str,
+             benchmark: str, slowdown: float) -> Tuple[float, str]:
+    """
+    Estimates the runtime of one iteration of ``benchmark`` under
+    ``instance``. Uses the median of the instance's own iterations if it
+    has any; otherwise the fastest instance that ran the benchmark, taken
+    as native, times the expected slowdown of the instance. Returns the
+    estimate and where it came from.
+
+    :param history: iteration runtimes per instance and benchmark
+    :param slowdown: expected slowdown of the instance over native
+    """
+    own = history.get(instance, {}).get(benchmark)
+    if own:
+        return statistics.median(own), 'history'
+
+    others = [statistics.median(runtimes[benchmark])
+              for runtimes in history.values() if runtimes.get(benchmark)]
+    if others:
+        return min(others) * slowdown, 'slowdown'
+    return default_runtime * slowdown, 'default'
+
+
+def longest_first(jobs: Iterable[Tuple], key=lambda job: job[-1]) -> List:
+    """
+    Orders jobs by decreasing estimated duration: the longest processing
+    time first rule, which keeps long jobs from forming a tail at the end
+    of a sweep on a pool of workers.
+    """
+    return sorted(jobs, key=key, reverse=True)
+
+
+def makespan(durations: Iterable[float], workers: int) -> float:
+    """
+    Expected duration of running jobs in the given order on a pool of
+    ``workers``, where each job starts on the first free worker.
+    """
+    free = [0.0] * workers
+    for duration in durations:
+        i = free.index(min(free))
+        free[i] += duration
+    return max(free)
+
+
+def timeout(estimate: float, factor: float, margin: float,
+            limit: Optional[float] = None) -> float:
+    t = estimate * factor + margin
+    return min(t, limit) if limit else t
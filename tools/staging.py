@@ -0,0 +1,51 @@
+import glob
+import os
+from typing import Dict, Iterable, List, Optional
+
+
+def prewarm(paths: Iterable[str]) -> int:
+    """
+    Reads files, and all files in directories, so that they are in the page
+    cache before a run. Returns the number of bytes read.
+    """
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            files = [os.path.join(root, name)
+                     for root, _, names in os.walk(path) for name in names]
+        else:
+            files = [path]
+        for name in files:
+            try:
+                with open(name, 'rb') as f:
+                    while True:
+                        block = f.read(1 << 20)
+                        if not block:
+                            break
+                        total += len(block)
+            except OSError:
+                continue
+    return total
+
+
+def spec_run_paths(specdir: str, benchmarks: Optional[Iterable[str]],
+                   instance: str) -> Dict[str, List[str]]:
+    """
+    Returns the files a SPEC run of an instance reads, per benchmark: the
+    input data, the instance's binaries and its run directories from
+    earlier runs, which runspec reuses.
+
+    :param specdir: the SPEC installation
+    :param benchmarks: benchmark names like ``401.bzip2`` or ``bzip2``, or
+                       None for all
+    :param instance: the instance name, the binary extension in SPEC
+    """
+    names = ['*.' + b if '.' not in b else b for b in benchmarks or ['*']]
+    paths = {}
+    for name in names:
+        for bench in glob.glob(os.path.join(specdir, 'benchspec', '*', name)):
+            paths[os.path.basename(bench)] = \
+                [os.path.join(bench, 'data')] + \
+                glob.glob(os.path.join(bench, 'exe', '*.' + instance)) + \
+                glob.glob(os.path.join(bench, 'run', '*_%s.*' % instance))
+    return paths
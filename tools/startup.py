@@ -0,0 +1,54 @@
+import subprocess
+import time
+from typing import Dict, List, Sequence, Tuple
+from tools.stats import mean, percentile
+
+percentiles = (50, 90, 99)
+
+
+def launch(argv: Sequence[str], env: Dict[str, str]) -> Tuple[int, int]:
+    """
+    Runs a startup program once. The program prints the CLOCK_MONOTONIC
+    time at which its main function was entered.
+
+    :returns: the exec-to-main and exec-to-exit latencies in nanoseconds
+    """
+    start = time.clock_gettime_ns(time.CLOCK_MONOTONIC)
+    proc = subprocess.run(argv, env=env, stdout=subprocess.PIPE,
+                          stderr=subprocess.DEVNULL, universal_newlines=True)
+    end = time.clock_gettime_ns(time.CLOCK_MONOTONIC)
+    if proc.returncode:
+        raise OSError('%s exited with %d' % (argv[-1], proc.returncode))
+
+    # run wrappers (e.g. valgrind) may print to stdout as well
+    main = int(proc.stdout.split()[-1])
+    return main - start, end - start
+
+
+def measure(argv: Sequence[str], env: Dict[str, str], launches: int,
+            warmup: int = 10) -> Dict[str, List[int]]:
+    """
+    Launches a startup program ``warmup`` times without measuring, to fill
+    the page cache, then ``launches`` times.
+
+    :returns: ``{'main': [ns...], 'exit': [ns...]}``
+    """
+    for _ in range(warmup):
+        launch(argv, env)
+    samples = {'main': [], 'exit': []}
+    for _ in range(launches):
+        to_main, to_exit = launch(argv, env)
+        samples['main'].append(to_main)
+        samples['exit'].append(to_exit)
+    return samples
+
+
+def summarize(samples: Sequence[int]) -> Dict[str, float]:
+    """
+    Summarizes latencies in nanoseconds as min, mean and percentiles in
+    microseconds.
+    """
+    summary = {'min': min(samples) / 1000.0, 'mean': mean(samples) / 1000.0}
+    for q in percentiles:
+        summary['p%d' % q] = percentile(samples, q) / 1000.0
+    return summary
@@ -0,0 +1,126 @@
+import math
+from typing import Sequence, Tuple
+
+
+def mean(xs: Sequence[float]) -> float:
+    return sum(xs) / len(xs)
+
+
+def variance(xs: Sequence[float]) -> float:
+    m = mean(xs)
+    return sum((x - m) ** 2 for x in xs) / (len(xs) - 1)
+
+
+def _betacf(a: float, b: float, x: float) -> float:
+    # continued fraction for the incomplete beta function (Lentz's method)
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        for num in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                    -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + num * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + num / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < 1e-12:
+            break
+    return h
+
+
+def betainc(a: float, b: float, x: float) -> float:
+    """
+    Regularized incomplete beta function I_x(a, b).
+    """
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    lbeta = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+    front = math.exp(lbeta + a * math.log(x) + b * math.log(1 - x))
+    if x < (a + 1) / (a + b + 2):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1 - x) / b
+
+
+def t_sf(t: float, df: float) -> float:
+    """
+    Two-sided p-value of Student's t distribution: P(|T| > |t|).
+    """
+    return betainc(df / 2, 0.5, df / (df + t * t))
+
+
+def t_quantile(p: float, df: float) -> float:
+    """
+    The value t for which P(|T| > t) equals ``p``, e.g. 2.228 for p=0.05
+    and df=10.
+    """
+    lo, hi = 0.0, 1e3
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        if t_sf(mid, df) > p:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def welch(xs: Sequence[float], ys: Sequence[float]) -> Tuple[float, float]:
+    """
+    Standard error and Welch-Satterthwaite degrees of freedom of the
+    difference between the means of two samples.
+    """
+    vx, vy = variance(xs) / len(xs), variance(ys) / len(ys)
+    se = math.sqrt(vx + vy)
+    if se == 0:
+        return 0.0, float(len(xs) + len(ys) - 2)
+    df = (vx + vy) ** 2 / (vx ** 2 / (len(xs) - 1) + vy ** 2 / (len(ys) - 1))
+    return se, df
+
+
+def ratio_ci(xs: Sequence[float], ys: Sequence[float],
+             confidence: float = 0.95) -> Tuple[float, float, float]:
+    """
+    Ratio of the geometric means of two samples of runtimes (e.g. instance
+    over baseline) with a confidence interval, computed with Welch's t
+    interval on log-runtimes. Returns ``(ratio, low, high)``. Both samples
+    need at least two values.
+    """
+    lx = [math.log(x) for x in xs]
+    ly = [math.log(y) for y in ys]
+    diff = mean(lx) - mean(ly)
+    se, df = welch(lx, ly)
+    half = t_quantile(1 - confidence, df) * se
+    return math.exp(diff), math.exp(diff - half), math.exp(diff + half)
+
+
+def welch_test(xs: Sequence[float], ys: Sequence[float]) -> float:
+    """
+    Two-sided p-value of Welch's t-test on log-runtimes, for the hypothesis
+    that both samples have the same geometric mean. Both samples need at
+    least two values.
+    """
+    lx = [math.log(x) for x in xs]
+    ly = [math.log(y) for y in ys]
+    se, df = welch(lx, ly)
+    if se == 0:
+        return 1.0 if mean(lx) == mean(ly) else 0.0
+    return t_sf((mean(lx) - mean(ly)) / se, df)
+
+
+def geomean(xs: Sequence[float]) -> float:
+    return math.exp(mean([math.log(x) for x in xs]))
+
+
+def percentile(xs: Sequence[float], q: float) -> float:
+    """
+    The ``q``-th percentile (0-100) of a sample, interpolated linearly
+    between the closest ranks.
+    """
+    xs = sorted(xs)
+    rank = (len(xs) - 1) * q / 100.0
+    lo = int(math.floor(rank))
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (rank - lo)
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# unsymbolized sanitizer frame (symbolize=0):  #3 0x4f2d1a  (/path/bin+0x4f2d1a)
+sanitizer_frame_re = re.compile(
+    r'^(?P<prefix>\s*#(?P<num>\d+)\s+0x[0-9a-fA-F]+)\s+'
+    r'\((?P<module>[^()]+?)\+0x(?P<offset>[0-9a-fA-F]+)\)\s*$')
+
+# glibc backtrace_symbols frame without symbol:  /path/bin(+0x1234)[0x5612...]
+glibc_frame_re = re.compile(
+    r'^(?P<prefix>\s*)(?P<module>[^\s()]+)\(\+0x(?P<offset>[0-9a-fA-F]+)\)'
+    r'\s*\[0x[0-9a-fA-F]+\]\s*$')
+
+Frame = Tuple[str, str]
+
+
+def build_id(path: str) -> str:
+    """
+    Returns the GNU build-id of an ELF file, or a hash of its contents if it
+    has none.
+    """
+    try:
+        out = subprocess.run(['readelf', '-n', path], stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL,
+                             universal_newlines=True).stdout
+        match = re.search(r'Build ID:\s*([0-9a-fA-F]+)', out)
+        if match:
+            return match.group(1)
+    except OSError:
+        pass
+
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return 'sha1-' + h.hexdigest()
+
+
+class Symbolizer:
+    """
+    Symbolizes module offsets with a single persistent ``llvm-symbolizer``
+    process. Results are cached on disk per binary build-id in
+    ``<cache_dir>/<build-id>.json``, so a binary is only symbolized once
+    across report files and sessions.
+
+    :param cache_dir: directory for the address-to-symbol caches
+    :param symbolizer: path to ``llvm-symbolizer`` (default: from ``PATH``)
+    """
+
+    def __init__(self, cache_dir: str, symbolizer: Optional[str] = None):
+        self.cache_dir = cache_dir
+        self.symbolizer = symbolizer or shutil.which('llvm-symbolizer')
+        if not self.symbolizer:
+            raise FileNotFoundError('llvm-symbolizer not found in PATH')
+        self.proc = None
+        self.build_ids = {}
+        self.caches = {}
+        self.dirty = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.proc:
+            self.proc.stdin.close()
+            self.proc.wait()
+            self.proc = None
+        self.save()
+
+    def save(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for bid in self.dirty:
+            path = os.path.join(self.cache_dir, bid + '.json')
+            with open(path + '.tmp', 'w') as f:
+                json.dump(self.caches[bid], f)
+            os.rename(path + '.tmp', path)
+        self.dirty.clear()
+
+    def _cache(self, module: str) -> Tuple[str, Dict[str, List[Frame]]]:
+        if module not in self.build_ids:
+            self.build_ids[module] = build_id(module)
+        bid = self.build_ids[module]
+
+        if bid not in self.caches:
+            path = os.path.join(self.cache_dir, bid + '.json')
+            try:
+                with open(path) as f:
+                    self.caches[bid] = json.load(f)
+            except (OSError, ValueError):
+                self.caches[bid] = {}
+
+        return bid, self.caches[bid]
+
+    def _query(self, module: str, offset: int) -> List[Frame]:
+        if self.proc is None:
+            self.proc = subprocess.Popen(
+                [self.symbolizer],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                universal_newlines=True, bufsize=1)
+
+        self.proc.stdin.write('%s 0x%x\n' % (module, offset))
+        self.proc.stdin.flush()
+
+        # one (function, location) pair per inlined frame, then a blank line
+        frames = []
+        while True:
+            function = self.proc.stdout.readline().rstrip('\n')
+            if not function:
+                break
+            location = self.proc.stdout.readline().rstrip('\n')
+            frames.append((function, location))
+        return frames
+
+    def symbolize(self, module: str, offset: int) -> List[Frame]:
+        """
+        Returns the (function, file:line:column) frames of an offset in a
+        module, innermost inlined frame first.
+        """
+        if not os.path.exists(module):
+            return []
+
+        bid, cache = self._cache(module)
+        key = '%x' % offset
+        if key not in cache:
+            frames = self._query(module, offset)
+            if not frames:
+                return frames
+            cache[key] = frames
+            self.dirty.add(bid)
+        return cache[key]
+
+
+def symbolize_lines(lines: Iterable[str], symbolizer: Symbolizer) -> Iterator[str]:
+    """
+    Rewrites the unsymbolized stack frames in sanitizer reports (printed
+    with ``symbolize=0``) and in glibc backtraces into symbolized frames.
+    Other lines are passed through unmodified.
+
+    :param lines: lines of a report log
+    :param symbolizer: the symbolizer to resolve frames with
+    """
+    for line in lines:
+        match = sanitizer_frame_re.match(line) or glibc_frame_re.match(line)
+        if not match:
+            yield line
+            continue
+
+        module = match.group('module')
+        frames = symbolizer.symbolize(module, int(match.group('offset'), 16))
+        if not frames or frames[0][0] == '??':
+            yield line
+            continue
+
+        for function, location in frames:
+            yield '%s in %s %s (%s+0x%s)\n' % (
+                match.group('prefix'), function, location, module,
+                match.group('offset'))
@@ -0,0 +1,113 @@
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+# versions picked by ``setup.py toolchain`` per tool, used by tool()
+pins_path = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'toolchain.json')
+
+constraint_re = re.compile(r'^(>=|<=|==|>|<)\s*(\S+)$')
+
+# requirements recorded by tool(), grouped by the instance being inspected
+requirements = defaultdict(list)
+current_requester = None
+_pins = None
+
+
+def parse_version(version: str) -> Tuple[int, ...]:
+    return tuple(int(m.group()) if m else 0 for m in
+                 (re.match(r'\d+', part) for part in version.split('.')))
+
+
+def satisfies(version: str, spec: Optional[str]) -> bool:
+    """
+    Checks a version against a spec of comma-separated constraints, e.g.
+    ``'>=2.68,<2.70'``.
+    """
+    ops = {
+        '>=': lambda a, b: a >= b, '<=': lambda a, b: a <= b,
+        '==': lambda a, b: a == b, '>': lambda a, b: a > b,
+        '<': lambda a, b: a < b,
+    }
+    for constraint in (spec or '').split(','):
+        if not constraint.strip():
+            continue
+        match = constraint_re.match(constraint.strip())
+        assert match, 'invalid version constraint ' + constraint
+        op, bound = match.groups()
+        if not ops[op](parse_version(version), parse_version(bound)):
+            return False
+    return True
+
+
+def load_pins() -> Dict[str, str]:
+    global _pins
+    if _pins is None:
+        try:
+            with open(pins_path) as f:
+                _pins = json.load(f)
+        except FileNotFoundError:
+            _pins = {}
+    return _pins
+
+
+def tool(cls: type, version: str, spec: Optional[str] = None, *args):
+    """
+    Declares a dependency on a build tool package (e.g. ``Make``, ``CMake``,
+    ``AutoConf``). ``version`` is the version the package was tested with
+    and ``spec`` the range of versions that also work. If
+    ``setup.py toolchain`` pinned a version of this tool that satisfies
+    ``spec``, that version is used instead, so that instances share one
+    build of the tool.
+
+    :param cls: the package class, constructed as ``cls(version, *args)``
+    :param version: the preferred version
+    :param spec: comma-separated version constraints, e.g. ``'>=2.68,<2.70'``
+    :param args: additional constructor arguments (e.g. a nested ``M4``)
+    """
+    name = cls.__name__.lower()
+    assert satisfies(version, spec), \
+        'preferred %s version %s does not satisfy %s' % (name, version, spec)
+
+    if current_requester is not None:
+        requirements[current_requester].append((name, version, spec))
+
+    pinned = [v for v in load_pins().get(name, []) if satisfies(v, spec)]
+    if pinned:
+        version = max(pinned, key=parse_version)
+    return cls(version, *args)
+
+
+def resolve(reqs: List[Tuple[str, str, Optional[str]]]) -> Dict[str, List[str]]:
+    """
+    Picks a minimal set of versions per tool such that every requirement is
+    satisfied by one of them. Only preferred versions are candidates, since
+    those are known to build. Requirements are handled in order of their
+    upper bound, each time picking the newest candidate that satisfies the
+    first unsatisfied requirement (greedy interval stabbing).
+
+    :param reqs: ``(tool, preferred version, spec)`` tuples
+    :returns: the chosen versions per tool
+    """
+    by_tool = defaultdict(list)
+    for name, version, spec in reqs:
+        by_tool[name].append((version, spec))
+
+    chosen = {}
+    for name, tool_reqs in by_tool.items():
+        candidates = sorted({v for v, _ in tool_reqs}, key=parse_version)
+
+        def upper_bound(req):
+            ok = [c for c in candidates if satisfies(c, req[1])]
+            return parse_version(ok[-1])
+
+        picked = []
+        for version, spec in sorted(tool_reqs, key=upper_bound):
+            if any(satisfies(p, spec) for p in picked):
+                continue
+            picked.append([c for c in candidates if satisfies(c, spec)][-1])
+        chosen[name] = sorted(picked, key=parse_version)
+
+    return chosen
@@ -1,6 +1,24 @@
+from typing import Dict, Iterable, List, Optional, Tuple
 from infra.util import Namespace
+from tools.checkpoint import strip_journal_wrapper
+from tools.fetch import GitSource, fetch_git
+from tools.machine import load_json, run_settings_path
+from tools.memo import runtime_fingerprint
 import infra
 import os
+import shlex
+
+# source package class name -> commit, set with --commit on the command line
+commit_overrides = {}
+
+# set with --journal on the command line to record runs (see journal_wrapper)
+journal_runs = False
+
+# set with --journal-dir to record runs outside <buildroot>/journal
+journal_dir = None
+
+# set with --time-builds to time compiler invocations (see tools/buildtime.py)
+time_builds = False
 
 
 def add_env_var(ctx: Namespace, var: str, val: str) -> None:
@@ -23,16 +41,209 @@ def git_fetch(ctx: Namespace, url: str, sha: str = None,
               destination: str = 'src') -> None:
     """
     Downloads the contents of a git repository and optionally checkouts
-    to a specific commit.
+    to a specific commit. The repository is cloned from a mirror in the
+    download cache (see :mod:`tools.fetch`).
 
     :param url: the url of the git repository
     :param sha: the sha of the commit to checkout to (optional)
     :param destination: the destination folder to clone the git repository
     """
     infra.util.require_program(ctx, 'git')
-    infra.util.run(ctx, 'git clone %s %s' % (url, destination))
-    if sha:
-        current_dir = os.getcwd()
-        os.chdir(destination)
-        infra.util.run(ctx, 'git checkout ' + sha)
-        os.chdir(current_dir)
+    fetch_git(ctx, GitSource(url, sha), destination)
+
+
+def source_commit(package: infra.Package, commit: str) -> str:
+    """
+    Returns the commit a source package should build: ``commit``, unless it
+    is overridden for the package class with ``--commit <class>=<sha>`` (as
+    used by ``setup.py regress bisect``). The package identifier contains
+    the commit, so every commit is built in its own directory.
+
+    :param package: the source package
+    :param commit: the commit the package was constructed with
+    """
+    return commit_overrides.get(type(package).__name__, commit)
+
+
+def iter_packages(deps: Iterable, seen: set = None) -> Iterable:
+    """
+    Yields the packages in a dependency tree, each once, dependencies
+    before the packages that depend on them.
+    """
+    seen = set() if seen is None else seen
+    for package in deps or ():
+        if package.ident() in seen:
+            continue
+        seen.add(package.ident())
+        yield from iter_packages(package.dependencies(), seen)
+        yield package
+
+
+def add_run_wrapper(ctx: Namespace, wrapper: str) -> None:
+    """
+    Prepends a command to ``ctx.target_run_wrapper``, so that it wraps any
+    run wrapper that was configured before it.
+
+    :param ctx: the configuration context
+    :param wrapper: the wrapper command line
+    """
+    if ctx.get('target_run_wrapper'):
+        wrapper += ' ' + ctx.target_run_wrapper
+    ctx.target_run_wrapper = wrapper
+
+
+def script_path(ctx: Namespace, name: str) -> str:
+    """
+    Returns the absolute path of a helper script in the ``scripts``
+    directory.
+
+    :param ctx: the configuration context
+    :param name: the file name of the script
+    """
+    return os.path.join(ctx.paths.root, 'scripts', name)
+
+
+def stats_report_wrapper(ctx: Namespace, prefix: str) -> str:
+    """
+    Returns a run wrapper that reports the statistics counters printed by a
+    runtime at exit as ``[setup-report]`` results.
+
+    :param ctx: the configuration context
+    :param prefix: the prefix of the reported result names
+    """
+    return '%s %s' % (script_path(ctx, 'report-stats.py'), prefix)
+
+
+def add_sanitizer_options(ctx: Namespace, var: str, **options) -> None:
+    """
+    Adds options to a sanitizer runtime options variable in ``ctx.runenv``
+    (e.g., ``UBSAN_OPTIONS``), keeping any options that were set before.
+
+    :param ctx: the configuration context
+    :param var: the options variable
+    :param options: the options to add
+    """
+    opts = [opt for opt in ctx.runenv.get(var, '').split(':') if opt]
+    opts += ['%s=%s' % (key, value) for key, value in options.items()]
+    ctx.runenv[var] = ':'.join(opts)
+
+
+def report_filter_wrapper(ctx: Namespace, instance: str,
+                          max_raw_bytes: int = 64 << 20, keep: int = 3) -> str:
+    """
+    Returns a run wrapper that deduplicates sanitizer reports on stderr by
+    stack hash while the target runs. It writes a JSON index per run to
+    ``<buildroot>/reports/<instance>`` and caps the forwarded stderr.
+
+    :param ctx: the configuration context
+    :param instance: name of the instance to store the index for
+    :param max_raw_bytes: maximum number of stderr bytes to forward
+    :param keep: number of instances to keep of every unique report
+    """
+    index_dir = os.path.join(ctx.paths.buildroot, 'reports', instance)
+    return '%s %s %d %d' % (script_path(ctx, 'report-filter.py'), index_dir,
+                            max_raw_bytes, keep)
+
+
+def journal_wrapper(ctx: Namespace, instance: str,
+                    config: Optional[str] = None) -> str:
+    """
+    Returns a run wrapper that records every completed run of an instance in
+    the run journal ``<buildroot>/journal/<instance>.jsonl``, and in the
+    memo store with the fingerprint of the run. It also applies the per-run
+    settings of ``setup.py stabilize``. Instances only add it to runs with
+    ``--journal``, as the outermost wrapper. With ``--journal-dir``, runs are
+    recorded in ``<dir>/<instance>.jsonl`` instead, e.g. for measurements
+    that must not mix with the regular journal.
+
+    The fingerprint of the instance runtime is computed here, once per
+    ``setup.py run``, and binaries are fingerprinted when they are built
+    (see :func:`tools.memo.record_build`), so the wrapper only combines
+    them.
+
+    :param ctx: the configuration context, after the instance prepared the
+                run
+    :param instance: name of the instance to record runs for
+    :param config: the configuration to record with each run (see
+                   :func:`tools.results.record_config`)
+    """
+    env, wrapper = target_run_command(ctx)
+    settings = load_json(run_settings_path(ctx.paths.buildroot))
+    runtime = runtime_fingerprint(wrapper, env, settings)
+    args = ['--buildroot', ctx.paths.buildroot, '--instance', instance,
+            '--runtime', runtime, '--wrapped', str(len(wrapper))]
+    if config:
+        args += ['--config', config]
+    if journal_dir:
+        args += ['--journal', os.path.join(journal_dir, instance + '.jsonl')]
+    return ' '.join(shlex.quote(arg) for arg in
+                    [script_path(ctx, 'run-journal.py')] + args + ['--'])
+
+
+def target_run_command(ctx: Namespace) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Returns the environment and the run wrapper command of a prepared run,
+    for bundled targets that launch their programs themselves. The journal
+    wrapper is left out, since these targets record their own results.
+
+    :param ctx: the configuration context, after the instance prepared the
+                run
+    :returns: the full environment and the wrapper as a list of arguments
+    """
+    env = dict(os.environ)
+    for var, value in ctx.runenv.items():
+        if isinstance(value, (list, tuple)):
+            value = ':'.join(str(v) for v in value)
+        env[var] = str(value)
+
+    wrapper = shlex.split(ctx.get('target_run_wrapper', ''))
+    return env, strip_journal_wrapper(wrapper)
+
+
+def write_pkg_config_responder(ctx: Namespace, path: str,
+                               packages: Iterable) -> str:
+    """
+    Writes a shell script that answers ``pkg-config`` queries for the given
+    packages from values resolved once, instead of starting ``setup.py
+    pkg-config`` per query. Unknown queries fall back to ``setup.py``. The
+    script is regenerated when any of the resolved values (e.g. install
+    paths) change.
+
+    :param ctx: the configuration context
+    :param path: the path of the script
+    :param packages: the packages to answer queries for
+    :returns: the command to use as ``PKG_CONFIG``
+    """
+    setup_path = os.path.join(ctx.paths.root, 'setup.py')
+    cases = []
+    for package in packages:
+        for opt, _, value in package.pkg_config_options(ctx):
+            if isinstance(value, (list, tuple)):
+                value = ' '.join(str(v) for v in value)
+            cases.append('%s) echo %s;;' % (
+                shlex.quote('%s %s' % (package.ident(), opt)),
+                shlex.quote(str(value))))
+
+    script = '\n'.join([
+        '#!/bin/sh',
+        '# generated by setup.py, see write_pkg_config_responder in util.py',
+        'case "$1 $2" in',
+        *cases,
+        '*) exec python3 %s pkg-config "$@";;' % shlex.quote(setup_path),
+        'esac',
+    ]) + '\n'
+
+    try:
+        with open(path) as f:
+            uptodate = f.read() == script
+    except FileNotFoundError:
+        uptodate = False
+
+    if not uptodate:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(script)
+        os.chmod(path, 0o755)
+        ctx.log.debug('wrote pkg-config responder ' + path)
+
+    return path